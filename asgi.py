@@ -0,0 +1,544 @@
+"""
+Entry point ASGI alternativo ao main:app (WSGI).
+
+Serve os mesmos endpoints e regras de autenticação, mas sem prender um
+worker por requisição: acertos de cache são lidos com Redis assíncrono e as
+buscas no Yahoo rodam em um pool de threads limitado por configuração.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 80 --workers 4
+"""
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from os.path import abspath, dirname
+
+from flask import Flask
+from starlette.applications import Starlette
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse as StarletteJSONResponse, PlainTextResponse, Response
+from starlette.routing import Match, Route
+from werkzeug.http import parse_etags, quote_etag
+
+sys.path.insert(0, dirname(abspath(__file__)))
+# Requisições concorrentes no mesmo processo: os ausentes são agrupados em um só yf.download
+os.environ.setdefault("UPSTREAM_BATCH_WINDOW_MS", "25")
+
+from services import (  # noqa: E402
+    AdmissionRejected,
+    BATCH_VIEWS,
+    CLASSIFICATION_SECTIONS,
+    admit_request,
+    begin_request,
+    INFO_SECTIONS,
+    QUOTE_SECTIONS,
+    RECOMMENDATION_SECTIONS,
+    check_access,
+    count_request,
+    dumps_bytes,
+    ensure_sa_suffix,
+    fetch_history,
+    fetch_missing_ticker_data,
+    format_asset_info,
+    format_market_price,
+    format_recommendations,
+    format_stock_info,
+    freshness_warnings,
+    get_request_counts,
+    get_ticker_index,
+    get_warmup_status,
+    inc,
+    initialize_cache,
+    is_public_path,
+    log_request_summary,
+    match_etag,
+    observe,
+    observe_stage,
+    parse_batch_views,
+    parse_fields,
+    parse_history_range,
+    pin_section_versions,
+    pinned_section_versions,
+    refresh_tickers,
+    release_request,
+    render_metrics,
+    request_cost,
+    resolve_token,
+    set_endpoint,
+    setup_logger,
+    start_metrics_flusher,
+    start_persistent_cache,
+    start_refresh_scheduler,
+    start_warmup_scheduler,
+    track_cache_lookup,
+)
+from services.response_service import batch_sections, format_batch  # noqa: E402
+from services.classification_service import (  # noqa: E402
+    cache_classifications,
+    classify_ticker_data,
+    code_classifiable,
+    preclassify,
+)
+from services.async_cache_service import aget_cached_sections, aget_cached_tickers, asplit_known_invalid, create_async_redis  # noqa: E402
+
+# Máximo de buscas no Yahoo em andamento ao mesmo tempo, por processo
+ASGI_MAX_CONCURRENT_FETCHES = int(os.getenv("ASGI_MAX_CONCURRENT_FETCHES", "16"))
+# Tempo máximo, em segundos, à espera de uma vaga de busca; depois disso a requisição recebe 503
+ASGI_FETCH_SLOT_TIMEOUT = float(os.getenv("ASGI_FETCH_SLOT_TIMEOUT", "5"))
+# Threads disponíveis para buscas no Yahoo e tarefas de bookkeeping no Redis
+ASGI_FETCH_THREADS = int(os.getenv("ASGI_FETCH_THREADS", str(ASGI_MAX_CONCURRENT_FETCHES + 4)))
+# Threads do controle de admissão, fora do pool das buscas: recusar carga não pode esperar por ela
+ASGI_ADMISSION_THREADS = int(os.getenv("ASGI_ADMISSION_THREADS", "4"))
+
+# O cache síncrono (Flask-Caching) continua sendo usado pelo caminho de busca no Yahoo
+flask_app = Flask(__name__)
+cache = initialize_cache(flask_app)
+logger = setup_logger()
+start_refresh_scheduler(cache, refresh_tickers)
+start_metrics_flusher(cache)
+start_persistent_cache(cache)
+start_warmup_scheduler(cache)
+
+redis_client = create_async_redis(flask_app)
+executor = ThreadPoolExecutor(max_workers=ASGI_FETCH_THREADS, thread_name_prefix="asgi-fetch")
+admission_executor = ThreadPoolExecutor(max_workers=ASGI_ADMISSION_THREADS, thread_name_prefix="asgi-admission")
+fetch_slots = asyncio.Semaphore(ASGI_MAX_CONCURRENT_FETCHES)
+
+
+class FetchSlotTimeout(Exception):
+    """
+    Nenhuma vaga de busca no Yahoo liberada dentro de ASGI_FETCH_SLOT_TIMEOUT.
+    """
+
+    def response(self):
+        return JSONResponse(
+            {"error": "Too many concurrent upstream fetches, retry later"},
+            status_code=503,
+            headers={"Retry-After": str(max(1, round(ASGI_FETCH_SLOT_TIMEOUT)))},
+        )
+
+
+@asynccontextmanager
+async def fetch_slot():
+    """
+    Ocupa uma das ASGI_MAX_CONCURRENT_FETCHES vagas de busca. Sob carga, a
+    espera tem prazo: sem vaga em ASGI_FETCH_SLOT_TIMEOUT segundos, levanta
+    FetchSlotTimeout em vez de enfileirar a requisição indefinidamente.
+    """
+    try:
+        await asyncio.wait_for(fetch_slots.acquire(), ASGI_FETCH_SLOT_TIMEOUT)
+    except asyncio.TimeoutError:
+        logger.warning("No upstream fetch slot freed within %ss.", ASGI_FETCH_SLOT_TIMEOUT)
+        raise FetchSlotTimeout()
+    try:
+        yield
+    finally:
+        fetch_slots.release()
+
+
+class JSONResponse(StarletteJSONResponse):
+    def render(self, content):
+        # Mesmo codificador do jsonify do main.py (chaves ordenadas, orjson se instalado)
+        return dumps_bytes(content)
+
+
+async def buffer_body(receive):
+    """
+    Lê o corpo da requisição (para calcular o peso na admissão) e devolve um
+    `receive` que o entrega intacto à rota.
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    body = b"".join(chunks)
+    replayed = False
+
+    async def replay():
+        nonlocal replayed
+        if not replayed:
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, replay
+
+
+class AuthMiddleware:
+    """
+    Aplica check_access e o controle de admissão a todas as requisições HTTP,
+    como os before_request do main.py.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = Headers(scope=scope).get("authorization")
+        denied = check_access(scope["path"], token)
+        if denied:
+            payload, status = denied
+            await JSONResponse(payload, status_code=status)(scope, receive, send)
+            return
+        if is_public_path(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        cost = 1
+        if scope["method"] == "POST":
+            body, receive = await buffer_body(receive)
+            try:
+                cost = request_cost(json.loads(body))
+            except ValueError:
+                pass
+        loop = asyncio.get_running_loop()
+        try:
+            admission = await loop.run_in_executor(admission_executor, admit_request, cache, resolve_token(token), cost)
+        except AdmissionRejected as e:
+            response = JSONResponse(e.payload(), status_code=429, headers={"Retry-After": str(e.retry_after)})
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if admission is not None:
+                loop.run_in_executor(admission_executor, release_request, cache, admission)
+
+
+def route_name(scope):
+    # Nome da rota (como request.endpoint no Flask): caminhos sem rota não criam séries novas
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.name
+    return "unknown"
+
+
+class MetricsMiddleware:
+    """
+    Latência, status e resumo nos logs de cada requisição HTTP, como os hooks do main.py.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        endpoint = route_name(scope)
+        set_endpoint(endpoint)
+        begin_request()
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                # Marcador de frescor, como o mark_freshness do main.py
+                warnings = freshness_warnings(get_request_counts())
+                if warnings:
+                    message = dict(message, headers=[
+                        *message.get("headers", []), *((b"warning", warning.encode()) for warning in warnings)
+                    ])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            observe("request_seconds", time.perf_counter() - started, endpoint=endpoint)
+            inc("requests_total", endpoint=endpoint, status=status["code"])
+            if not scope["path"].startswith("/metrics"):
+                log_request_summary(logger, method=scope["method"], path=scope["path"], status=status["code"])
+
+
+async def fetch_ticker_data(tickers, sections):
+    """
+    Equivalente assíncrono de fetch_multiple_ticker_data.
+    """
+    loop = asyncio.get_running_loop()
+    normalized_tickers = ensure_sa_suffix(tickers)
+    cached_data, missing_tickers, stale_tickers = await aget_cached_tickers(
+        redis_client, cache, normalized_tickers, sections
+    )
+    # Ranking de acesso e fila de atualização não precisam atrasar a resposta
+    loop.run_in_executor(executor, track_cache_lookup, cache, list(cached_data), stale_tickers, sections)
+
+    if not missing_tickers:
+        return cached_data
+
+    async with fetch_slot():
+        # Contexto copiado: contadores do resumo da requisição seguem para a thread
+        fetched_data = await loop.run_in_executor(
+            executor, contextvars.copy_context().run, fetch_missing_ticker_data, missing_tickers, cache, sections
+        )
+    return {**cached_data, **fetched_data}
+
+
+async def check_etag(request, tickers, sections, *variant):
+    """
+    Requisição condicional, com o mesmo match_etag do main.py (numa thread).
+    As versões fixadas pelo ETag valem também para a leitura do corpo, que
+    assim nunca sai mais antiga que ele.
+
+    Returns:
+        tuple: (etag ou None, True se a resposta deve ser um 304).
+    """
+    context = contextvars.copy_context()
+    if_none_match = parse_etags(request.headers.get("if-none-match"))
+    etag, unchanged = await asyncio.get_running_loop().run_in_executor(
+        executor, context.run, match_etag, cache, if_none_match, tickers, sections, *variant
+    )
+    pin_section_versions(context.run(pinned_section_versions))
+    return etag, unchanged
+
+
+def etag_headers(etag):
+    return {"ETag": quote_etag(etag, weak=True)} if etag is not None else None
+
+
+def formatted(sections, format_result):
+    async def resolve(tickers, **options):
+        tickers_data = await fetch_ticker_data(tickers, sections)
+        return [format_result(ticker, data, **options) for ticker, data in tickers_data.items()]
+
+    return resolve
+
+
+async def classify_tickers(tickers, tickers_data=None):
+    """
+    Equivalente assíncrono de iter_classified_assets. Com `tickers_data`
+    (dados que já incluem o `info`), os pendentes não são buscados de novo.
+    """
+    normalized_tickers = list(dict.fromkeys(ensure_sa_suffix(tickers)))
+    known_invalid, remaining = await asplit_known_invalid(redis_client, cache, normalized_tickers)
+    count_request(known_invalid=len(known_invalid))
+    cached_verdicts, _, _ = await aget_cached_tickers(redis_client, cache, remaining, CLASSIFICATION_SECTIONS)
+    by_code = code_classifiable(remaining, cached_verdicts)
+    cached_info = await aget_cached_sections(redis_client, cache, by_code, INFO_SECTIONS) if by_code else {}
+    resolved, pending = preclassify(normalized_tickers, cached_verdicts, cached_info, known_invalid)
+    if pending:
+        if tickers_data is not None:
+            tickers_data = {ticker: tickers_data.get(ticker) for ticker in pending}
+        else:
+            tickers_data = await fetch_ticker_data(pending, INFO_SECTIONS)
+        classified = {ticker: classify_ticker_data(ticker, data) for ticker, data in tickers_data.items()}
+        asyncio.get_running_loop().run_in_executor(
+            executor, cache_classifications, cache, list(classified.values())
+        )
+        resolved.update(classified)
+    return [resolved[ticker] for ticker in normalized_tickers if ticker in resolved]
+
+
+def ticker_endpoint(name, resolve, failure, projectable=False, conditional=None):
+    """
+    Rota POST de tickers. Com `conditional` (as seções da resposta), responde
+    a requisições condicionais (ETag/If-None-Match) como o main.py.
+    """
+    async def endpoint(request):
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        tickers = data.get("tickers") if isinstance(data, dict) else None
+
+        if not tickers or not isinstance(tickers, list):
+            logger.warning("Invalid request: 'tickers' is either missing or not a list.")
+            return JSONResponse({"error": "Tickers must be provided as a list"}, status_code=400)
+
+        options = {}
+        if projectable:
+            # Projeção do `info` (`fields` no corpo ou em ?fields=a,b), como no main.py
+            try:
+                options["fields"] = parse_fields(data.get("fields", request.query_params.get("fields")))
+            except ValueError as e:
+                logger.warning("Invalid request: %s", e)
+                return JSONResponse({"error": str(e)}, status_code=400)
+
+        observe("batch_size", len(tickers), endpoint=name)
+        count_request(tickers=len(tickers))
+        try:
+            etag = None
+            if conditional is not None:
+                variant = (name, options["fields"]) if projectable else (name,)
+                etag, unchanged = await check_etag(request, tickers, conditional, *variant)
+                if unchanged:
+                    return Response(status_code=304, headers=etag_headers(etag))
+            results = await resolve(tickers, **options)
+            with observe_stage("render"):
+                return JSONResponse(results, headers=etag_headers(etag))
+        except FetchSlotTimeout as e:
+            return e.response()
+        except Exception as e:
+            logger.error(f"Error in {name}: {str(e)}", exc_info=True)
+            return JSONResponse({"error": f"{failure}: {str(e)}"}, status_code=500)
+
+    return Route(f"/{name}", endpoint, methods=["POST"], name=name)
+
+
+async def batch_views(tickers, views):
+    """
+    Equivalente assíncrono de fetch_batch_views.
+    """
+    normalized_tickers = list(dict.fromkeys(ensure_sa_suffix(tickers)))
+    sections = batch_sections(views)
+    tickers_data = await fetch_ticker_data(normalized_tickers, sections) if sections else {}
+    classifications = {}
+    if "classification" in views:
+        verdicts = await classify_tickers(normalized_tickers, tickers_data if "info" in sections else None)
+        classifications = {item["ticker"]: item for item in verdicts}
+    return format_batch(views, normalized_tickers, tickers_data, classifications)
+
+
+async def batch(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    tickers = data.get("tickers") if isinstance(data, dict) else None
+
+    if not tickers or not isinstance(tickers, list):
+        logger.warning("Invalid request: 'tickers' is either missing or not a list.")
+        return JSONResponse({"error": "Tickers must be provided as a list"}, status_code=400)
+
+    views = parse_batch_views(data.get("views"))
+    if views is None:
+        logger.warning("Invalid request: 'views' is either missing or has unknown views.")
+        return JSONResponse({"error": f"Views must be a list with any of: {', '.join(BATCH_VIEWS)}"}, status_code=400)
+
+    observe("batch_size", len(tickers), endpoint="batch")
+    count_request(tickers=len(tickers))
+    try:
+        results = await batch_views(tickers, views)
+        with observe_stage("render"):
+            return JSONResponse(results)
+    except FetchSlotTimeout as e:
+        return e.response()
+    except Exception as e:
+        logger.error(f"Error in batch: {str(e)}", exc_info=True)
+        return JSONResponse({"error": f"Failed to fetch batch: {str(e)}"}, status_code=500)
+
+
+async def history(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    tickers = data.get("tickers") if isinstance(data, dict) else None
+
+    if not tickers or not isinstance(tickers, list):
+        logger.warning("Invalid request: 'tickers' is either missing or not a list.")
+        return JSONResponse({"error": "Tickers must be provided as a list"}, status_code=400)
+
+    try:
+        start_day, end_day = parse_history_range(data.get("start"), data.get("end"))
+    except ValueError as e:
+        logger.warning("Invalid request: %s", e)
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    observe("batch_size", len(tickers), endpoint="fetch_history")
+    count_request(tickers=len(tickers))
+    try:
+        # Leituras de fatias e buscas de intervalos ausentes rodam no pool de threads
+        results = await asyncio.get_running_loop().run_in_executor(
+            executor,
+            contextvars.copy_context().run,
+            fetch_history,
+            ensure_sa_suffix(tickers),
+            cache,
+            start_day,
+            end_day,
+        )
+        with observe_stage("render"):
+            return JSONResponse(list(results.values()))
+    except Exception as e:
+        logger.error(f"Error in fetch_history: {str(e)}", exc_info=True)
+        return JSONResponse({"error": f"Failed to fetch history: {str(e)}"}, status_code=500)
+
+
+async def metrics(request):
+    text = await asyncio.get_running_loop().run_in_executor(executor, render_metrics, cache)
+    return PlainTextResponse(text, media_type="text/plain; version=0.0.4")
+
+
+async def ticker_index(request):
+    try:
+        limit = max(1, int(request.query_params.get("limit", 100)))
+    except ValueError:
+        return JSONResponse({"error": "limit must be an integer"}, status_code=400)
+
+    try:
+        index = await asyncio.get_running_loop().run_in_executor(executor, get_ticker_index, cache, limit)
+        return JSONResponse(index)
+    except Exception as e:
+        logger.error(f"Error in ticker_index: {str(e)}", exc_info=True)
+        return JSONResponse({"error": f"Failed to read ticker index: {str(e)}"}, status_code=500)
+
+
+async def warmup_status(request):
+    try:
+        status = await asyncio.get_running_loop().run_in_executor(executor, get_warmup_status, cache)
+        return JSONResponse(status)
+    except Exception as e:
+        logger.error(f"Error in warmup_status: {str(e)}", exc_info=True)
+        return JSONResponse({"error": f"Failed to read warm-up status: {str(e)}"}, status_code=500)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await redis_client.aclose()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        ticker_endpoint(
+            "fetch_stock_info",
+            formatted(INFO_SECTIONS, format_stock_info),
+            "Failed to fetch stock info",
+            projectable=True,
+            conditional=INFO_SECTIONS,
+        ),
+        ticker_endpoint(
+            "fetch_market_price",
+            formatted(QUOTE_SECTIONS, format_market_price),
+            "Failed to fetch market prices",
+            conditional=QUOTE_SECTIONS,
+        ),
+        ticker_endpoint("classify_assets", classify_tickers, "Failed to classify assets"),
+        ticker_endpoint(
+            "fetch_asset_info",
+            formatted(INFO_SECTIONS, format_asset_info),
+            "Failed to fetch asset information",
+            conditional=INFO_SECTIONS,
+        ),
+        ticker_endpoint(
+            "fetch_recommendations",
+            formatted(RECOMMENDATION_SECTIONS, format_recommendations),
+            "Failed to fetch recommendations",
+            conditional=RECOMMENDATION_SECTIONS,
+        ),
+        Route("/fetch_history", history, methods=["POST"], name="fetch_history_endpoint"),
+        Route("/batch", batch, methods=["POST"]),
+        Route("/metrics", metrics, methods=["GET"]),
+        Route("/admin/ticker_index", ticker_index, methods=["GET"]),
+        Route("/admin/warmup", warmup_status, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
+app.add_middleware(AuthMiddleware)
+app.add_middleware(MetricsMiddleware)
@@ -0,0 +1,230 @@
+"""
+Substituto local e determinístico do yfinance para benchmarks offline.
+
+Expõe o mesmo subconjunto da API usado pelos serviços (yf.download com
+group_by="ticker" e yf.Ticker com info, recommendations,
+analyst_price_targets e growth_estimates), com latência e falhas
+configuráveis e contadores de chamadas ao "upstream".
+
+    from benchmarks import fake_yfinance
+    yahoo = fake_yfinance.install(latency=0.2, failure_rate=0.01)
+    import main  # importa services já com o substituto
+"""
+import logging
+import random
+import sys
+import threading
+import time
+import types
+import zlib
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+# Prefixo dos códigos tratados como inexistentes (erros de digitação, deslistados)
+INVALID_PREFIX = "ZZ"
+
+# Como no yfinance 1.7, os erros do yf.download só aparecem no logger "yfinance"
+_yf_logger = logging.getLogger("yfinance")
+
+_DOWNLOAD_COLUMNS = ["Open", "High", "Low", "Close", "Adj Close", "Volume"]
+
+
+class FakeYahoo:
+    """
+    Estado compartilhado do substituto: configuração e contadores.
+
+    Args:
+        latency (float): Latência base de cada chamada, em segundos.
+        jitter (float): Variação aleatória somada à latência (0..jitter).
+        failure_rate (float): Probabilidade de cada chamada levantar exceção.
+        seed (int): Semente do gerador, para execuções reproduzíveis.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, seed=42):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = {}
+        # Simula uma queda (rede, DNS): yf.download devolve colunas vazias e só registra o erro em log
+        self.outage = False
+        # Simula o limite do Yahoo: só os primeiros N tickers de cada yf.download recebem dados,
+        # os demais falham com YFRateLimitError (registrado em log, sem exceção)
+        self.rate_limit_after = None
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls = {}
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+    def call(self, name):
+        """Conta a chamada, aplica a latência e eventualmente falha."""
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            delay = self.latency + self._random.random() * self.jitter
+            fail = self._random.random() < self.failure_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise RuntimeError(f"Simulated upstream failure in {name}")
+
+
+def _price(ticker):
+    return 5 + zlib.crc32(ticker.encode()) % 10000 / 100
+
+
+def bar_price(ticker, day):
+    """Fechamento simulado de um ticker em um dia do histórico."""
+    return round(_price(ticker) + pd.Timestamp(day).toordinal() % 100 / 100, 2)
+
+
+def _names(ticker):
+    code = ticker.split(".")[0]
+    if code.endswith("11"):
+        # Sufixo 11: alterna entre FII, ETF e UNIT
+        kind = zlib.crc32(code.encode()) % 3
+        return [
+            (f"FII {code}", f"{code} Fundo de Investimento Imobiliário"),
+            (f"ISHARES {code}", f"iShares {code} Índice Fundo de Índice"),
+            (f"{code} UNT N2", f"{code} Participações S.A."),
+        ][kind]
+    return f"{code} ON NM", f"{code} S.A."
+
+
+def install(**config):
+    """
+    Registra o substituto como módulo `yfinance` em sys.modules.
+    Deve ser chamado antes de importar `services` ou `main`.
+
+    Returns:
+        FakeYahoo: Estado para ajustar latência/falhas e ler os contadores.
+    """
+    yahoo = FakeYahoo(**config)
+    # Existe no yfinance 1.7, mas o yf.download não o preenche mais
+    shared = types.SimpleNamespace(_ERRORS={})
+
+    def log_failures(errors):
+        # Mesmas linhas do yfinance 1.7: uma por ticker e o resumo ao fim da chamada
+        for ticker, reason in errors.items():
+            _yf_logger.error(f"${ticker}: {reason}")
+        if errors:
+            _yf_logger.error("\n%.f Failed download%s:" % (len(errors), "s" if len(errors) > 1 else ""))
+            by_reason = {}
+            for ticker, reason in errors.items():
+                by_reason.setdefault(reason, []).append(ticker)
+            for reason, tickers in by_reason.items():
+                _yf_logger.error(f"{tickers}: " + reason)
+
+    def download(tickers, period="1d", group_by="ticker", threads=True, progress=False, start=None, end=None, **kwargs):
+        yahoo.call("download")
+        tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+        errors = {}
+        if yahoo.outage:
+            for ticker in tickers:
+                if start is not None:
+                    # A consulta do fuso horário falha antes do histórico
+                    _yf_logger.error(
+                        f"Failed to get ticker '{ticker}' reason: "
+                        "ConnectionError('Failed to resolve query2.finance.yahoo.com')"
+                    )
+                    errors[ticker] = "possibly delisted; no timezone found"
+                else:
+                    # Com hide_exceptions (padrão), o erro de rede some e sobra a falta de dados
+                    errors[ticker] = "possibly delisted; no price data found  (period=1d)"
+            valid = []
+        else:
+            valid = [ticker for ticker in tickers if not ticker.startswith(INVALID_PREFIX)]
+            if yahoo.rate_limit_after is not None:
+                for ticker in tickers[yahoo.rate_limit_after:]:
+                    errors[ticker] = "YFRateLimitError('Too Many Requests. Rate limited. Try after a while.')"
+                valid = [ticker for ticker in valid if ticker not in errors]
+            for ticker in tickers:
+                if ticker not in valid and ticker not in errors:
+                    errors[ticker] = (
+                        "possibly delisted; no timezone found" if start is not None
+                        else "No data found, symbol may be delisted"
+                    )
+        log_failures(errors)
+
+        if start is not None:
+            # Histórico: um pregão por dia útil em [start, end), com preço determinístico por dia
+            index = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1) if end else pd.Timestamp.today())
+        else:
+            index = pd.DatetimeIndex([pd.Timestamp.today().normalize()])
+        if not valid:
+            # Como no yfinance: colunas de todos os tickers, sem nenhuma linha
+            index = pd.DatetimeIndex([])
+        # Tickers que falharam aparecem com colunas só de NaN
+        columns = pd.MultiIndex.from_product([tickers, _DOWNLOAD_COLUMNS])
+        rows = []
+        for day in index:
+            row = []
+            for ticker in tickers:
+                if ticker in valid:
+                    price = bar_price(ticker, day) if start is not None else _price(ticker)
+                    row += [price * 0.99, price * 1.01, price * 0.98, price, price, 1_000_000]
+                else:
+                    row += [np.nan] * len(_DOWNLOAD_COLUMNS)
+            rows.append(row)
+        return pd.DataFrame(
+            np.array(rows, dtype=float).reshape(len(index), len(columns)),
+            columns=columns,
+            index=index,
+        )
+
+    # Como no yfinance, cada propriedade é buscada uma vez por objeto Ticker
+    class Ticker:
+        def __init__(self, ticker):
+            self.ticker = ticker
+
+        @cached_property
+        def info(self):
+            yahoo.call("info")
+            short_name, long_name = _names(self.ticker)
+            return {
+                "symbol": self.ticker,
+                "shortName": short_name,
+                "longName": long_name,
+                "longBusinessSummary": f"{long_name} opera no mercado brasileiro. " * 5,
+                "quoteType": "EQUITY",
+                "currency": "BRL",
+                "currentPrice": _price(self.ticker),
+                **{f"metric{i:02d}": _price(self.ticker) * i for i in range(60)},
+            }
+
+        @cached_property
+        def recommendations(self):
+            yahoo.call("recommendations")
+            return pd.DataFrame({
+                "period": ["0m", "-1m", "-2m", "-3m"],
+                "strongBuy": [4, 4, 5, 5], "buy": [6, 6, 5, 5], "hold": [5, 5, 5, 4],
+                "sell": [0, 0, 0, 1], "strongSell": [0, 0, 0, 0],
+            })
+
+        @cached_property
+        def analyst_price_targets(self):
+            yahoo.call("analyst_price_targets")
+            price = _price(self.ticker)
+            return {"current": price, "high": price * 1.4, "low": price * 0.8, "mean": price * 1.1}
+
+        @cached_property
+        def growth_estimates(self):
+            yahoo.call("growth_estimates")
+            return pd.DataFrame(
+                {"stockTrend": [0.05, -0.02, 0.11, 0.08], "indexTrend": [0.01, 0.02, 0.03, 0.04]},
+                index=["0q", "+1q", "0y", "+1y"],
+            )
+
+    module = types.ModuleType("yfinance")
+    module.shared = shared
+    module.download = download
+    module.Ticker = Ticker
+    module.fake = yahoo
+    sys.modules["yfinance"] = module
+    return yahoo
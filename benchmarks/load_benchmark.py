@@ -0,0 +1,201 @@
+"""
+Benchmark de carga offline dos endpoints de tickers.
+
+Roda o app Flask (main.py) em processo, com o yfinance trocado por um
+substituto local (benchmarks/fake_yfinance.py) e o Redis por um servidor em
+memória (fakeredis) ou por um Redis local dedicado (--redis-url). Para cada
+endpoint, tamanho de lote e taxa de acerto de cache, dispara requisições
+concorrentes e relata latência p50/p99, requisições por segundo e chamadas
+ao upstream por requisição.
+
+Uso:
+    pip install fakeredis
+    python benchmarks/load_benchmark.py [--requests N] [--concurrency C]
+        [--batch-sizes 1,10,50] [--hit-ratios 0,0.5,1] [--latency 0.05]
+        [--failure-rate 0.01] [--redis-url redis://localhost:6379/15]
+
+Com --redis-url o banco indicado é esvaziado (FLUSHDB) entre os cenários.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os.path import abspath, dirname
+
+ROOT = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, dirname(abspath(__file__)))
+
+import fake_yfinance  # noqa: E402
+
+ENDPOINTS = [
+    "fetch_market_price",
+    "fetch_stock_info",
+    "classify_assets",
+    "fetch_asset_info",
+    "fetch_recommendations",
+]
+# Sufixos B3 sorteados para os tickers sintéticos (ações ON/PN e sufixo 11)
+SUFFIXES = ["3", "4", "11"]
+
+
+def ticker_names(start=0):
+    """Códigos B3 sintéticos e únicos: AAAA3, AAAB4, AAAC11, ..."""
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXY"  # 'Z' fica para os inválidos
+    for i in itertools.count(start):
+        code = "".join(letters[(i // len(letters) ** p) % len(letters)] for p in (3, 2, 1, 0))
+        yield code + SUFFIXES[i % len(SUFFIXES)]
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def load_app(redis_url):
+    """Importa main.py com o agendador desligado e o Redis substituído."""
+    os.environ["REFRESH_ENABLED"] = "0"
+    import main
+
+    if redis_url:
+        import redis
+
+        client = redis.Redis.from_url(redis_url)
+    else:
+        try:
+            import fakeredis
+        except ImportError:
+            sys.exit("fakeredis não instalado: pip install fakeredis (ou use --redis-url)")
+        client = fakeredis.FakeRedis()
+
+    backend = main.cache.cache
+    backend._read_client = backend._write_client = client
+    return main, client
+
+
+def reset_state(main, client):
+    from services.cache_service import LocalCache
+
+    client.flushdb()
+    local = getattr(main.cache, "local_cache", None)
+    if local is not None:
+        main.cache.local_cache = LocalCache(local.max_entries, local.max_bytes, local.max_ttl)
+
+
+def run_scenario(main, client, yahoo, endpoint, batch_size, hit_ratio, args):
+    """
+    Executa um cenário e devolve as métricas.
+
+    Cada requisição mistura tickers já aquecidos no cache (hit_ratio do lote)
+    com tickers nunca vistos, que obrigatoriamente vão ao upstream.
+    """
+    reset_state(main, client)
+    fresh = ticker_names()
+    fresh_lock = threading.Lock()
+    headers = {"Authorization": args.token, "Content-Type": "application/json"}
+
+    hits = round(batch_size * hit_ratio)
+    warm = [next(fresh) for _ in range(max(hits, 1) * 4)]
+    if hits:
+        # Aquece o cache sem latência, fora da medição
+        latency, failure_rate = yahoo.latency, yahoo.failure_rate
+        yahoo.latency, yahoo.failure_rate = 0.0, 0.0
+        main.app.test_client().post(f"/{endpoint}", json={"tickers": warm}, headers=headers)
+        yahoo.latency, yahoo.failure_rate = latency, failure_rate
+    yahoo.reset_counters()
+
+    def request(i):
+        client_app = main.app.test_client()
+        with fresh_lock:
+            misses = [next(fresh) for _ in range(batch_size - hits)]
+        # Os mesmos códigos inválidos se repetem entre requisições, como erros de digitação comuns
+        invalid = [f"{fake_yfinance.INVALID_PREFIX}{j:02d}3" for j in range(int(args.invalid_ratio * batch_size))]
+        tickers = warm[(i * hits) % len(warm):][:hits] + misses[len(invalid):] + invalid
+        started = time.perf_counter()
+        response = client_app.post(f"/{endpoint}", json={"tickers": tickers}, headers=headers)
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(request, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results]
+    return {
+        "endpoint": endpoint,
+        "batch_size": batch_size,
+        "hit_ratio": hit_ratio,
+        "requests": len(results),
+        "errors": sum(1 for _, status in results if status != 200),
+        "req_per_sec": len(results) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "upstream_per_request": yahoo.total_calls() / len(results),
+        "upstream_calls": dict(yahoo.calls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--batch-sizes", default="1,10,50")
+    parser.add_argument("--hit-ratios", default="0,0.5,1")
+    parser.add_argument("--requests", type=int, default=50, help="requisições por cenário")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05, help="latência de cada chamada ao upstream (s)")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--invalid-ratio", type=float, default=0.0, help="fração de tickers inexistentes por lote")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--redis-url", default=None)
+    parser.add_argument(
+        "--batch-window", type=float, default=None,
+        help="UPSTREAM_BATCH_WINDOW_MS do app (0 desliga o agrupamento de yf.download)",
+    )
+    parser.add_argument("--token", default=None, help="token de tokens.py (default: o primeiro)")
+    parser.add_argument("--json", action="store_true", help="imprime os resultados em JSON")
+    parser.add_argument("--log-level", default="CRITICAL", help="nível de log do app durante a medição")
+    args = parser.parse_args()
+
+    yahoo = fake_yfinance.install(
+        latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate, seed=args.seed
+    )
+    if args.batch_window is not None:
+        os.environ["UPSTREAM_BATCH_WINDOW_MS"] = str(args.batch_window)
+    app_module, client = load_app(args.redis_url)
+    logging.getLogger().setLevel(args.log_level.upper())
+    if args.token is None:
+        from tokens import tokens
+
+        args.token = tokens[0]["token"]
+
+    results = []
+    if not args.json:
+        print(
+            f"{'endpoint':<22} {'batch':>5} {'hit%':>5} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p99 ms':>8} {'upstream/req':>12} {'errors':>6}"
+        )
+    for endpoint in args.endpoints.split(","):
+        for batch_size in (int(size) for size in args.batch_sizes.split(",")):
+            for hit_ratio in (float(ratio) for ratio in args.hit_ratios.split(",")):
+                result = run_scenario(app_module, client, yahoo, endpoint, batch_size, hit_ratio, args)
+                results.append(result)
+                if not args.json:
+                    print(
+                        f"{endpoint:<22} {batch_size:>5} {hit_ratio * 100:>5.0f} {result['req_per_sec']:>8.1f} "
+                        f"{result['p50_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                        f"{result['upstream_per_request']:>12.2f} {result['errors']:>6}"
+                    )
+    if args.json:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark dos formatos de valor do cache de tickers.
+
+Compara tamanho, tempo de codificação e de decodificação de cada combinação
+de codec e compressão sobre payloads representativos da B3 (ação com
+cobertura de analistas, FII e ETF), no mesmo envelope gravado pelo
+cache_ticker_data.
+
+Uso:
+    python benchmarks/serialization_benchmark.py [--iterations N]
+"""
+import argparse
+import pickle
+import sys
+import time
+import timeit
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+from services.serialization_service import decode_value, encode_value, msgpack  # noqa: E402
+
+SUMMARY = (
+    "A Petróleo Brasileiro S.A. - Petrobras explora, produz e comercializa petróleo e gás natural "
+    "no Brasil e internacionalmente. A empresa opera por meio dos segmentos de Exploração e Produção; "
+    "Refino, Transporte e Comercialização; Gás e Energia; e Corporativo e Outros Negócios. "
+) * 4
+
+
+def _envelope(value):
+    return {"data": value, "fetched_at": time.time()}
+
+
+def stock_payloads():
+    """Seções de uma ação líquida com cobertura de analistas (ex.: PETR4.SA)."""
+    info = {
+        "address1": "Avenida Henrique Valadares, 28", "city": "Rio de Janeiro", "state": "RJ",
+        "zip": "20231-030", "country": "Brazil", "phone": "55 21 3224 4477",
+        "website": "https://petrobras.com.br", "industry": "Oil & Gas Integrated",
+        "sector": "Energy", "longBusinessSummary": SUMMARY, "fullTimeEmployees": 41411,
+        "companyOfficers": [
+            {"maxAge": 1, "name": f"Officer {i}", "age": 50 + i, "title": "Executive Officer",
+             "yearBorn": 1970 + i, "fiscalYear": 2024, "totalPay": 1_500_000 + i * 1000}
+            for i in range(10)
+        ],
+        "currency": "BRL", "exchange": "SAO", "quoteType": "EQUITY", "symbol": "PETR4.SA",
+        "shortName": "PETROBRAS   PN      N2", "longName": "Petróleo Brasileiro S.A. - Petrobras",
+        "financialCurrency": "BRL", "recommendationKey": "buy", "market": "br_market",
+        "timeZoneFullName": "America/Sao_Paulo", "timeZoneShortName": "BRT",
+    }
+    # Campos numéricos típicos do `info` do Yahoo (preços, múltiplos, margens...)
+    for i in range(100):
+        info[f"metric{i:03d}"] = 37.42 + i * 0.137
+    recommendations = pd.DataFrame({
+        "period": ["0m", "-1m", "-2m", "-3m"],
+        "strongBuy": [4, 4, 5, 5], "buy": [6, 6, 5, 5], "hold": [5, 5, 5, 4],
+        "sell": [0, 0, 0, 1], "strongSell": [0, 0, 0, 0],
+    }).to_dict()
+    price_targets = {"current": 37.42, "high": 55.0, "low": 30.0, "mean": 45.3, "median": 45.0}
+    growth_estimates = pd.DataFrame(
+        {"stockTrend": [0.05, -0.02, 0.11, 0.08], "indexTrend": [None, None, None, None]},
+        index=["0q", "+1q", "0y", "+1y"],
+    )
+    return {
+        "info": info,
+        "recommendations": recommendations,
+        "price_targets": price_targets,
+        "growth_estimates": growth_estimates,
+        "quote": {"price": 37.42, "open": 37.1, "high": 37.8, "low": 36.9, "volume": 41_235_600},
+    }
+
+
+def fii_payloads():
+    """Seções de um FII sem cobertura de analistas (ex.: KNRI11.SA)."""
+    info = {
+        "quoteType": "EQUITY", "symbol": "KNRI11.SA", "shortName": "FII KINEA RICI",
+        "longName": "Kinea Renda Imobiliária Fundo de Investimento Imobiliário",
+        "currency": "BRL", "exchange": "SAO", "market": "br_market",
+        "currentPrice": 158.2, "previousClose": 157.9, "open": 158.0, "dayLow": 157.5,
+        "dayHigh": 158.9, "volume": 38_120, "averageVolume": 41_000,
+        "fiftyTwoWeekLow": 140.1, "fiftyTwoWeekHigh": 165.0, "dividendYield": 0.078,
+    }
+    return {
+        "info": info,
+        "recommendations": {},
+        "price_targets": {},
+        "growth_estimates": pd.DataFrame(),
+        "quote": {"price": 158.2, "open": 158.0, "high": 158.9, "low": 157.5, "volume": 38_120},
+    }
+
+
+def formats():
+    """Combinações avaliadas: (rótulo, encode, decode)."""
+    legacy_dumps = lambda value: b"!" + pickle.dumps(value, pickle.HIGHEST_PROTOCOL)  # noqa: E731
+    legacy_loads = lambda raw: pickle.loads(raw[1:])  # noqa: E731
+    combos = [("legacy (Flask-Caching pickle)", legacy_dumps, legacy_loads)]
+    codecs = ["pickle"] + (["msgpack"] if msgpack else [])
+    for codec in codecs:
+        for compression in ("none", "zlib"):
+            combos.append((
+                f"{codec}+{compression}",
+                lambda value, c=codec, z=compression: encode_value(value, codec=c, compression=z),
+                lambda raw: decode_value(raw, legacy_loads),
+            ))
+    return combos
+
+
+def run(iterations):
+    payloads = {"stock (PETR4)": stock_payloads(), "fii (KNRI11)": fii_payloads()}
+    print(f"{'payload':<16} {'format':<30} {'bytes':>8} {'encode us':>10} {'decode us':>10}")
+    for payload_name, sections in payloads.items():
+        values = [_envelope(value) for value in sections.values()]
+        for label, dumps, loads in formats():
+            encoded = [dumps(value) for value in values]
+            size = sum(len(raw) for raw in encoded)
+            encode_time = timeit.timeit(lambda: [dumps(value) for value in values], number=iterations)
+            decode_time = timeit.timeit(lambda: [loads(raw) for raw in encoded], number=iterations)
+            print(
+                f"{payload_name:<16} {label:<30} {size:>8} "
+                f"{encode_time / iterations * 1e6:>10.1f} {decode_time / iterations * 1e6:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    run(parser.parse_args().iterations)
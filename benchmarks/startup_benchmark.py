@@ -0,0 +1,129 @@
+"""
+Benchmark de inicialização (cold start) do app.
+
+Cada amostra roda em um processo Python novo e mede o `import main` (o que
+um worker do gunicorn faz sem preload), a memória residente após o boot, o tempo
+da primeira requisição a /apispec.json e /docs/ e o custo adiado da
+primeira busca no Yahoo (import do yfinance/pandas).
+
+Modos:
+    prebuilt  spec OpenAPI pré-compilada (docs/build_apispec.py), imports sob demanda
+    flasgger  sem o artefato: YAML + flasgger montados na inicialização
+    eager     como antes: flasgger e yfinance/pandas importados no boot
+
+Uso:
+    python benchmarks/startup_benchmark.py [--runs 5] [--modes prebuilt,flasgger,eager] [--json]
+
+Nenhuma conexão é aberta: o Redis só é contatado na primeira leitura de
+cache, e as rotas medidas não leem cache.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from os.path import abspath, dirname, join
+
+ROOT = dirname(dirname(abspath(__file__)))
+MODES = ["prebuilt", "flasgger", "eager"]
+
+# Executado em um processo novo por amostra
+CHILD = r"""
+import json, os, resource, sys, time
+sys.path.insert(0, os.environ["BENCH_ROOT"])
+started = time.perf_counter()
+if os.environ["BENCH_MODE"] == "eager":
+    import flasgger, pandas, yfinance, yaml
+import main
+import_seconds = time.perf_counter() - started
+pandas_loaded = "pandas" in sys.modules
+boot_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+client = main.app.test_client()
+started = time.perf_counter()
+assert client.get("/apispec.json").status_code == 200
+assert client.get("/docs/").status_code == 200
+docs_seconds = time.perf_counter() - started
+
+started = time.perf_counter()
+from services import preload_upstream_modules
+preload_upstream_modules()
+upstream_import_seconds = time.perf_counter() - started
+
+print(json.dumps({
+    "import_seconds": import_seconds,
+    "boot_rss_mb": boot_rss_mb,
+    "pandas_loaded": pandas_loaded,
+    "docs_seconds": docs_seconds,
+    "upstream_import_seconds": upstream_import_seconds,
+}))
+"""
+
+
+def build_spec(path):
+    subprocess.run(
+        [sys.executable, join(ROOT, "docs", "build_apispec.py"), "--output", path],
+        check=True, stdout=subprocess.DEVNULL,
+    )
+
+
+def run_sample(mode, spec_path):
+    env = dict(
+        os.environ,
+        BENCH_ROOT=ROOT,
+        BENCH_MODE=mode,
+        OPENAPI_SPEC_PATH=spec_path if mode == "prebuilt" else join(ROOT, "docs", "missing-apispec.json"),
+        REFRESH_ENABLED="0",
+        METRICS_ENABLED="0",
+        LOG_LEVEL="CRITICAL",
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", CHILD], env=env, cwd=ROOT, check=True, capture_output=True, text=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--json", action="store_true", help="Saída em JSON")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        spec_path = join(tmp, "apispec.json")
+        build_spec(spec_path)
+        for mode in args.modes.split(","):
+            samples = [run_sample(mode, spec_path) for _ in range(args.runs)]
+            results.append({
+                "mode": mode,
+                "runs": args.runs,
+                "import_ms_median": round(statistics.median(s["import_seconds"] for s in samples) * 1000, 1),
+                "import_ms_min": round(min(s["import_seconds"] for s in samples) * 1000, 1),
+                "boot_rss_mb": round(statistics.median(s["boot_rss_mb"] for s in samples), 1),
+                "pandas_at_boot": samples[0]["pandas_loaded"],
+                "first_docs_ms": round(statistics.median(s["docs_seconds"] for s in samples) * 1000, 1),
+                "first_fetch_import_ms": round(
+                    statistics.median(s["upstream_import_seconds"] for s in samples) * 1000, 1
+                ),
+            })
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = f"{'mode':<10} {'import p50':>11} {'import min':>11} {'rss MB':>8} {'pandas':>7} {'docs 1st':>9} {'fetch import':>13}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['mode']:<10} {r['import_ms_median']:>9.1f}ms {r['import_ms_min']:>9.1f}ms {r['boot_rss_mb']:>8.1f} "
+            f"{str(r['pandas_at_boot']):>7} {r['first_docs_ms']:>7.1f}ms {r['first_fetch_import_ms']:>11.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
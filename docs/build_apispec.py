@@ -0,0 +1,26 @@
+"""
+Compila a spec OpenAPI (YAML de docs/ + flasgger) em docs/apispec.json.
+
+Com o artefato presente, main.py serve /apispec.json e /docs/ sem importar
+o flasgger nem ler os YAML a cada boot de worker. Rode no build da imagem
+(ver Dockerfile) ou após editar qualquer YAML de docs/.
+
+Uso:
+    python docs/build_apispec.py [--output docs/apispec.json]
+"""
+import argparse
+import json
+import sys
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from services.docs_service import OPENAPI_SPEC_PATH, build_spec  # noqa: E402
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=OPENAPI_SPEC_PATH)
+    output = parser.parse_args().output
+    with open(output, "w") as file:
+        json.dump(build_spec(), file, sort_keys=True)
+    print(f"OpenAPI spec written to {output}")
@@ -0,0 +1,35 @@
+import os
+
+# Configuração do gunicorn (gunicorn -c gunicorn.conf.py main:app)
+
+bind = os.getenv("BIND", "0.0.0.0:80")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# Threads por worker (acima de 1, o gunicorn usa o worker gthread)
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+if threads > 1:
+    # Com requisições concorrentes no worker, os ausentes são agrupados em um só yf.download
+    os.environ.setdefault("UPSTREAM_BATCH_WINDOW_MS", "25")
+
+# O app é importado uma vez no master e os workers nascem de um fork dele:
+# módulos e a spec OpenAPI ficam em páginas compartilhadas (copy-on-write)
+# e cada worker fica pronto sem refazer os imports.
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+if preload_app:
+    # Threads de segundo plano só são iniciadas nos workers (post_fork)
+    os.environ["APP_PRELOAD"] = "1"
+
+
+def on_starting(server):
+    if preload_app:
+        # yfinance/pandas são importados sob demanda no app; no master eles
+        # são carregados antes do fork para que todos os workers os compartilhem
+        from services import preload_upstream_modules
+
+        preload_upstream_modules()
+
+
+def post_fork(server, worker):
+    if preload_app:
+        import main
+
+        main.start_background_tasks()
@@ -1,11 +1,27 @@
+import os
 import sys
-import yaml
 from os.path import dirname, abspath
-from flask import Flask, request, jsonify
-from flasgger import Swagger
-from os.path import join, dirname
-import pandas as pd
-from services import authenticate, setup_logger, initialize_cache, fetch_multiple_ticker_data, classify_asset_list
+import time
+from functools import partial
+from flask import Flask, Response, g, request, jsonify, stream_with_context
+from services import authenticate, setup_logger, initialize_cache, start_persistent_cache, fetch_multiple_ticker_data, iter_ticker_data, iter_classified_assets, refresh_tickers, start_refresh_scheduler, get_ticker_index
+from services import inc, observe, observe_stage, render_metrics, set_endpoint, start_metrics_flusher
+from services import begin_request, current_request_stats, get_request_counts, log_request_summary, setup_docs
+from services import BATCH_VIEWS, fetch_batch_views, parse_batch_views
+from services import FastJSONProvider, fetch_stock_info_fragments, json_array, parse_fields
+from services import freshness_warnings, match_etag, pin_section_versions
+from services import ensure_sa_suffix, fetch_history, parse_history_range
+from services import get_warmup_status, start_warmup_scheduler
+from services import AdmissionRejected, admit_request, is_public_path, release_request, request_cost, resolve_token
+from services import (
+    QUOTE_SECTIONS,
+    INFO_SECTIONS,
+    RECOMMENDATION_SECTIONS,
+    format_asset_info,
+    format_market_price,
+    format_recommendations,
+    format_stock_info,
+)
 
 
 
@@ -13,38 +29,42 @@ sys.path.insert(0, dirname(abspath(__file__)))
 
 # Inicialização do app e serviços
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 cache = initialize_cache(app)
 logger = setup_logger()
 
 
-# Swagger configuration
-swagger_config = {
-    "headers": [],
-    "specs": [
-        {
-            "endpoint": "apispec",
-            "route": "/apispec.json",
-            "rule_filter": lambda rule: True,
-            "model_filter": lambda tag: True,
-        }
-    ],
-    "swagger_ui": True,
-    "specs_route": "/docs/",
-}
-swagger_docs = {"swagger": "2.0", "info": {"title": "API Documentation", "version": "1.0"}, "paths": {}}
-for doc_name in ['fetch_stock_info', 'fetch_market_price', 'classify_assets', 'fetch_asset_info']:
-    file_path = join(dirname(__file__), f"docs/{doc_name}.yaml")
-    try:
-        with open(file_path, 'r') as file:
-            doc_content = yaml.safe_load(file)
-            if doc_content and "paths" in doc_content:
-                swagger_docs["paths"].update(doc_content["paths"])
-            else:
-                logger.error(f"Invalid or empty YAML content in {file_path}")
-    except Exception as e:
-        logger.error(f"Error loading YAML file {file_path}: {e}")
+def start_background_tasks():
+    """
+    Inicia as threads do processo (agendador de atualização, envio de métricas,
+    gravação da camada persistente e aquecimento agendado).
+    Threads não sobrevivem ao fork: com preload, o gunicorn.conf.py chama esta
+    função em cada worker (post_fork) em vez de no import do master.
+    """
+    start_refresh_scheduler(cache, refresh_tickers)
+    start_metrics_flusher(cache)
+    start_persistent_cache(cache)
+    start_warmup_scheduler(cache)
+
+
+if os.getenv("APP_PRELOAD") != "1":
+    start_background_tasks()
+
 
-swagger = Swagger(app, config=swagger_config, template=swagger_docs)
+# Documentação: spec pré-compilada (docs/apispec.json) ou YAML + flasgger
+setup_docs(app)
+
+# Rotas sem resumo de requisição nos logs (documentação, estáticos e scrape)
+QUIET_PATHS = ("/docs", "/apispec", "/flasgger_static", "/static", "/metrics")
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    set_endpoint(request.endpoint or "unknown")
+    begin_request()
+    # Versões fixadas por um ETag de requisição anterior nesta thread não valem mais
+    pin_section_versions(None)
 
 
 @app.before_request
@@ -52,10 +72,118 @@ def apply_auth():
     return authenticate()
 
 
+@app.before_request
+def apply_admission():
+    # Limites por token (concorrência, orçamento em tickers e prioridade sob sobrecarga)
+    if is_public_path(request.path):
+        return None
+    identity = resolve_token(request.headers.get("Authorization"))
+    try:
+        g.admission = admit_request(cache, identity, request_cost(request.get_json(silent=True)))
+    except AdmissionRejected as e:
+        response = jsonify(e.payload())
+        response.headers["Retry-After"] = str(e.retry_after)
+        return response, 429
+    return None
+
+
+@app.teardown_request
+def release_admission(exc):
+    # Roda também ao fim das respostas em streaming
+    release_request(cache, g.pop("admission", None))
+
+
+@app.after_request
+def record_request_metrics(response):
+    endpoint = request.endpoint or "unknown"
+    inc("requests_total", endpoint=endpoint, status=response.status_code)
+    batch_size = None
+    if request.method == "POST":
+        data = request.get_json(silent=True)
+        tickers = data.get("tickers") if isinstance(data, dict) else None
+        if isinstance(tickers, list):
+            batch_size = len(tickers)
+            observe("batch_size", batch_size, endpoint=endpoint)
+
+    started = g.request_started
+    stats = current_request_stats()
+    summary = None
+    if not request.path.startswith(QUIET_PATHS):
+        summary = dict(method=request.method, path=request.path, status=response.status_code, tickers=batch_size)
+
+    def finish():
+        observe("request_seconds", time.perf_counter() - started, endpoint=endpoint)
+        if summary is not None:
+            log_request_summary(logger, stats, **summary)
+
+    if response.is_streamed:
+        # Em streaming o corpo ainda vai ser gerado (e contado): o resumo sai
+        # quando o servidor fecha a resposta
+        response.call_on_close(finish)
+    else:
+        finish()
+    return response
+
+
+@app.after_request
+def mark_freshness(response):
+    # Marcador de frescor (roda antes do resumo, que zera os contadores):
+    # dados vencidos servidos do cache e tickers que o Yahoo não pôde atualizar
+    # (circuito aberto ou limite de chamadas). Respostas em streaming já
+    # enviaram os headers e não recebem o marcador.
+    for warning in freshness_warnings(get_request_counts()):
+        response.headers.add("Warning", warning)
+    return response
+
+
+def wants_stream():
+    # Modo streaming (NDJSON) opcional: header Accept ou query ?stream=1
+    accept = request.headers.get("Accept", "")
+    return "application/x-ndjson" in accept or request.args.get("stream", "").lower() in ("1", "true")
+
+
+def stream_ticker_results(tickers, sections, format_result):
+    # Emite uma linha JSON por ticker assim que ele é resolvido:
+    # acertos de cache primeiro, depois buscas no Yahoo na ordem de conclusão.
+    return stream_results(
+        format_result(ticker, data) for ticker, data in iter_ticker_data(tickers, cache, sections)
+    )
+
+
+def check_etag(tickers, sections, *variant):
+    # Requisição condicional: com If-None-Match igual às versões em cache,
+    # responde 304 sem ler os dados nem montar o corpo.
+    etag, unchanged = match_etag(cache, request.if_none_match, tickers, sections, request.endpoint, *variant)
+    if unchanged:
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return etag, response
+    return etag, None
+
+
+def with_etag(response, etag):
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def stream_results(results):
+    def generate():
+        try:
+            for result in results:
+                yield app.json.dumps(result) + "\n"
+        except Exception as e:
+            logger.error(f"Error while streaming results: {str(e)}", exc_info=True)
+            yield app.json.dumps({"error": f"Streaming interrupted: {str(e)}"}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
 @app.route('/fetch_stock_info', methods=['POST'])
 def fetch_stock_info():
     # Endpoint para buscar informações detalhadas de múltiplos tickers.
-    # Recebe uma lista de tickers no corpo da requisição.
+    # Recebe uma lista de tickers no corpo da requisição e, opcionalmente,
+    # `fields` (no corpo ou em ?fields=a,b) para projetar o `info` no servidor.
     # Retorna informações completas de cada ticker, como nome e detalhes.
     data = request.get_json()
     tickers = data.get('tickers')
@@ -63,31 +191,28 @@ def fetch_stock_info():
     if not tickers or not isinstance(tickers, list):
         logger.warning("Invalid request: 'tickers' is either missing or not a list.")
         return jsonify({'error': 'Tickers must be provided as a list'}), 400
-    
-    logger.info(f"Received request to fetch stock info for tickers: {tickers}")
 
     try:
-        # Busca os dados (cache + Yahoo para tickers ausentes)
-        logger.info("Fetching data using fetch_multiple_ticker_data.")
-        tickers_data = fetch_multiple_ticker_data(tickers, cache)
-
-          # Construir a resposta com os dados `info`
-        results = []
-        for ticker, data in tickers_data.items():
-            try:
-                if data and "info" in data:
-                    # Adicionar apenas o campo `info` ao resultado
-                    results.append(data["info"])
-                    logger.info(f"Info retrieved for ticker {ticker}.")
-                else:
-                    logger.warning(f"No valid data found for ticker: {ticker}")
-                    results.append({"ticker": ticker, "error": "No valid data found"})
-            except Exception as e:
-                logger.error(f"Error processing data for ticker {ticker}: {str(e)}")
-                results.append({"ticker": ticker, "error": "Processing error", "exception": str(e)})
-
-        logger.info(f"Successfully processed stock info for tickers: {tickers}")
-        return jsonify(results), 200
+        fields = parse_fields(data.get('fields', request.args.get('fields')))
+    except ValueError as e:
+        logger.warning("Invalid request: %s", e)
+        return jsonify({'error': str(e)}), 400
+
+    if wants_stream():
+        return stream_ticker_results(tickers, INFO_SECTIONS, partial(format_stock_info, fields=fields))
+
+    etag, unchanged = check_etag(tickers, INFO_SECTIONS, fields)
+    if unchanged:
+        return unchanged
+
+    try:
+        # Itens já codificados (cache de fragmentos ou recém-buscados),
+        # concatenados em um array sem passar pelo jsonify
+        fragments = fetch_stock_info_fragments(tickers, cache, fields)
+
+        with observe_stage("render"):
+            response = Response(json_array(fragments), mimetype="application/json")
+        return with_etag(response, etag), 200
 
     except Exception as e:
         logger.error(f"Error in fetch_stock_info: {str(e)}", exc_info=True)
@@ -107,37 +232,23 @@ def fetch_market_price():
         logger.warning("Invalid request: 'tickers' is either missing or not a list.")
         return jsonify({'error': 'Tickers must be provided as a list'}), 400
 
-    logger.info(f"Received request to fetch market prices for tickers: {tickers}")
+    if wants_stream():
+        return stream_ticker_results(tickers, QUOTE_SECTIONS, format_market_price)
+
+    etag, unchanged = check_etag(tickers, QUOTE_SECTIONS)
+    if unchanged:
+        return unchanged
 
     try:
         # Busca os dados (cache + Yahoo para tickers ausentes)
-        logger.info("Fetching data using fetch_multiple_ticker_data.")
-        tickers_data = fetch_multiple_ticker_data(tickers, cache)
+        tickers_data = fetch_multiple_ticker_data(tickers, cache, sections=QUOTE_SECTIONS)
 
         # Construir os resultados com os preços
-        results = []
-        for ticker, data in tickers_data.items():
-            try:
-                if data:
-                    # Acessar diretamente os dados serializáveis
-                    info = data.get("info", {})
-                    price = info.get("currentPrice", None)
-
-                    if price is not None:
-                        logger.info(f"Price retrieved for ticker {ticker}: {price}")
-                        results.append({"ticker": ticker, "price": price})
-                    else:
-                        logger.warning(f"Price not found for ticker: {ticker}")
-                        results.append({"ticker": ticker, "error": "Price not found"})
-                else:
-                    logger.warning(f"No valid data found for ticker: {ticker}")
-                    results.append({"ticker": ticker, "error": "No valid data found"})
-            except Exception as e:
-                logger.error(f"Error processing data for ticker {ticker}: {str(e)}")
-                results.append({"ticker": ticker, "error": "Processing error", "exception": str(e)})
-
-        logger.info("Market price fetch completed successfully.")
-        return jsonify(results), 200
+        results = [format_market_price(ticker, data) for ticker, data in tickers_data.items()]
+
+        with observe_stage("render"):
+            response = jsonify(results)
+        return with_etag(response, etag), 200
     except Exception as e:
         logger.error(f"Error in fetch_market_price: {str(e)}", exc_info=True)
         return jsonify({'error': f"Failed to fetch market prices: {str(e)}"}), 500
@@ -155,20 +266,18 @@ def classify_assets():
         logger.warning("Invalid request: 'tickers' is either missing or not a list.")
         return jsonify({'error': 'Tickers must be provided as a list'}), 400
 
-    logger.info(f"Received request to classify assets for tickers: {tickers}")
+    if wants_stream():
+        return stream_results(item for _, item in iter_classified_assets(tickers, cache))
 
     try:
-        # Busca dados dos tickers (cache + Yahoo para tickers ausentes)
-        logger.info("Fetching data using fetch_multiple_ticker_data.")
-        tickers_data = fetch_multiple_ticker_data(tickers, cache)
-
-        # Processar os dados para classificar os ativos
-        results = []
-        logger.info("Classifying tickers into categories.")
-        classify_asset_list(results, tickers_data)
-
-        logger.info("Classification completed successfully.")
-        return jsonify(results)
+        # Vereditos em cache e códigos B3 não ambíguos dispensam o Yahoo;
+        # os demais tickers buscam o `info` (cache + Yahoo para ausentes)
+        classified = dict(iter_classified_assets(tickers, cache))
+        results = [classified[ticker] for ticker in dict.fromkeys(ensure_sa_suffix(tickers)) if ticker in classified]
+
+        with observe_stage("render"):
+            response = jsonify(results)
+        return response
     except Exception as e:
         logger.error(f"Error in classify_assets: {str(e)}", exc_info=True)
         return jsonify({'error': f"Failed to classify assets: {str(e)}"}), 500
@@ -186,43 +295,23 @@ def fetch_asset_info():
         logger.warning("Invalid request: 'tickers' is either missing or not a list.")
         return jsonify({'error': 'Tickers must be provided as a list'}), 400
 
-    logger.info(f"Received request to classify assets for tickers: {tickers}")
-
-    if not tickers or not isinstance(tickers, list):
-        logger.warning("Invalid request: 'tickers' is either missing or not a list.")
-        return jsonify({'error': 'Tickers must be provided as a list'}), 400
+    if wants_stream():
+        return stream_ticker_results(tickers, INFO_SECTIONS, format_asset_info)
 
-    logger.info(f"Received request to fetch asset information for tickers: {tickers}")
+    etag, unchanged = check_etag(tickers, INFO_SECTIONS)
+    if unchanged:
+        return unchanged
 
     try:
         # Busca os dados (cache + Yahoo para tickers ausentes)
-        logger.info("Fetching data using fetch_multiple_ticker_data.")
-        tickers_data = fetch_multiple_ticker_data(tickers, cache)
+        tickers_data = fetch_multiple_ticker_data(tickers, cache, sections=INFO_SECTIONS)
 
         # Construir os resultados com as informações detalhadas
-        results = []
-        for ticker, data in tickers_data.items():
-            try:
-                if data:
-                    # Acessar diretamente o dicionário serializável
-                    info = data.get("info", {})
-                    results.append({
-                        "ticker": ticker,
-                        "longName": info.get("longName", "N/A"),
-                        "shortName": info.get("shortName", "N/A"),
-                        "longBusinessSummary": info.get("longBusinessSummary", "N/A"),
-                        "quoteType": info.get("quoteType", "N/A"),
-                    })
-                    logger.info(f"Information retrieved for ticker {ticker}.")
-                else:
-                    results.append({"ticker": ticker, "error": "No valid data found"})
-                    logger.warning(f"No valid data found for ticker {ticker}.")
-            except Exception as e:
-                logger.error(f"Error processing data for ticker {ticker}: {str(e)}")
-                results.append({"ticker": ticker, "error": "Processing error", "exception": str(e)})
-
-        logger.info("Asset information fetch completed successfully.")
-        return jsonify(results), 200
+        results = [format_asset_info(ticker, data) for ticker, data in tickers_data.items()]
+
+        with observe_stage("render"):
+            response = jsonify(results)
+        return with_etag(response, etag), 200
 
     except Exception as e:
         logger.error(f"Error in fetch_asset_info: {str(e)}", exc_info=True)
@@ -241,47 +330,120 @@ def fetch_recommendations():
         logger.warning("Invalid request: 'tickers' is either missing or not a list.")
         return jsonify({'error': 'Tickers must be provided as a list'}), 400
 
-    logger.info(f"Received request to fetch recommendations for tickers: {tickers}")
+    if wants_stream():
+        return stream_ticker_results(tickers, RECOMMENDATION_SECTIONS, format_recommendations)
+
+    etag, unchanged = check_etag(tickers, RECOMMENDATION_SECTIONS)
+    if unchanged:
+        return unchanged
 
     try:
         # Busca os dados do cache e do Yahoo Finance
-        logger.info("Fetching data using fetch_multiple_ticker_data.")
-        tickers_data = fetch_multiple_ticker_data(tickers, cache)
+        tickers_data = fetch_multiple_ticker_data(tickers, cache, sections=RECOMMENDATION_SECTIONS)
 
         # Construir a resposta com os dados obtidos
-        results = []
-        for ticker, data in tickers_data.items():
-            try:
-                if data:
-                    recommendations = data.get("recommendations", [])
-                    price_targets = data.get("price_targets", {})
-                    growth_estimates = data.get("growth_estimates", {})
-
-                    # Verifica e converte DataFrames para listas de dicionários
-                    if isinstance(recommendations, pd.DataFrame):
-                        recommendations = recommendations.to_dict(orient="records")
-                    if isinstance(growth_estimates, pd.DataFrame):
-                        growth_estimates = growth_estimates.to_dict(orient="records")
-
-                    results.append({
-                        "ticker": ticker,
-                        "recommendations": recommendations,
-                        "price_targets": price_targets,
-                        "growth_estimates": growth_estimates
-                    })
-                else:
-                    logger.warning(f"No valid data found for ticker: {ticker}")
-                    results.append({"ticker": ticker, "error": "No valid data found"})
-            except Exception as e:
-                logger.error(f"Error processing data for ticker {ticker}: {str(e)}")
-                results.append({"ticker": ticker, "error": "Processing error", "exception": str(e)})
-
-        logger.info(f"Successfully processed recommendations for tickers: {tickers}")
-        return jsonify(results), 200
+        results = [format_recommendations(ticker, data) for ticker, data in tickers_data.items()]
+
+        with observe_stage("render"):
+            response = jsonify(results)
+        return with_etag(response, etag), 200
 
     except Exception as e:
         logger.error(f"Error in fetch_recommendations: {str(e)}", exc_info=True)
         return jsonify({'error': f"Failed to fetch recommendations: {str(e)}"}), 500
 
+
+@app.route('/fetch_history', methods=['POST'])
+def fetch_history_endpoint():
+    # Endpoint para buscar o histórico diário (OHLCV) de múltiplos tickers.
+    # Recebe os tickers e, opcionalmente, `start` e `end` (YYYY-MM-DD).
+    # Retorna uma série colunar por ticker (dates, open, high, low, close, adj_close, volume).
+    data = request.get_json()
+    tickers = data.get('tickers')
+
+    if not tickers or not isinstance(tickers, list):
+        logger.warning("Invalid request: 'tickers' is either missing or not a list.")
+        return jsonify({'error': 'Tickers must be provided as a list'}), 400
+
+    try:
+        start_day, end_day = parse_history_range(data.get('start'), data.get('end'))
+    except ValueError as e:
+        logger.warning("Invalid request: %s", e)
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # Séries em cache no Redis; apenas os intervalos ausentes vêm do Yahoo
+        history = fetch_history(ensure_sa_suffix(tickers), cache, start_day, end_day)
+        results = list(history.values())
+
+        with observe_stage("render"):
+            response = jsonify(results)
+        return response, 200
+
+    except Exception as e:
+        logger.error(f"Error in fetch_history: {str(e)}", exc_info=True)
+        return jsonify({'error': f"Failed to fetch history: {str(e)}"}), 500
+
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    # Endpoint composto: várias visões (price, info, asset, classification,
+    # recommendations) para a mesma lista de tickers em uma só requisição.
+    # Os dados são resolvidos uma vez para a união das seções necessárias.
+    data = request.get_json()
+    tickers = data.get('tickers')
+
+    if not tickers or not isinstance(tickers, list):
+        logger.warning("Invalid request: 'tickers' is either missing or not a list.")
+        return jsonify({'error': 'Tickers must be provided as a list'}), 400
+
+    views = parse_batch_views(data.get('views'))
+    if views is None:
+        logger.warning("Invalid request: 'views' is either missing or has unknown views.")
+        return jsonify({'error': f"Views must be a list with any of: {', '.join(BATCH_VIEWS)}"}), 400
+
+    try:
+        results = fetch_batch_views(tickers, cache, views)
+
+        with observe_stage("render"):
+            response = jsonify(results)
+        return response, 200
+
+    except Exception as e:
+        logger.error(f"Error in batch: {str(e)}", exc_info=True)
+        return jsonify({'error': f"Failed to fetch batch: {str(e)}"}), 500
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Métricas de todos os workers no formato do Prometheus (sem token, como /docs)
+    return Response(render_metrics(cache), mimetype="text/plain; version=0.0.4")
+
+
+@app.route('/admin/ticker_index', methods=['GET'])
+def ticker_index():
+    # Endpoint de introspecção do índice de tickers válidos/inválidos.
+    # Aceita ?limit=N (padrão 100) para limitar os tickers listados em cada grupo.
+    try:
+        limit = max(1, int(request.args.get('limit', 100)))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    try:
+        return jsonify(get_ticker_index(cache, limit)), 200
+    except Exception as e:
+        logger.error(f"Error in ticker_index: {str(e)}", exc_info=True)
+        return jsonify({'error': f"Failed to read ticker index: {str(e)}"}), 500
+
+
+@app.route('/admin/warmup', methods=['GET'])
+def warmup_status():
+    # Progresso do último aquecimento, cobertura do universo no cache e próxima janela
+    try:
+        return jsonify(get_warmup_status(cache)), 200
+    except Exception as e:
+        logger.error(f"Error in warmup_status: {str(e)}", exc_info=True)
+        return jsonify({'error': f"Failed to read warm-up status: {str(e)}"}), 500
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=80, debug=True)
@@ -1,19 +1,116 @@
-from .auth_service import authenticate, validate_token
-from .cache_service import initialize_cache, create_cache, get_from_cache, set_to_cache, get_cached_tickers, cache_ticker_data
-from .logging_service import setup_logger
-from .utils import fetch_multiple_ticker_data, classify_asset_list
+from .auth_service import authenticate, check_access, is_public_path, resolve_token, validate_token
+from .admission_service import AdmissionRejected, admit_request, release_request, request_cost
+from .cache_service import initialize_cache, create_cache, get_from_cache, set_to_cache, get_many_from_cache, set_many_to_cache, get_local_cache_stats, get_cached_tickers, cache_ticker_data, pin_section_versions, pinned_section_versions, start_persistent_cache, warm_cache_from_disk
+from .logging_service import (
+    setup_logger,
+    begin_request,
+    count_request,
+    current_request_stats,
+    get_request_counts,
+    log_request_summary,
+)
+from .metrics_service import inc, observe, observe_stage, render_metrics, set_endpoint, start_metrics_flusher
+from .refresh_service import start_refresh_scheduler
+from .ticker_index_service import get_ticker_index
+from .utils import fetch_multiple_ticker_data, iter_ticker_data, fetch_missing_ticker_data, track_cache_lookup, ensure_sa_suffix, classify_asset_list, iter_classified_assets, refresh_tickers, preload_upstream_modules, fetch_batch_views, fetch_stock_info_fragments
+from .json_service import FastJSONProvider, dumps_bytes, json_array
+from .etag_service import compute_etag, match_etag, not_modified
+from .upstream_service import UpstreamUnavailable, upstream_available, upstream_call
+from .history_service import fetch_history, parse_history_range
+from .warmup_service import get_warmup_status, load_universe, run_warmup, start_warmup_scheduler
+from .docs_service import setup_docs
+from .classification_service import CLASSIFICATION_SECTIONS
+from .response_service import (
+    QUOTE_SECTIONS,
+    INFO_SECTIONS,
+    RECOMMENDATION_SECTIONS,
+    BATCH_VIEWS,
+    freshness_warnings,
+    parse_batch_views,
+    parse_fields,
+    format_asset_info,
+    format_classification,
+    format_market_price,
+    format_recommendations,
+    format_stock_info,
+)
 
 __all__ = [
     "authenticate",
     "validate_token",
+    "check_access",
+    "is_public_path",
+    "resolve_token",
+    "AdmissionRejected",
+    "admit_request",
+    "release_request",
+    "request_cost",
     "initialize_cache",
     "create_cache",
     "get_from_cache",
     "set_to_cache",
+    "get_many_from_cache",
+    "set_many_to_cache",
+    "get_local_cache_stats",
     "setup_logger",
+    "begin_request",
+    "count_request",
+    "current_request_stats",
+    "get_request_counts",
+    "log_request_summary",
     "get_cached_tickers",
     "cache_ticker_data",
+    "pin_section_versions",
+    "pinned_section_versions",
+    "start_persistent_cache",
+    "warm_cache_from_disk",
     "fetch_multiple_ticker_data",
-    "classify_asset_list"
+    "iter_ticker_data",
+    "fetch_missing_ticker_data",
+    "track_cache_lookup",
+    "ensure_sa_suffix",
+    "classify_asset_list",
+    "iter_classified_assets",
+    "refresh_tickers",
+    "preload_upstream_modules",
+    "fetch_batch_views",
+    "fetch_stock_info_fragments",
+    "FastJSONProvider",
+    "dumps_bytes",
+    "json_array",
+    "compute_etag",
+    "match_etag",
+    "not_modified",
+    "UpstreamUnavailable",
+    "upstream_available",
+    "upstream_call",
+    "fetch_history",
+    "parse_history_range",
+    "get_warmup_status",
+    "load_universe",
+    "run_warmup",
+    "start_warmup_scheduler",
+    "setup_docs",
+    "start_refresh_scheduler",
+    "inc",
+    "observe",
+    "observe_stage",
+    "render_metrics",
+    "set_endpoint",
+    "start_metrics_flusher",
+    "get_ticker_index",
+    "CLASSIFICATION_SECTIONS",
+    "QUOTE_SECTIONS",
+    "INFO_SECTIONS",
+    "RECOMMENDATION_SECTIONS",
+    "BATCH_VIEWS",
+    "freshness_warnings",
+    "parse_batch_views",
+    "parse_fields",
+    "format_asset_info",
+    "format_classification",
+    "format_market_price",
+    "format_recommendations",
+    "format_stock_info",
 
 ]
@@ -0,0 +1,182 @@
+import math
+import os
+import time
+import uuid
+import logging
+from services.cache_service import get_cache_prefix, get_redis_client
+from services.metrics_service import inc
+from services.upstream_service import UPSTREAM_CONCURRENCY_MAX, slot_keys
+
+logger = logging.getLogger(__name__)
+
+# Liga/desliga o controle de admissão por token
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+# Requisições simultâneas por token, somando todos os workers (padrão dos tokens sem "max_concurrency")
+TOKEN_MAX_CONCURRENCY = int(os.getenv("TOKEN_MAX_CONCURRENCY", "8"))
+# Orçamento por token, em tickers por minuto (padrão dos tokens sem "budget_per_minute")
+TOKEN_BUDGET_PER_MINUTE = float(os.getenv("TOKEN_BUDGET_PER_MINUTE", "3000"))
+# Rajada do orçamento, em minutos de orçamento acumulado
+TOKEN_BUDGET_BURST_MINUTES = float(os.getenv("TOKEN_BUDGET_BURST_MINUTES", "1"))
+# Requisições em andamento, somando todos os workers, que caracterizam sobrecarga
+ADMISSION_MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "64"))
+# Carga (fração de ADMISSION_MAX_INFLIGHT ou das vagas do Yahoo em uso) a partir da qual
+# cada prioridade é recusada; tokens "high" só esbarram nos próprios limites
+ADMISSION_SHED_LOW = float(os.getenv("ADMISSION_SHED_LOW", "0.75"))
+ADMISSION_SHED_NORMAL = float(os.getenv("ADMISSION_SHED_NORMAL", "1.0"))
+
+# Validade de uma admissão: as de workers que morreram expiram sozinhas
+_ADMISSION_TTL = 300
+
+# Admite a requisição se a carga, a concorrência do token e o orçamento permitirem.
+# Devolve {1} ou {0, motivo, espera sugerida em segundos}.
+_ADMIT_SCRIPT = """
+local now, expires_at, id = tonumber(ARGV[1]), ARGV[2], ARGV[3]
+local max_concurrency, rate, burst, cost = tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6]), tonumber(ARGV[7])
+local max_inflight, shed_at, upstream_max, ttl = tonumber(ARGV[8]), tonumber(ARGV[9]), tonumber(ARGV[10]), ARGV[11]
+redis.call('zremrangebyscore', KEYS[1], '-inf', now)
+redis.call('zremrangebyscore', KEYS[3], '-inf', now)
+if shed_at > 0 then
+    local upstream_limit = math.floor(tonumber(redis.call('get', KEYS[5]) or upstream_max))
+    local load = redis.call('zcard', KEYS[3]) / max_inflight
+    if upstream_limit > 0 then
+        load = math.max(load, redis.call('zcount', KEYS[4], now, '+inf') / upstream_limit)
+    end
+    if load >= shed_at then
+        return {0, 'overloaded', '1'}
+    end
+end
+if redis.call('zcard', KEYS[1]) >= max_concurrency then
+    return {0, 'concurrency', '1'}
+end
+local state = redis.call('hmget', KEYS[2], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+if tokens < cost then
+    return {0, 'budget', tostring((cost - tokens) / rate)}
+end
+redis.call('hset', KEYS[2], 'tokens', tostring(tokens - cost), 'ts', tostring(now))
+redis.call('expire', KEYS[2], math.ceil(burst / rate) + 60)
+redis.call('zadd', KEYS[1], expires_at, id)
+redis.call('expire', KEYS[1], ttl)
+redis.call('zadd', KEYS[3], expires_at, id)
+redis.call('expire', KEYS[3], ttl)
+return {1}
+"""
+
+
+class AdmissionRejected(Exception):
+    """
+    Requisição recusada pelo controle de admissão (429): sobrecarga,
+    concorrência do token ou orçamento esgotado.
+    """
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f"Request rejected: {reason}")
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+    def payload(self):
+        return {"error": "Too many requests", "reason": self.reason}
+
+
+class Admission:
+    """Vaga de uma requisição admitida, devolvida com `release_request`."""
+
+    def __init__(self, request_id, keys):
+        self.request_id = request_id
+        self.keys = keys
+
+
+def _key(cache, *parts):
+    return f"{get_cache_prefix(cache)}admission:" + ":".join(parts)
+
+
+def request_cost(data):
+    """Peso de uma requisição: número de tickers do corpo (mínimo 1)."""
+    tickers = data.get("tickers") if isinstance(data, dict) else None
+    return max(1, len(tickers)) if isinstance(tickers, list) else 1
+
+
+def _shed_threshold(priority):
+    if priority == "low":
+        return ADMISSION_SHED_LOW
+    if priority == "normal":
+        return ADMISSION_SHED_NORMAL
+    return 0
+
+
+def admit_request(cache, identity, cost=1):
+    """
+    Controle de admissão por token (estado compartilhado entre os workers no Redis):
+
+    1. sobrecarga: com a carga acima do limiar da prioridade do token, a
+       requisição é recusada antes de ocupar um worker esperando o Yahoo;
+    2. concorrência: no máximo `max_concurrency` requisições do token em andamento;
+    3. orçamento: token bucket em tickers por minuto, descontando `cost`.
+
+    Sem Redis (ou com o Redis fora), a requisição é admitida sem controle.
+
+    Args:
+        cache: instância de cache (estado compartilhado).
+        identity (dict): identidade do token (`resolve_token`).
+        cost (int): peso da requisição (`request_cost`).
+
+    Returns:
+        Admission: vaga a devolver com `release_request`, ou None sem controle.
+
+    Raises:
+        AdmissionRejected: requisição recusada.
+    """
+    client = get_redis_client(cache) if ADMISSION_ENABLED else None
+    if client is None or identity is None:
+        return None
+
+    max_concurrency = identity.get("max_concurrency") or TOKEN_MAX_CONCURRENCY
+    rate = (identity.get("budget_per_minute") or TOKEN_BUDGET_PER_MINUTE) / 60
+    burst = rate * 60 * TOKEN_BUDGET_BURST_MINUTES
+    keys = [
+        _key(cache, "token", identity["name"], "inflight"),
+        _key(cache, "token", identity["name"], "budget"),
+        _key(cache, "inflight"),
+        *slot_keys(cache),
+    ]
+    request_id = uuid.uuid4().hex
+    now = time.time()
+    try:
+        admit = client.register_script(_ADMIT_SCRIPT)
+        result = admit(
+            keys=keys,
+            args=[
+                now, now + _ADMISSION_TTL, request_id,
+                max_concurrency, rate, burst, min(cost, burst),
+                max(1, ADMISSION_MAX_INFLIGHT), _shed_threshold(identity["priority"]),
+                UPSTREAM_CONCURRENCY_MAX, _ADMISSION_TTL,
+            ],
+        )
+    except Exception as e:
+        logger.error(f"Error in admission control: {str(e)}")
+        return None
+
+    if int(result[0]) != 1:
+        reason = result[1].decode() if isinstance(result[1], bytes) else result[1]
+        inc("admission_rejected_total", reason=reason, priority=identity["priority"])
+        logger.info("Request from token '%s' rejected: %s.", identity["name"], reason)
+        raise AdmissionRejected(reason, float(result[2]))
+    return Admission(request_id, [keys[0], keys[2]])
+
+
+def release_request(cache, admission):
+    """Devolve a vaga de uma requisição admitida."""
+    if admission is None:
+        return
+    client = get_redis_client(cache)
+    if client is None:
+        return
+    try:
+        pipe = client.pipeline(transaction=False)
+        for key in admission.keys:
+            pipe.zrem(key, admission.request_id)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error releasing admission: {str(e)}")
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+import redis.asyncio as aioredis
+from services.metrics_service import inc, observe
+from services.cache_service import (
+    PERSISTENT_CACHE_ENABLED,
+    TICKER_SECTIONS,
+    assemble_sections,
+    complete_sections,
+    decode_cached_values,
+    get_cache_prefix,
+    get_local_cache,
+    lookup_local_cache,
+    restore_from_disk,
+    section_key,
+    split_cached_tickers,
+)
+from services.ticker_index_service import index_key, partition_known_invalid
+
+logger = logging.getLogger(__name__)
+
+
+def create_async_redis(app):
+    """
+    Creates an asyncio Redis client with the same settings as create_cache.
+    Must be called after create_cache(app) has filled the app config.
+    """
+    return aioredis.Redis(
+        host=app.config["CACHE_REDIS_HOST"],
+        port=app.config["CACHE_REDIS_PORT"],
+        db=app.config["CACHE_REDIS_DB"],
+        password=app.config["CACHE_REDIS_PASSWORD"],
+    )
+
+
+async def aget_many_from_cache(client, cache, keys):
+    """
+    Async counterpart of get_many_from_cache: one MGET (or GET + PTTL when
+    the L1 is enabled) without blocking the event loop.
+
+    Args:
+        client (redis.asyncio.Redis): Cliente assíncrono.
+        cache (Cache): Instância do cache (prefixo, L1 e serializer legado).
+        keys (list): Chaves a buscar.
+
+    Returns:
+        dict: {key: value} apenas para as chaves encontradas e válidas.
+    """
+    found, keys = lookup_local_cache(cache, keys)
+    if not keys:
+        return found
+
+    prefix = get_cache_prefix(cache)
+    if get_local_cache(cache):
+        async with client.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.get(f"{prefix}{key}")
+                pipe.pttl(f"{prefix}{key}")
+            replies = await pipe.execute()
+        raw_values, ttls = replies[0::2], replies[1::2]
+    else:
+        raw_values = await client.mget([f"{prefix}{key}" for key in keys])
+        ttls = [None] * len(keys)
+
+    found.update(decode_cached_values(cache, keys, raw_values, ttls))
+    return found
+
+
+async def _aread_sections(client, cache, tickers, sections):
+    """
+    Async counterpart of _read_sections: as faltas no Redis consultam a camada
+    em disco (numa thread, fora do event loop), com as mesmas regras de idade.
+    """
+    keys = [section_key(ticker, section) for ticker in tickers for section in sections]
+    found = await aget_many_from_cache(client, cache, keys)
+    if PERSISTENT_CACHE_ENABLED and len(found) < len(keys):
+        missing = [key for key in keys if key not in found]
+        found.update(await asyncio.get_running_loop().run_in_executor(None, restore_from_disk, cache, missing))
+    return assemble_sections(tickers, sections, found)
+
+
+async def aget_cached_tickers(client, cache, tickers, sections=TICKER_SECTIONS, stale_ratio=1.0):
+    """
+    Async counterpart of get_cached_tickers(..., include_stale=True).
+
+    Returns:
+        tuple: (cached_data, missing_tickers, stale_tickers)
+    """
+    started = time.perf_counter()
+    try:
+        found = await _aread_sections(client, cache, tickers, sections)
+        observe("stage_seconds", time.perf_counter() - started, stage="cache_read")
+    except Exception as e:
+        logger.error(f"Error retrieving tickers {tickers} from cache: {str(e)}")
+        inc("cache_errors_total", operation="read")
+        found = {}
+    return split_cached_tickers(tickers, sections, found, stale_ratio)
+
+
+async def asplit_known_invalid(client, cache, tickers):
+    """
+    Async counterpart of split_known_invalid.
+
+    Returns:
+        tuple: (invalid, remaining)
+    """
+    if not tickers:
+        return [], list(tickers)
+    try:
+        async with client.pipeline(transaction=False) as pipe:
+            for ticker in tickers:
+                pipe.zscore(index_key(cache, "invalid"), ticker)
+            expires = await pipe.execute()
+    except Exception as e:
+        logger.error(f"Error reading ticker index for {tickers}: {str(e)}")
+        return [], list(tickers)
+    return partition_known_invalid(tickers, expires)
+
+
+async def aget_cached_sections(client, cache, tickers, sections):
+    """
+    Async counterpart of get_cached_sections (sem contar acertos/faltas).
+    """
+    return complete_sections(await _aread_sections(client, cache, tickers, sections), sections)
@@ -1,41 +1,161 @@
 from flask import request, jsonify
-from tokens import tokens
-from datetime import datetime
+import hashlib
+import importlib
+import os
+import threading
+import time
 import logging
 
+import tokens as token_source
+
 logger = logging.getLogger(__name__)
 
-def validate_token(token):
+# Intervalo mínimo, em segundos, entre as verificações de que tokens.py mudou
+TOKENS_RELOAD_INTERVAL = float(os.getenv("TOKENS_RELOAD_INTERVAL", "5"))
+
+TOKEN_PRIORITIES = ("high", "normal", "low")
+
+# SHA-256 do token -> identidade (nome, expiração e limites de admissão)
+_index = {}
+# Versão de tokens.py (mtime) refletida no índice e próxima verificação (time.monotonic())
+_index_version = None
+_next_check = 0.0
+_index_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _index_lock
+    _index_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _digest(token):
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+def _build_index(entries):
+    index = {}
+    for entry in entries:
+        digest = _digest(entry["token"])
+        priority = entry.get("priority", "normal")
+        if priority not in TOKEN_PRIORITIES:
+            raise ValueError(f"Invalid priority '{priority}' for token '{entry.get('name')}'")
+        expiry = entry["expiry"].timestamp()
+        if digest in index:
+            # Mesmo valor de token em mais de uma entrada: vale a de expiração mais distante
+            logger.warning(
+                "Token of '%s' duplicates the one of '%s'; keeping the later expiry.",
+                entry.get("name"), index[digest]["name"],
+            )
+            if expiry <= index[digest]["expiry"]:
+                continue
+        index[digest] = {
+            "name": entry.get("name") or digest.hex()[:12],
+            "expiry": expiry,
+            "priority": priority,
+            "max_concurrency": entry.get("max_concurrency"),
+            "budget_per_minute": entry.get("budget_per_minute"),
+        }
+    return index
+
+
+def _source_version():
+    try:
+        return os.stat(token_source.__file__).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _current_index():
     """
-    Validates the provided token against the tokens list.
+    Índice de tokens, montado na primeira consulta e remontado quando
+    tokens.py muda (verificado no máximo a cada TOKENS_RELOAD_INTERVAL).
+    Um tokens.py inválido mantém o índice anterior.
     """
-    for entry in tokens:
-        if entry["token"] == token and entry["expiry"] >= datetime.now():
-            return True
-    return False
+    global _index, _index_version, _next_check
+    now = time.monotonic()
+    if now < _next_check:
+        return _index
+    with _index_lock:
+        if now >= _next_check:
+            version = _source_version()
+            if version != _index_version:
+                try:
+                    module = importlib.reload(token_source) if _index_version is not None else token_source
+                    _index = _build_index(module.tokens)
+                    logger.info("Token index loaded with %d tokens.", len(_index))
+                except Exception as e:
+                    logger.error(f"Error loading tokens.py, keeping the previous token index: {str(e)}")
+                _index_version = version
+            _next_check = now + TOKENS_RELOAD_INTERVAL
+    return _index
 
 
-def authenticate():
+def resolve_token(token):
     """
-    Middleware para validar o token antes de processar qualquer endpoint.
+    Identidade de um token válido: busca O(1) pelo SHA-256 do token e
+    expiração pré-calculada. A busca compara apenas hashes, então o tempo
+    de resposta não revela prefixos do token.
+
+    Returns:
+        dict: nome, prioridade e limites do token, ou None se inválido ou expirado.
     """
-    logger.info(f"Request path: {request.path}, Method: {request.method}")
+    if not token:
+        return None
+    identity = _current_index().get(_digest(token))
+    if identity is None:
+        return None
+    if identity["expiry"] < time.time():
+        return None
+    return identity
+
+
+def validate_token(token):
+    """
+    Validates the provided token against the token index.
+    """
+    return resolve_token(token) is not None
+
+
+def is_public_path(path):
+    # Documentação, arquivos estáticos e métricas não exigem token
+    return (
+        path.startswith("/docs") or
+        path.startswith("/apispec.json") or
+        path.startswith("/static") or
+        path.startswith("/metrics")
+    )
 
-    # Permitir acesso à documentação e arquivos estáticos
-    if (
-        request.path.startswith("/docs") or 
-        request.path.startswith("/apispec.json") or 
-        request.path.startswith("/static")
-    ):
-        logger.info("Documentation or static file access allowed without authentication")
-        return  # Libera o acesso às rotas específicas sem autenticação
+
+def check_access(path, token):
+    """
+    Regras de autenticação, independentes do framework (WSGI ou ASGI).
+
+    Returns:
+        None se o acesso é permitido, ou (payload de erro, status HTTP).
+    """
+    if is_public_path(path):
+        return None  # Libera o acesso às rotas específicas sem autenticação
 
     # Verificar token para outras rotas
-    token = request.headers.get("Authorization")
     if not token:
-        logger.info("Token is missing in the request")
-        return jsonify({"error": "Token is required"}), 401
+        logger.info("Token is missing in the request to %s", path)
+        return {"error": "Token is required"}, 401
 
     if not validate_token(token):
-        logger.info("Invalid or expired token provided")
-        return jsonify({"error": "Invalid or expired token"}), 403
+        logger.info("Invalid or expired token provided for %s", path)
+        return {"error": "Invalid or expired token"}, 403
+
+    return None
+
+
+def authenticate():
+    """
+    Middleware para validar o token antes de processar qualquer endpoint.
+    """
+    denied = check_access(request.path, request.headers.get("Authorization"))
+    if denied:
+        payload, status = denied
+        return jsonify(payload), status
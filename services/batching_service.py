@@ -0,0 +1,137 @@
+import os
+import threading
+import time
+import logging
+from concurrent.futures import Future
+
+from services.metrics_service import observe
+
+logger = logging.getLogger(__name__)
+
+# Janela, em milissegundos, em que os tickers ausentes de requisições
+# concorrentes do worker são reunidos em um só yf.download (0 desliga).
+# Um worker síncrono atende uma requisição por vez e não teria com quem
+# agrupar: só o asgi.py e o gunicorn com threads ligam a janela por padrão
+UPSTREAM_BATCH_WINDOW_MS = float(os.getenv("UPSTREAM_BATCH_WINDOW_MS", "0"))
+# Máximo de tickers por chamada agrupada; lotes cheios saem antes da janela
+UPSTREAM_BATCH_MAX_SIZE = int(os.getenv("UPSTREAM_BATCH_MAX_SIZE", "100"))
+
+
+class _Batch:
+    def __init__(self, args):
+        self.args = args
+        self.futures = {}
+        self.full = threading.Event()
+
+
+class MicroBatcher:
+    """
+    Agrupa chamadas concorrentes ao upstream dentro de uma janela curta.
+
+    Cada thread entrega suas chaves com `submit` e recebe um Future por chave.
+    A primeira chave de um lote abre a janela; ao fim dela (ou quando o lote
+    enche) uma thread própria chama `run_batch` uma única vez com todas as
+    chaves e distribui os resultados. Chaves já em um lote aberto ou em voo
+    compartilham o mesmo Future.
+
+    Args:
+        run_batch (callable): recebe a lista de chaves (e os `args` de quem abriu
+            o lote) e devolve {chave: resultado}; chaves ausentes do dict
+            resolvem como None e uma exceção falha o lote todo.
+        window (float): janela de coleta, em segundos.
+        max_size (int): máximo de chaves por lote.
+        name (str): nome das threads e rótulo das métricas.
+    """
+
+    def __init__(self, run_batch, window, max_size, name="batch"):
+        self.run_batch = run_batch
+        self.window = window
+        self.max_size = max(1, max_size)
+        self.name = name
+        self._lock = threading.Lock()
+        self._open = None
+        self._inflight = {}
+
+    def submit(self, keys, *args):
+        """
+        Enfileira as chaves no lote aberto, criando novos lotes quando preciso.
+        `args` só são usados pelos lotes abertos por esta chamada (ex.: o cache,
+        que é o mesmo para todo o worker).
+
+        Returns:
+            dict: {chave: Future} na ordem recebida.
+        """
+        futures = {}
+        new_batches = []
+        with self._lock:
+            for key in keys:
+                future = self._inflight.get(key)
+                if future is None:
+                    if self._open is None or len(self._open.futures) >= self.max_size:
+                        self._close_open()
+                        self._open = _Batch(args)
+                        new_batches.append(self._open)
+                    future = Future()
+                    self._open.futures[key] = future
+                    self._inflight[key] = future
+                    if len(self._open.futures) >= self.max_size:
+                        self._open.full.set()
+                futures[key] = future
+        for batch in new_batches:
+            threading.Thread(target=self._run, args=(batch,), name=f"{self.name}-batch", daemon=True).start()
+        return futures
+
+    def _close_open(self):
+        # Chamado com o lock: o lote deixa de aceitar chaves e sai sem esperar a janela
+        if self._open is not None:
+            self._open.full.set()
+            self._open = None
+
+    def _run(self, batch):
+        batch.full.wait(self.window)
+        with self._lock:
+            if self._open is batch:
+                self._open = None
+        keys = list(batch.futures)
+        observe("upstream_batch_size", len(keys), kind=self.name)
+        try:
+            results = self.run_batch(keys, *batch.args)
+        except BaseException as e:
+            for future in batch.futures.values():
+                future.set_exception(e)
+        else:
+            for key, future in batch.futures.items():
+                future.set_result(results.get(key))
+        finally:
+            with self._lock:
+                for key, future in batch.futures.items():
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+
+    def reset(self):
+        """Descarta lotes herdados de outro processo (após fork)."""
+        self._lock = threading.Lock()
+        self._open = None
+        self._inflight = {}
+
+
+def wait_results(futures, deadline):
+    """
+    Aguarda os Futures de `submit` até o prazo.
+
+    Args:
+        futures (dict): {chave: Future}.
+        deadline (float): instante limite em time.monotonic().
+
+    Returns:
+        tuple: ({chave: resultado}, [chaves sem resultado a tempo]);
+        a primeira exceção de lote é relançada.
+    """
+    results = {}
+    pending = []
+    for key, future in futures.items():
+        try:
+            results[key] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except TimeoutError:
+            pending.append(key)
+    return results, pending
@@ -1,11 +1,147 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
 from flask_caching import Cache
 import logging
+from services.logging_service import count_request, log_ticker_event
+from services.metrics_service import current_endpoint, inc, observe_stage
+from services.json_service import dumps_bytes
+from services.serialization_service import decode_value, encode_value
+from services.persistent_cache_service import (
+    PERSISTENT_CACHE_ENABLED,
+    iter_entries,
+    persist_entries,
+    read_entries,
+    start_persistent_writer,
+)
 
 logger = logging.getLogger(__name__)
 
+# TTL de cada seção dos dados de um ticker, em segundos.
+# A cotação (quote) vem do yf.download e expira rápido; recomendações e
+# estimativas mudam pouco e podem ficar mais tempo em cache.
+SECTION_TIMEOUTS = {
+    "quote": int(os.getenv("CACHE_TTL_QUOTE", "60")),
+    "info": int(os.getenv("CACHE_TTL_INFO", "300")),
+    "recommendations": int(os.getenv("CACHE_TTL_RECOMMENDATIONS", "21600")),
+    "price_targets": int(os.getenv("CACHE_TTL_PRICE_TARGETS", "21600")),
+    "growth_estimates": int(os.getenv("CACHE_TTL_GROWTH_ESTIMATES", "43200")),
+    # Seção derivada: veredito de /classify_assets (a categoria quase nunca muda)
+    "classification": int(os.getenv("CACHE_TTL_CLASSIFICATION", "604800")),
+}
+# Seções buscadas no Yahoo (as derivadas ficam de fora)
+TICKER_SECTIONS = ("quote", "info", "recommendations", "price_targets", "growth_estimates")
+
+# Após o TTL suave, a entrada ainda é servida (vencida) até o TTL rígido,
+# enquanto uma atualização em segundo plano é agendada.
+CACHE_HARD_TTL_FACTOR = int(os.getenv("CACHE_HARD_TTL_FACTOR", "4"))
+
+# Cache L1 em memória, por worker, na frente do Redis (opcional)
+LOCAL_CACHE_ENABLED = os.getenv("LOCAL_CACHE_ENABLED", "0") == "1"
+LOCAL_CACHE_MAX_ENTRIES = int(os.getenv("LOCAL_CACHE_MAX_ENTRIES", "5000"))
+LOCAL_CACHE_MAX_BYTES = int(os.getenv("LOCAL_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# TTL máximo no L1; limita a divergência entre workers após uma escrita
+LOCAL_CACHE_MAX_TTL = float(os.getenv("LOCAL_CACHE_MAX_TTL", "30"))
+
+# Cache de itens de resposta já codificados em JSON, por ticker e projeção (opcional)
+FRAGMENT_CACHE_ENABLED = os.getenv("FRAGMENT_CACHE_ENABLED", "0") == "1"
+# Validade máxima de um fragmento; nunca maior que o TTL suave da seção
+FRAGMENT_CACHE_TTL = int(os.getenv("FRAGMENT_CACHE_TTL", "60"))
+
+
+# Versões ({section_key: (version, fetched_at)}) que o ETag da requisição
+# corrente anunciou: cópias do L1 de outra versão não podem compor o corpo
+_pinned_versions = ContextVar("pinned_versions", default=None)
+
+
+class LocalCache:
+    """
+    In-process LRU cache bounded by entry count and approximate bytes.
+
+    Values are kept already deserialized and are shared between requests,
+    so callers must treat them as read-only. Each entry expires no later
+    than the Redis key it mirrors.
+    """
+
+    def __init__(self, max_entries, max_bytes, max_ttl):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl, size):
+        """
+        Stores a value for at most min(ttl, max_ttl) seconds.
+        A ttl of None means the Redis key never expires.
+        """
+        ttl = self.max_ttl if ttl is None else min(ttl, self.max_ttl)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+
+def get_local_cache(cache):
+    """
+    Returns the L1 cache attached to the Cache instance, if enabled.
+    """
+    return getattr(cache, "local_cache", None)
+
+def get_local_cache_stats(cache):
+    """
+    Returns the L1 hit/miss counters, or None when the L1 is disabled.
+    """
+    local = get_local_cache(cache)
+    return local.stats() if local else None
+
 def create_cache(app):
     """
     Configures and creates a cache instance for the Flask app.
+    With LOCAL_CACHE_ENABLED=1 an in-process L1 is attached in front of Redis.
     """
     cache_config = {
         "CACHE_TYPE": "RedisCache",
@@ -16,7 +152,10 @@ def create_cache(app):
         "CACHE_DEFAULT_TIMEOUT": 1800,  # 30 minutes timeout
     }
     app.config.from_mapping(cache_config)
-    return Cache(app)
+    cache = Cache(app)
+    if LOCAL_CACHE_ENABLED:
+        cache.local_cache = LocalCache(LOCAL_CACHE_MAX_ENTRIES, LOCAL_CACHE_MAX_BYTES, LOCAL_CACHE_MAX_TTL)
+    return cache
 
 def initialize_cache(app):
     """
@@ -40,62 +179,677 @@ def set_to_cache(cache, key, value, timeout=300):
     """
     try:
         cache.set(key, value, timeout=timeout)
-        logger.info(f"Key '{key}' successfully set in cache.")
+        logger.debug("Key '%s' successfully set in cache.", key)
     except Exception as e:
         logger.error(f"Error setting key '{key}' in cache: {str(e)}")
 
-def get_cached_tickers(cache, tickers):
+def _cache_backend(cache):
     """
-    Retrieve cached stock objects for a list of tickers.
-    Returns a tuple with two lists: cached_data and missing_tickers.
+    Returns the Flask-Caching backend behind a Cache instance.
+    """
+    return getattr(cache, "cache", cache)
+
+def get_redis_client(cache):
+    """
+    Returns the raw Redis client used by the cache, or None when the
+    backend is not Redis (ex.: SimpleCache em desenvolvimento).
+    """
+    return getattr(_cache_backend(cache), "_write_client", None)
+
+def get_cache_prefix(cache):
+    """
+    Returns the key prefix applied by the cache backend.
+    """
+    backend = _cache_backend(cache)
+    get_prefix = getattr(backend, "_get_prefix", None)
+    return get_prefix() if get_prefix else ""
+
+def get_many_from_cache(cache, keys):
+    """
+    Retrieves several keys in a single Redis round trip (MGET).
+    Each value is deserialized on its own, so a corrupt entry only becomes
+    a miss for its key instead of failing the whole batch. Values are decoded
+    with the versioned codec of serialization_service; legacy pickle entries
+    are still readable.
+
+    With the L1 enabled, keys found in memory skip Redis and deserialization;
+    the rest are read with GET + PTTL so the L1 never outlives the Redis key.
 
     Args:
         cache (Cache): Instância do cache.
-        tickers (list): Lista de tickers fornecida pelo usuário.
+        keys (list): Chaves a buscar.
 
     Returns:
-        tuple: (cached_data, missing_tickers)
+        dict: {key: value} apenas para as chaves encontradas e válidas.
     """
+    if not keys:
+        return {}
 
-    cached_data = {}
-    missing_tickers = []
+    backend = _cache_backend(cache)
+    client = getattr(backend, "_read_client", None)
+    if client is None:
+        # Backend sem cliente Redis (ex.: SimpleCache em desenvolvimento)
+        values = {key: get_from_cache(cache, key) for key in keys}
+        return {key: value for key, value in values.items() if value is not None}
 
+    found, keys = lookup_local_cache(cache, keys)
+    if not keys:
+        return found
 
-    for ticker in tickers:
+    prefix = get_cache_prefix(cache)
+    if get_local_cache(cache):
+        pipe = client.pipeline(transaction=False)
+        for key in keys:
+            pipe.get(f"{prefix}{key}")
+            pipe.pttl(f"{prefix}{key}")
+        replies = pipe.execute()
+        raw_values, ttls = replies[0::2], replies[1::2]
+    else:
+        raw_values = client.mget([f"{prefix}{key}" for key in keys])
+        ttls = [None] * len(keys)
+
+    found.update(decode_cached_values(cache, keys, raw_values, ttls))
+    return found
+
+def lookup_local_cache(cache, keys):
+    """
+    Looks the keys up in the L1 cache, when enabled.
+
+    Returns:
+        tuple: (found, remaining_keys) — valores em memória e chaves que
+        ainda precisam ser lidas do Redis.
+    """
+    local = get_local_cache(cache)
+    if not local:
+        return {}, list(keys)
+
+    pinned = _pinned_versions.get() or {}
+    found = {}
+    for key in keys:
+        value = local.get(key)
+        if value is not None and (key not in pinned or _envelope_version(value) == pinned[key]):
+            found[key] = value
+    return found, [key for key in keys if key not in found]
+
+def _envelope_version(value):
+    if isinstance(value, dict) and "version" in value:
+        return value["version"], value.get("fetched_at")
+    return None
+
+def pin_section_versions(pins):
+    """
+    Fixa, para a requisição corrente, as versões das seções anunciadas no
+    ETag ({section_key: (version, fetched_at)}): leituras seguintes ignoram
+    cópias do L1 de outra versão e vão ao Redis. None limpa.
+    """
+    _pinned_versions.set(pins or None)
+
+def pinned_section_versions():
+    """
+    Versões fixadas na requisição corrente por pin_section_versions (ou None).
+    """
+    return _pinned_versions.get()
+
+def decode_cached_values(cache, keys, raw_values, ttls):
+    """
+    Decodes raw Redis replies one key at a time and feeds the L1 cache.
+
+    Args:
+        cache (Cache): Instância do cache.
+        keys (list): Chaves lidas (sem prefixo).
+        raw_values (list): Respostas do Redis, na mesma ordem.
+        ttls (list): PTTL de cada chave em ms (ou None quando não lido).
+
+    Returns:
+        dict: {key: value} apenas para as chaves encontradas e válidas.
+    """
+    backend = _cache_backend(cache)
+    local = get_local_cache(cache)
+    found = {}
+    for key, raw, ttl_ms in zip(keys, raw_values, ttls):
+        if raw is None:
+            continue
         try:
-            data = cache.get(ticker)
-            if data:
-                cached_data[ticker] = data
-                logger.info(f"Cache hit for ticker: {ticker}")
-            else:
-                missing_tickers.append(ticker)
-                logger.info(f"Cache miss for ticker: {ticker}")
+            value = decode_value(raw, backend.serializer.loads)
         except Exception as e:
-            logger.error(f"Error retrieving ticker {ticker} from cache: {str(e)}")
-            missing_tickers.append(ticker)
+            logger.error(f"Error decoding key '{key}' from cache: {str(e)}")
+            inc("cache_errors_total", operation="decode")
+            continue
+        if value is not None:
+            found[key] = value
+            if local:
+                # PTTL -1: chave sem expiração; -2: chave removida nesse intervalo
+                local.set(key, value, None if ttl_ms in (None, -1) else ttl_ms / 1000, len(raw))
+    return found
+
+def set_many_to_cache(cache, mapping, timeout=300, timeouts=None):
+    """
+    Stores several keys with their TTL in a single pipelined round trip.
+    Values are encoded with the configured codec (CACHE_CODEC / CACHE_COMPRESSION).
+    Values that fail to serialize are skipped and logged.
+
+    Args:
+        cache (Cache): Instância do cache.
+        mapping (dict): Dados no formato {key: value}.
+        timeout (int): Tempo de expiração em segundos (0 = sem expiração).
+        timeouts (dict): TTL específico por chave, sobrepondo `timeout`.
+
+    Returns:
+        list: Chaves efetivamente enviadas ao cache.
+    """
+    if not mapping:
+        return []
+
+    backend = _cache_backend(cache)
+    client = getattr(backend, "_write_client", None)
+    timeouts = timeouts or {}
+    if client is None:
+        for key, value in mapping.items():
+            backend.set(key, value, timeout=timeouts.get(key, timeout))
+        return list(mapping)
+
+    local = get_local_cache(cache)
+    prefix = get_cache_prefix(cache)
+    # transaction=False: apenas agrupa os comandos, sem MULTI/EXEC
+    pipe = client.pipeline(transaction=False)
+    stored = []
+    for key, value in mapping.items():
+        try:
+            dump = encode_value(value)
+        except Exception as e:
+            logger.error(f"Error encoding key '{key}' for cache: {str(e)}")
+            continue
+        key_timeout = timeouts.get(key, timeout) or None
+        pipe.set(name=f"{prefix}{key}", value=dump, ex=key_timeout)
+        stored.append((key, value, key_timeout, len(dump)))
+    pipe.execute()
+
+    if local:
+        for key, value, key_timeout, size in stored:
+            local.set(key, value, key_timeout, size)
+    return [key for key, _, _, _ in stored]
+
+def section_key(ticker, section):
+    """
+    Returns the cache key of one section of a ticker (ex.: 'PETR4.SA:info').
+    """
+    return f"{ticker}:{section}"
+
+def _unwrap_section(value):
+    """
+    Separates a cached section into (data, fetched_at).
+    Values written before the freshness envelope existed count as stale.
+    """
+    if isinstance(value, dict) and value.keys() in ({"data", "fetched_at"}, {"data", "fetched_at", "version"}):
+        return value["data"], value["fetched_at"]
+    return value, 0
+
+def _read_sections(cache, tickers, sections):
+    """
+    Reads the requested sections of several tickers with a single MGET.
+    """
+    keys = [section_key(ticker, section) for ticker in tickers for section in sections]
+    found = get_many_from_cache(cache, keys)
+    if PERSISTENT_CACHE_ENABLED and len(found) < len(keys):
+        # Faltas no Redis (ex.: após um reinício) consultam a camada em disco
+        found.update(restore_from_disk(cache, [key for key in keys if key not in found]))
+    return assemble_sections(tickers, sections, found)
+
+def assemble_sections(tickers, sections, found):
+    """
+    Groups section values read from the cache by ticker.
+
+    Args:
+        tickers (list): Tickers normalizados.
+        sections (iterable): Seções necessárias.
+        found (dict): {section_key: valor} lidos do cache.
+
+    Returns:
+        dict: {ticker: (data, ages)} para os tickers com ao menos uma seção
+        em cache, onde ages é {seção: idade / TTL suave}. Tickers incompletos
+        trazem só as seções encontradas.
+    """
+    now = time.time()
+    assembled = {}
+    for ticker in tickers:
+        data = {}
+        ages = {}
+        for section in sections:
+            value = found.get(section_key(ticker, section))
+            if value is None:
+                continue
+            data[section], fetched_at = _unwrap_section(value)
+            ages[section] = (now - fetched_at) / max(SECTION_TIMEOUTS[section], 1)
+        if data:
+            assembled[ticker] = (data, ages)
+    return assembled
+
+def complete_sections(found, sections):
+    """
+    Keeps only the tickers with every requested section (saída de assemble_sections).
+    """
+    return {ticker: data for ticker, (data, _) in found.items() if len(data) == len(sections)}
+
+def get_cached_sections(cache, tickers, sections=TICKER_SECTIONS):
+    """
+    Reads the requested sections of several tickers with a single MGET.
+    Stale entries (past the soft TTL) are returned as well.
+
+    Args:
+        cache (Cache): Instância do cache.
+        tickers (list): Tickers normalizados.
+        sections (iterable): Seções necessárias (ex.: ('info',)).
+
+    Returns:
+        dict: {ticker: {section: value}} apenas para tickers com todas as
+        seções presentes no cache.
+    """
+    return complete_sections(_read_sections(cache, tickers, sections), sections)
+
+def get_cached_tickers(cache, tickers, sections=TICKER_SECTIONS, include_stale=False, stale_ratio=1.0, track=True):
+    """
+    Retrieve cached stock objects for a list of tickers.
+    Returns a tuple: cached_data and missing_tickers.
+    Only the requested sections are read, all with a single MGET; a ticker
+    with any section absent or corrupt is reported as missing, together
+    with the sections it still has in cache.
+
+    Entries past their soft TTL are still returned as hits (stale-while-
+    revalidate); with include_stale=True they are also listed separately,
+    with the sections that are stale.
+
+    Args:
+        cache (Cache): Instância do cache.
+        tickers (list): Lista de tickers fornecida pelo usuário.
+        sections (iterable): Seções necessárias para o endpoint.
+        include_stale (bool): Retorna também a lista de tickers vencidos.
+        stale_ratio (float): Fração do TTL suave a partir da qual um ticker é vencido.
+        track (bool): Conta a consulta nas métricas e no resumo da requisição;
+            False para varreduras de segundo plano (atualização, warm-up).
+
+    Returns:
+        tuple: (cached_data, missing_tickers) ou
+        (cached_data, missing_tickers, stale_tickers) com include_stale=True;
+        missing_tickers é {ticker: {seção: valor} já em cache} e
+        stale_tickers é {ticker: (seções vencidas)}.
+    """
 
-    logger.info(f"Total tickers found in cache: {len(cached_data)}")
-    logger.info(f"Total missing tickers: {len(missing_tickers)}")   
+    try:
+        if track:
+            with observe_stage("cache_read"):
+                found = _read_sections(cache, tickers, sections)
+        else:
+            found = _read_sections(cache, tickers, sections)
+    except Exception as e:
+        logger.error(f"Error retrieving tickers {tickers} from cache: {str(e)}")
+        inc("cache_errors_total", operation="read")
+        found = {}
 
+    cached_data, missing_tickers, stale_tickers = split_cached_tickers(tickers, sections, found, stale_ratio, track)
+    if include_stale:
+        return cached_data, missing_tickers, stale_tickers
     return cached_data, missing_tickers
 
-def cache_ticker_data(cache, ticker_data, timeout=300):
+def split_cached_tickers(tickers, sections, found, stale_ratio=1.0, track=True):
+    """
+    Splits tickers into hits, misses and stale hits.
+
+    A staleness é medida por seção: um ticker vencido lista só as seções que
+    passaram da fração do TTL suave, e um ticker ausente traz as seções que
+    ainda estão em cache, para que só as demais sejam buscadas no Yahoo.
+
+    Args:
+        tickers (list): Tickers normalizados, na ordem do pedido.
+        sections (iterable): Seções necessárias.
+        found (dict): Saída de assemble_sections.
+        stale_ratio (float): Fração do TTL suave a partir da qual uma seção é vencida.
+        track (bool): Conta a consulta nas métricas e no resumo da requisição.
+
+    Returns:
+        tuple: (cached_data, missing_tickers, stale_tickers), onde
+        missing_tickers é {ticker: {seção: valor} já em cache} e
+        stale_tickers é {ticker: (seções vencidas)}.
+    """
+    cached_data = {}
+    missing_tickers = {}
+    stale_tickers = {}
+
+    for ticker in tickers:
+        data, ages = found.get(ticker, ({}, {}))
+        if len(data) == len(sections):
+            cached_data[ticker] = data
+            stale_sections = tuple(section for section in sections if ages[section] >= stale_ratio)
+            if stale_sections:
+                stale_tickers[ticker] = stale_sections
+            log_ticker_event(logger, "Cache hit for ticker: %s", ticker)
+        else:
+            missing_tickers[ticker] = data
+            log_ticker_event(logger, "Cache miss for ticker: %s", ticker)
+
+    if track:
+        endpoint = current_endpoint()
+        inc("cache_lookups_total", len(cached_data) - len(stale_tickers), endpoint=endpoint, result="hit")
+        inc("cache_lookups_total", len(stale_tickers), endpoint=endpoint, result="stale")
+        inc("cache_lookups_total", len(missing_tickers), endpoint=endpoint, result="miss")
+        count_request(hits=len(cached_data), stale=len(stale_tickers), misses=len(missing_tickers))
+    logger.debug("Cache lookup: %d found, %d missing", len(cached_data), len(missing_tickers))
+
+    return cached_data, missing_tickers, stale_tickers
+
+def cache_ticker_data(cache, ticker_data, timeout=None):
     """
     Salva dados serializáveis dos tickers no cache.
+    Cada seção é gravada em sua própria chave junto com o instante da busca,
+    e todos os tickers vão em um único pipeline (SET com TTL). A chave expira
+    no TTL rígido (TTL suave de SECTION_TIMEOUTS x CACHE_HARD_TTL_FACTOR).
 
     Args:
         cache (Cache): Instância do cache.
-        ticker_data (dict): Dados dos tickers no formato {ticker: serializable_data}.
-        timeout (int): Tempo de expiração do cache em segundos (default: 300).
+        ticker_data (dict): Dados dos tickers no formato {ticker: {section: value}}.
+        timeout (int): TTL rígido único para todas as seções (default: TTL de cada seção).
     """
     if not isinstance(ticker_data, dict):
         logger.error("Invalid ticker_data format. Expected a dictionary.")
         return
 
+    mapping = {}
+    timeouts = {}
+    versions = {}
+    fetched_at = time.time()
     for ticker, data in ticker_data.items():
-        if data:  # Apenas cacheia dados válidos
-            cache.set(ticker, data, timeout=timeout)
-            logger.info(f"Cached data for ticker: {ticker}")
-        else:
-            logger.warning(f"Skipping caching for ticker {ticker} due to missing data.")
+        if not data:  # Apenas cacheia dados válidos
+            logger.warning("Skipping caching for ticker %s due to missing data.", ticker)
+            continue
+        for section, value in data.items():
+            if section not in SECTION_TIMEOUTS or value is None:
+                continue
+            key = section_key(ticker, section)
+            version = content_version(value, fetched_at)
+            mapping[key] = {"data": value, "fetched_at": fetched_at, "version": version}
+            versions.setdefault(section, {})[ticker] = f"{version}:{fetched_at}"
+            timeouts[key] = timeout if timeout is not None else SECTION_TIMEOUTS[section] * CACHE_HARD_TTL_FACTOR
+
+    try:
+        with observe_stage("cache_write"):
+            stored = set_many_to_cache(cache, mapping, timeouts=timeouts)
+        logger.debug("Cached %d keys", len(stored))
+    except Exception as e:
+        logger.error(f"Error caching tickers {list(ticker_data)}: {str(e)}")
+        inc("cache_errors_total", operation="write")
+        return
+
+    index_versions(cache, versions)
+    if FRAGMENT_CACHE_ENABLED:
+        # Fragmentos codificados a partir da versão anterior deixam de valer
+        invalidate_fragments(cache, mapping)
+    persist_entries([(key, mapping[key]) for key in stored])
+
+def extend_ticker_ttl(cache, tickers, sections):
+    """
+    Renova o TTL rígido das seções já em cache, sem regravá-las.
+    Usado quando o Yahoo está indisponível: os dados vencidos continuam
+    servidos em vez de expirarem antes de uma nova busca ser possível.
+    """
+    client = get_redis_client(cache)
+    if client is None or not tickers:
+        return
+
+    prefix = get_cache_prefix(cache)
+    try:
+        pipe = client.pipeline(transaction=False)
+        for ticker in tickers:
+            for section in sections:
+                pipe.expire(f"{prefix}{section_key(ticker, section)}", SECTION_TIMEOUTS[section] * CACHE_HARD_TTL_FACTOR)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error extending TTL for {tickers}: {str(e)}")
+        inc("cache_errors_total", operation="expire")
+
+def _restore_rows(cache, client, rows):
+    """
+    Grava no Redis, com o que resta do TTL rígido da seção, as entradas
+    lidas do disco (já codificadas no formato do cache). SET NX: nada
+    buscado depois é sobrescrito.
+
+    Returns:
+        list: Linhas efetivamente restauradas.
+    """
+    prefix = get_cache_prefix(cache)
+    pipe = client.pipeline(transaction=False)
+    candidates = []
+    now = time.time()
+    for row in rows:
+        key = row[0]
+        section = key.rsplit(":", 1)[-1]
+        if section not in SECTION_TIMEOUTS:
+            continue
+        # Só o que resta do TTL rígido; dados mais velhos (warm-up, Yahoo fora)
+        # ficam um TTL suave, servidos como vencidos até serem atualizados
+        remaining = int(row[2] + SECTION_TIMEOUTS[section] * CACHE_HARD_TTL_FACTOR - now)
+        pipe.set(f"{prefix}{key}", row[1], ex=max(1, remaining if remaining > 0 else SECTION_TIMEOUTS[section]), nx=True)
+        candidates.append(row)
+    restored = [row for row, stored in zip(candidates, pipe.execute()) if stored]
+
+    versions = {}
+    for key, _, fetched_at, version in restored:
+        ticker, section = key.rsplit(":", 1)
+        if version:
+            versions.setdefault(section, {})[ticker] = f"{version}:{fetched_at}"
+    index_versions(cache, versions)
+    return restored
+
+def restore_from_disk(cache, keys):
+    """
+    Lê da camada persistente as seções ausentes do Redis e as devolve ao
+    Redis. Com o Yahoo disponível, só voltam seções dentro do TTL rígido
+    (as mesmas que o Redis ainda teria); com o circuito aberto, vale a
+    janela inteira do disco (PERSISTENT_CACHE_MAX_AGE). Os dados voltam com
+    o fetched_at original, então os antigos saem como vencidos e entram na
+    fila de atualização.
+
+    Returns:
+        dict: {key: value} decodificados, apenas para as chaves encontradas.
+    """
+    from services.upstream_service import upstream_available  # upstream_service importa cache_service
+
+    client = get_redis_client(cache)
+    if client is None:
+        return {}
+
+    max_ages = None
+    if upstream_available(cache):
+        max_ages = {}
+        for key in keys:
+            section = key.rsplit(":", 1)[-1]
+            if section in SECTION_TIMEOUTS:
+                max_ages[key] = SECTION_TIMEOUTS[section] * CACHE_HARD_TTL_FACTOR
+    rows = read_entries(keys, max_ages)
+    if not rows:
+        return {}
+    loads = _cache_backend(cache).serializer.loads
+    found = {}
+    for key, (raw, _, _) in rows.items():
+        try:
+            found[key] = decode_value(raw, loads)
+        except Exception as e:
+            logger.error(f"Error decoding key '{key}' from persistent cache: {str(e)}")
+            inc("cache_errors_total", operation="decode")
+    try:
+        _restore_rows(cache, client, [(key, *rows[key]) for key in found])
+    except Exception as e:
+        logger.error(f"Error restoring keys from persistent cache: {str(e)}")
+        inc("cache_errors_total", operation="write")
+    return found
+
+def warm_cache_from_disk(cache):
+    """
+    Repovoa o Redis a partir da camada persistente quando ele volta vazio
+    (reinício do contêiner ou volume apagado), em blocos e sem chamar o Yahoo.
+
+    Um marcador sem TTL no Redis indica que o conteúdo atual já foi
+    repovoado: ele some junto com os dados, e só o worker que o recriar
+    (SET NX) faz a carga.
+
+    Returns:
+        int: Quantidade de chaves restauradas.
+    """
+    client = get_redis_client(cache)
+    if not PERSISTENT_CACHE_ENABLED or client is None:
+        return 0
+    if not client.set(f"{get_cache_prefix(cache)}persistent:loaded", time.time(), nx=True):
+        return 0
 
+    started = time.monotonic()
+    restored = 0
+    for rows in iter_entries():
+        restored += len(_restore_rows(cache, client, rows))
+    inc("persistent_cache_total", restored, result="restored")
+    logger.info("Restored %d keys from the persistent cache in %.1fs.", restored, time.monotonic() - started)
+    return restored
+
+def start_persistent_cache(cache):
+    """
+    Inicia a camada persistente do processo: gravação assíncrona em disco e
+    verificação periódica de que o Redis precisa ser repovoado.
+    """
+    start_persistent_writer(periodic=lambda: warm_cache_from_disk(cache))
+
+def content_version(value, fetched_at):
+    """
+    Short hash of a section's content. A refresh that brings back the same
+    data keeps the version, so ETags built from it stay valid. Values that
+    cannot be encoded as JSON are versioned by fetch time instead.
+    """
+    try:
+        payload = dumps_bytes(value)
+    except (TypeError, ValueError):
+        payload = repr(fetched_at).encode()
+    return hashlib.blake2b(payload, digest_size=8).hexdigest()
+
+def version_key(cache, section):
+    """
+    Returns the Redis hash mapping each ticker to '<version>:<fetched_at>'
+    of its latest write of a section.
+    """
+    return f"{get_cache_prefix(cache)}versions:{section}"
+
+def index_versions(cache, versions):
+    """
+    Records the versions just written ({section: {ticker: '<version>:<fetched_at>'}}).
+    """
+    client = get_redis_client(cache)
+    if client is None or not versions:
+        return
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for section, entries in versions.items():
+            pipe.hset(version_key(cache, section), mapping=entries)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error indexing versions: {str(e)}")
+        inc("cache_errors_total", operation="version_write")
+
+def get_section_versions(cache, tickers, sections):
+    """
+    Reads the versions of several tickers' sections without touching the
+    cached payloads (one HMGET per section, in a single pipeline).
+
+    Returns:
+        dict: {ticker: [(version, fetched_at) por seção]} apenas para
+        tickers com todas as seções versionadas.
+    """
+    client = get_redis_client(cache)
+    if client is None or not tickers:
+        return {}
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for section in sections:
+            pipe.hmget(version_key(cache, section), tickers)
+        rows = pipe.execute()
+    except Exception as e:
+        logger.error(f"Error reading versions for {tickers}: {str(e)}")
+        inc("cache_errors_total", operation="version_read")
+        return {}
+
+    versions = {}
+    for i, ticker in enumerate(tickers):
+        entries = [row[i] for row in rows]
+        if all(entries):
+            versions[ticker] = []
+            for entry in entries:
+                version, fetched_at = entry.decode().split(":", 1)
+                versions[ticker].append((version, float(fetched_at)))
+    return versions
+
+def fragment_key(cache, ticker, section):
+    """
+    Returns the Redis hash holding the JSON-encoded response items of one
+    section of a ticker, one field per projection.
+    """
+    return f"{get_cache_prefix(cache)}{section_key(ticker, section)}:json"
+
+def get_cached_fragments(cache, tickers, section, projection):
+    """
+    Reads already-encoded JSON items for several tickers in one pipeline.
+
+    Returns:
+        dict: {ticker: bytes} apenas para os tickers encontrados.
+    """
+    client = get_redis_client(cache)
+    if client is None or not tickers:
+        return {}
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for ticker in tickers:
+            pipe.hget(fragment_key(cache, ticker, section), projection)
+        values = pipe.execute()
+    except Exception as e:
+        logger.error(f"Error reading fragments for {tickers}: {str(e)}")
+        inc("cache_errors_total", operation="fragment_read")
+        return {}
+    return {ticker: value for ticker, value in zip(tickers, values) if value is not None}
+
+def cache_fragments(cache, section, projection, fragments):
+    """
+    Stores JSON-encoded items ({ticker: bytes}) for one projection.
+    The hash TTL is set only when it is created, so new projections never
+    extend the life of fragments built from the same section data.
+    """
+    client = get_redis_client(cache)
+    if client is None or not fragments:
+        return
+
+    ttl = max(1, min(FRAGMENT_CACHE_TTL, SECTION_TIMEOUTS[section]))
+    try:
+        pipe = client.pipeline(transaction=False)
+        for ticker, value in fragments.items():
+            key = fragment_key(cache, ticker, section)
+            pipe.hset(key, projection, value)
+            pipe.expire(key, ttl, nx=True)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error caching fragments for {list(fragments)}: {str(e)}")
+        inc("cache_errors_total", operation="fragment_write")
+
+def invalidate_fragments(cache, section_keys):
+    """
+    Drops the fragments of sections that were just rewritten.
+
+    Args:
+        section_keys (iterable): Chaves de seção ('PETR4.SA:info') gravadas.
+    """
+    client = get_redis_client(cache)
+    if client is None:
+        return
+
+    keys = [f"{get_cache_prefix(cache)}{key}:json" for key in section_keys]
+    if not keys:
+        return
+    try:
+        client.delete(*keys)
+    except Exception as e:
+        logger.error(f"Error invalidating fragments: {str(e)}")
+        inc("cache_errors_total", operation="fragment_write")
@@ -0,0 +1,178 @@
+import re
+import unicodedata
+import logging
+from services.cache_service import cache_ticker_data
+from services.ticker_index_service import TICKER_NOT_FOUND
+
+logger = logging.getLogger(__name__)
+
+# Palavras-chave por categoria, em ordem de prioridade (FII > ETF > UNIT).
+# Comparadas como substring nos nomes normalizados (sem acento, minúsculos).
+CATEGORY_KEYWORDS = {
+    "FII": ("fii", "imobiliario", "fundo de investimento imobiliario", "fiagro"),
+    "ETF": ("index", "ishare", "etf", "indice"),
+    "UNIT": ("unt", "unit"),
+}
+DEFAULT_CATEGORY = "Unknown"
+
+# Seção do cache com o veredito de classificação de cada ticker (TTL longo)
+CLASSIFICATION_SECTIONS = ("classification",)
+
+# Um único regex com um grupo nomeado por categoria; termos mais longos
+# primeiro para que a alternância não pare em um prefixo.
+_KEYWORD_MATCHER = re.compile("|".join(
+    f"(?P<{category}>" + "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)) + ")"
+    for category, terms in CATEGORY_KEYWORDS.items()
+))
+_CATEGORY_PRIORITY = {category: rank for rank, category in enumerate(CATEGORY_KEYWORDS)}
+
+# Códigos da B3: 4 letras + número do tipo de ativo (+ 'F' no mercado fracionário)
+_B3_CODE = re.compile(r"^([A-Z0-9]{4})(\d{1,2})F?(?:\.SA)?$")
+# Tipos de ativo cuja categoria sai do próprio código, sem consultar o Yahoo:
+# 3-8 são ações ON/PN (nunca FII, ETF ou UNIT), 32-35 são BDRs de empresas
+# e 39 são BDRs de ETFs. O sufixo 11 (FII, ETF, UNIT ou BDR antigo) é ambíguo.
+CODE_CATEGORIES = {
+    **{str(number): DEFAULT_CATEGORY for number in range(3, 9)},
+    **{str(number): DEFAULT_CATEGORY for number in range(32, 36)},
+    "39": "ETF",
+}
+
+
+def normalize_text(text):
+    """Remove acentos e converte o texto para minúsculas."""
+    return ''.join(
+        c for c in unicodedata.normalize('NFKD', text)
+        if not unicodedata.combining(c)
+    ).lower()
+
+
+def match_category(*texts):
+    """
+    Categoria de maior prioridade encontrada nos textos normalizados.
+    """
+    best = None
+    for text in texts:
+        for match in _KEYWORD_MATCHER.finditer(text):
+            category = match.lastgroup
+            if best is None or _CATEGORY_PRIORITY[category] < _CATEGORY_PRIORITY[best]:
+                best = category
+                if _CATEGORY_PRIORITY[best] == 0:
+                    return best
+    return best or DEFAULT_CATEGORY
+
+
+def classify_by_code(ticker):
+    """
+    Pré-classifica um ticker apenas pelo código B3.
+
+    Returns:
+        str: Categoria, ou None quando o código não basta (ex.: sufixo 11).
+    """
+    match = _B3_CODE.match(ticker.strip().upper())
+    if not match:
+        return None
+    return CODE_CATEGORIES.get(match.group(2))
+
+
+def classify_info(ticker, info):
+    """
+    Veredito de classificação a partir do `info` do Yahoo.
+
+    Returns:
+        dict: Item de /classify_assets (ticker, nomes normalizados e categoria).
+    """
+    long_name = normalize_text(info.get("longName") or "N/A")
+    short_name = normalize_text(info.get("shortName") or "N/A")
+    return {
+        "ticker": ticker,
+        "shortName": short_name,
+        "longName": long_name,
+        "longBusinessSummary": info.get("longBusinessSummary", "N/A"),
+        "category": match_category(long_name, short_name),
+    }
+
+
+def code_verdict(ticker, category, info=None):
+    """
+    Item de /classify_assets para tickers classificados só pelo código.
+    Os nomes vêm do `info` em cache, quando houver; sem ele saem como
+    'n/a' (o Yahoo não é consultado).
+    """
+    if info:
+        return dict(classify_info(ticker, info), category=category)
+    return {
+        "ticker": ticker,
+        "shortName": "n/a",
+        "longName": "n/a",
+        "longBusinessSummary": "N/A",
+        "category": category,
+    }
+
+
+def code_classifiable(tickers, cached_verdicts):
+    """Tickers sem veredito em cache que o código B3 basta para classificar."""
+    return [ticker for ticker in tickers if ticker not in cached_verdicts and classify_by_code(ticker) is not None]
+
+
+def classify_ticker_data(ticker, data):
+    """
+    Item de /classify_assets a partir dos dados de um ticker (seção `info`).
+    """
+    try:
+        if data and "error" in data:
+            return {"ticker": ticker, "error": data["error"]}
+        return classify_info(ticker, data.get("info", {}))
+    except Exception as e:
+        logger.error(f"Error classifying ticker: {ticker}. Error: {str(e)}")
+        return {"ticker": ticker, "error": "Processing error", "exception": str(e)}
+
+
+def preclassify(tickers, cached_verdicts, cached_info=None, known_invalid=()):
+    """
+    Resolve o que não precisa do Yahoo: tickers sabidamente inexistentes,
+    vereditos em cache e códigos B3 não ambíguos.
+
+    Args:
+        tickers (list): Tickers normalizados.
+        cached_verdicts (dict): {ticker: {"classification": veredito}} lidos do cache.
+        cached_info (dict): {ticker: {"info": info}} em cache, para os nomes
+            dos tickers classificados pelo código.
+        known_invalid (iterable): tickers com veredito negativo no índice.
+
+    Returns:
+        tuple: (resolved, pending) — {ticker: item} e tickers que ainda
+        precisam do `info` do Yahoo.
+    """
+    cached_info = cached_info or {}
+    known_invalid = set(known_invalid)
+    resolved = {}
+    pending = []
+    for ticker in dict.fromkeys(tickers):
+        if ticker in known_invalid:
+            resolved[ticker] = {"ticker": ticker, "error": TICKER_NOT_FOUND}
+            continue
+        if ticker in cached_verdicts:
+            resolved[ticker] = cached_verdicts[ticker]["classification"]
+            continue
+        category = classify_by_code(ticker)
+        if category is not None:
+            resolved[ticker] = code_verdict(ticker, category, cached_info.get(ticker, {}).get("info"))
+        else:
+            pending.append(ticker)
+    if resolved:
+        logger.debug("Classified %d tickers without upstream fetch.", len(resolved))
+    return resolved, pending
+
+
+def cache_classifications(cache, items):
+    """
+    Grava os vereditos obtidos a partir do `info`. Erros e tickers sem nome
+    (info vazio) não são cacheados, para não fixar um 'Unknown' por dias.
+    """
+    verdicts = {
+        item["ticker"]: {"classification": item}
+        for item in items
+        if "error" not in item and (item["longName"], item["shortName"]) != ("n/a", "n/a")
+    }
+    if verdicts:
+        cache_ticker_data(cache, verdicts)
@@ -0,0 +1,116 @@
+import json
+import os
+import logging
+from os.path import abspath, dirname, exists, join
+from flask import Response, jsonify
+
+logger = logging.getLogger(__name__)
+
+DOCS_DIR = join(dirname(dirname(abspath(__file__))), "docs")
+# Spec OpenAPI pré-compilada (python docs/build_apispec.py); sem ela, os YAML
+# de docs/ são montados com o flasgger na inicialização
+OPENAPI_SPEC_PATH = os.getenv("OPENAPI_SPEC_PATH", join(DOCS_DIR, "apispec.json"))
+DOC_NAMES = ["fetch_stock_info", "fetch_market_price", "classify_assets", "fetch_asset_info", "fetch_history", "batch"]
+
+# Swagger configuration
+SWAGGER_CONFIG = {
+    "headers": [],
+    "specs": [
+        {
+            "endpoint": "apispec",
+            "route": "/apispec.json",
+            "rule_filter": lambda rule: True,
+            "model_filter": lambda tag: True,
+        }
+    ],
+    "swagger_ui": True,
+    "specs_route": "/docs/",
+}
+
+# Swagger UI servido a partir dos arquivos de static/, sem o flasgger
+SWAGGER_UI_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <title>API Documentation</title>
+  <link rel="stylesheet" href="/static/swagger-ui.css">
+</head>
+<body>
+  <div id="swagger-ui"></div>
+  <script src="/static/swagger-ui-bundle.js"></script>
+  <script src="/static/swagger-ui-standalone-preset.js"></script>
+  <script>
+    window.ui = SwaggerUIBundle({
+      url: "/apispec.json",
+      dom_id: "#swagger-ui",
+      presets: [SwaggerUIBundle.presets.apis, SwaggerUIStandalonePreset],
+      layout: "StandaloneLayout",
+    });
+  </script>
+</body>
+</html>
+"""
+
+
+def load_swagger_template():
+    """
+    Monta o template do Swagger a partir dos arquivos YAML de docs/.
+    """
+    import yaml
+
+    swagger_docs = {"swagger": "2.0", "info": {"title": "API Documentation", "version": "1.0"}, "paths": {}}
+    for doc_name in DOC_NAMES:
+        file_path = join(DOCS_DIR, f"{doc_name}.yaml")
+        try:
+            with open(file_path, 'r') as file:
+                doc_content = yaml.safe_load(file)
+                if doc_content and "paths" in doc_content:
+                    swagger_docs["paths"].update(doc_content["paths"])
+                else:
+                    logger.error(f"Invalid or empty YAML content in {file_path}")
+        except Exception as e:
+            logger.error(f"Error loading YAML file {file_path}: {e}")
+    return swagger_docs
+
+
+def init_flasgger(app):
+    """
+    Registra o flasgger no app com o template montado dos YAML.
+    """
+    from flasgger import Swagger
+
+    return Swagger(app, config=SWAGGER_CONFIG, template=load_swagger_template())
+
+
+def build_spec():
+    """
+    Gera a spec exatamente como o flasgger a serviria em /apispec.json.
+    """
+    from flask import Flask
+
+    app = Flask("apispec")
+    init_flasgger(app)
+    with app.test_client() as client:
+        return client.get("/apispec.json").get_json()
+
+
+def setup_docs(app):
+    """
+    Registra /apispec.json e /docs/. Com a spec pré-compilada, ambos são
+    servidos direto do artefato, sem importar flasgger nem ler YAML.
+    """
+    if not exists(OPENAPI_SPEC_PATH):
+        init_flasgger(app)
+        return
+
+    with open(OPENAPI_SPEC_PATH) as file:
+        spec = json.load(file)
+
+    def apispec():
+        return jsonify(spec)
+
+    def swagger_ui():
+        return Response(SWAGGER_UI_PAGE, mimetype="text/html")
+
+    app.add_url_rule("/apispec.json", "apispec", apispec)
+    app.add_url_rule("/docs/", "swagger_ui", swagger_ui)
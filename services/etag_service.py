@@ -0,0 +1,89 @@
+import hashlib
+import time
+import logging
+from services.cache_service import CACHE_HARD_TTL_FACTOR, SECTION_TIMEOUTS, get_section_versions, pin_section_versions, section_key
+from services.logging_service import count_request
+from services.utils import ensure_sa_suffix, track_cache_lookup
+
+logger = logging.getLogger(__name__)
+
+
+def compute_etag(cache, tickers, sections, *variant):
+    """
+    ETag (fraco) de uma resposta de tickers, calculado só com as versões das
+    seções em cache: não lê nem decodifica os dados.
+
+    O ETag é calculado antes de montar o corpo. Se uma atualização acontecer
+    entre as duas leituras, o corpo sai mais novo que o ETag e o cliente só
+    recebe um 200 a mais; nunca um 304 para dados que ele não tem. Para o
+    corpo nunca sair mais antigo, as versões lidas ficam fixadas na
+    requisição e cópias do L1 de outra versão são ignoradas.
+
+    Args:
+        tickers (list): tickers como enviados pelo cliente.
+        sections (iterable): seções que compõem a resposta.
+        *variant: o que mais muda o corpo (endpoint, projeção etc.).
+
+    Returns:
+        tuple: (etag, tickers normalizados, {ticker: seções vencidas}); etag é None
+        quando algum ticker não está em cache (ou passou do TTL rígido).
+    """
+    normalized_tickers = list(dict.fromkeys(ensure_sa_suffix(tickers)))
+    versions = get_section_versions(cache, normalized_tickers, sections)
+    pin_section_versions({
+        section_key(ticker, section): version
+        for ticker, ticker_versions in versions.items()
+        for section, version in zip(sections, ticker_versions)
+    })
+    if len(versions) < len(normalized_tickers):
+        return None, normalized_tickers, {}
+
+    now = time.time()
+    digest = hashlib.blake2b(repr(variant).encode(), digest_size=16)
+    stale_tickers = {}
+    for ticker in normalized_tickers:
+        digest.update(ticker.encode())
+        stale_sections = []
+        for section, (version, fetched_at) in zip(sections, versions[ticker]):
+            digest.update(version.encode())
+            age_ratio = (now - fetched_at) / max(SECTION_TIMEOUTS[section], 1)
+            if age_ratio >= CACHE_HARD_TTL_FACTOR:
+                # A chave já expirou no Redis: o corpo viria de uma nova busca
+                return None, normalized_tickers, {}
+            if age_ratio >= 1:
+                stale_sections.append(section)
+        if stale_sections:
+            stale_tickers[ticker] = tuple(stale_sections)
+    return digest.hexdigest(), normalized_tickers, stale_tickers
+
+
+def match_etag(cache, if_none_match, tickers, sections, *variant):
+    """
+    Requisição condicional: calcula o ETag e, se ele estiver em If-None-Match,
+    registra o acerto condicional. Compartilhado pelo main.py e pelo asgi.py.
+
+    Args:
+        if_none_match (werkzeug.datastructures.ETags): ETags enviados pelo cliente.
+        tickers (list): tickers como enviados pelo cliente.
+        sections (iterable): seções que compõem a resposta.
+        *variant: o que mais muda o corpo (endpoint, projeção etc.).
+
+    Returns:
+        tuple: (etag ou None, True se a resposta deve ser um 304).
+    """
+    etag, normalized_tickers, stale_tickers = compute_etag(cache, tickers, sections, *variant)
+    if etag is not None and if_none_match.contains_weak(etag):
+        not_modified(cache, etag, normalized_tickers, stale_tickers, sections)
+        return etag, True
+    return etag, False
+
+
+def not_modified(cache, etag, normalized_tickers, stale_tickers, sections):
+    """
+    Registra um acerto condicional (304): os acessos contam para o ranking de
+    tickers quentes e os vencidos entram na fila de atualização, como em
+    uma leitura normal do cache.
+    """
+    track_cache_lookup(cache, normalized_tickers, stale_tickers, sections)
+    count_request(not_modified=1, stale=len(stale_tickers))
+    logger.debug("ETag %s matched for %d tickers", etag, len(normalized_tickers))
@@ -0,0 +1,433 @@
+import os
+import sys
+import time
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import date, timedelta
+from services.cache_service import get_cache_prefix, get_redis_client
+from services.lease_service import (
+    SINGLEFLIGHT_MAX_WAIT,
+    acquire_leases,
+    new_lease_token,
+    release_leases,
+    wait_for_release,
+)
+from services.logging_service import count_request
+from services.metrics_service import inc, observe_stage
+from services.ticker_index_service import TICKER_NOT_FOUND, split_known_invalid, update_ticker_index
+from services.upstream_service import (
+    UPSTREAM_UNAVAILABLE,
+    UpstreamUnavailable,
+    capture_download_errors,
+    download_error,
+    is_rate_limited,
+    upstream_call,
+)
+
+logger = logging.getLogger(__name__)
+
+# Intervalo mínimo, em segundos, entre consultas ao Yahoo por barras novas de um ticker
+HISTORY_REFRESH_INTERVAL = int(os.getenv("HISTORY_REFRESH_INTERVAL", "900"))
+# Período devolvido quando a requisição não informa `start`, em dias
+HISTORY_DEFAULT_DAYS = int(os.getenv("HISTORY_DEFAULT_DAYS", "365"))
+# Maior período aceito em uma requisição, em dias
+HISTORY_MAX_DAYS = int(os.getenv("HISTORY_MAX_DAYS", "7320"))
+# Séries sem leitura nem escrita por este tempo, em segundos, saem do Redis
+HISTORY_TTL = int(os.getenv("HISTORY_TTL", "2592000"))
+
+# Coluna -> (coluna do yf.download, typecode do array). Cada coluna é uma
+# string do Redis com elementos de tamanho fixo (little-endian): a fatia
+# [i, j) é um GETRANGE direto e barras novas entram com APPEND.
+HISTORY_COLUMNS = {
+    "open": ("Open", "d"),
+    "high": ("High", "d"),
+    "low": ("Low", "d"),
+    "close": ("Close", "d"),
+    "adj_close": ("Adj Close", "d"),
+    "volume": ("Volume", "q"),
+}
+# Datas como dias desde 1970-01-01, em ordem crescente
+DATES_COLUMN = ("dates", "i")
+
+_EPOCH = date(1970, 1, 1)
+_ALL_COLUMNS = dict([DATES_COLUMN], **{name: typecode for name, (_, typecode) in HISTORY_COLUMNS.items()})
+
+
+def _key(cache, ticker, part):
+    return f"{get_cache_prefix(cache)}history:{ticker}:{part}"
+
+
+def _width(typecode):
+    return array(typecode).itemsize
+
+
+def _pack(values, typecode):
+    packed = array(typecode, values)
+    if sys.byteorder == "big":
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack(raw, typecode):
+    values = array(typecode)
+    values.frombytes(raw or b"")
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def _day(value):
+    return (value - _EPOCH).days
+
+
+def _iso(day):
+    return (_EPOCH + timedelta(days=day)).isoformat()
+
+
+def parse_history_range(start=None, end=None):
+    """
+    Converte `start`/`end` (YYYY-MM-DD) em dias desde 1970-01-01.
+
+    Returns:
+        tuple: (start_day, end_day), ambos inclusivos.
+
+    Raises:
+        ValueError: datas inválidas, invertidas ou período acima de HISTORY_MAX_DAYS.
+    """
+    try:
+        end_day = _day(date.fromisoformat(end)) if end else _day(date.today())
+        start_day = _day(date.fromisoformat(start)) if start else end_day - HISTORY_DEFAULT_DAYS
+    except (TypeError, ValueError):
+        raise ValueError("start and end must be dates in the YYYY-MM-DD format")
+    if start_day > end_day:
+        raise ValueError("start must not be after end")
+    if end_day - start_day > HISTORY_MAX_DAYS:
+        raise ValueError(f"History range must not exceed {HISTORY_MAX_DAYS} days")
+    return start_day, end_day
+
+
+def _read_state(client, cache, tickers):
+    """Datas armazenadas e metadados de cada ticker, em um único pipeline."""
+    pipe = client.pipeline(transaction=False)
+    for ticker in tickers:
+        pipe.get(_key(cache, ticker, DATES_COLUMN[0]))
+        pipe.hgetall(_key(cache, ticker, "meta"))
+    replies = pipe.execute()
+    return {
+        ticker: (
+            _unpack(replies[2 * i], DATES_COLUMN[1]),
+            {field.decode(): float(value) for field, value in replies[2 * i + 1].items()},
+        )
+        for i, ticker in enumerate(tickers)
+    }
+
+
+def _plan(state, start_day, end_day, today, now):
+    """
+    Buscas necessárias para cobrir [start_day, end_day] em um ticker.
+
+    Returns:
+        list: (tipo, início, fim exclusivo) com tipo 'full', 'backfill' ou 'delta'.
+    """
+    dates, meta = state
+    if not dates:
+        return [("full", start_day, today + 1)]
+    plan = []
+    if start_day < meta.get("covered_from", dates[0]):
+        plan.append(("backfill", start_day, dates[0]))
+    if end_day >= dates[-1] and now - meta.get("checked_at", 0) >= HISTORY_REFRESH_INTERVAL:
+        # A última barra armazenada é buscada de novo: pode ter sido parcial (pregão aberto)
+        plan.append(("delta", dates[-1], today + 1))
+    return plan
+
+
+def _download(cache, tickers, start_day, end_day):
+    import yfinance as yf
+
+    count_request(upstream=len(tickers))
+    try:
+        with upstream_call(cache, "history", cost=len(tickers)) as call:
+            inc("upstream_calls_total", kind="history")
+            with observe_stage("upstream_history"), capture_download_errors(tickers) as captured:
+                df = yf.download(
+                    tickers,
+                    start=_iso(start_day),
+                    end=_iso(end_day),
+                    group_by="ticker",
+                    auto_adjust=False,
+                    threads=True,
+                    progress=False,
+                )
+            errors = {ticker: download_error(captured, ticker) for ticker in tickers}
+            if is_rate_limited(captured) and not (df is None or df.empty):
+                # Lote limitado em parte: as barras obtidas são gravadas, e o limite conta para o circuito
+                logger.warning("Yahoo Finance rate limit reached in history download of %d tickers.", len(tickers))
+                inc("upstream_errors_total", kind="history")
+                call.failed()
+            elif (df is None or df.empty) and "failed" in errors.values():
+                # Frame vazio com erro de rede/HTTP registrado: falha do upstream.
+                # Vazio sem erro (ex.: período sem pregões) não abre o circuito
+                call.failed()
+                raise RuntimeError("Yahoo Finance returned no history data")
+            return df, errors
+    except UpstreamUnavailable as e:
+        # Sem busca: a série em cache é servida como está
+        logger.warning("Skipping history download: %s", e)
+        count_request(upstream_blocked=len(tickers))
+        return None, {}
+    except (Exception, SystemExit) as e:
+        inc("upstream_errors_total", kind="history")
+        logger.error(f"Error downloading history for {tickers}: {str(e)}")
+        return None, {}
+
+
+def _frame_rows(df, ticker):
+    """
+    Barras diárias de um ticker no frame do yf.download, como colunas.
+
+    Returns:
+        tuple: (dias, {coluna: valores}); dias vazio se não houver barras.
+    """
+    import numpy as np
+
+    levels = getattr(getattr(df, "columns", None), "levels", None)
+    if df is None or df.empty or not levels or ticker not in levels[0]:
+        return [], {}
+    frame = df[ticker]
+    if "Close" not in frame:
+        return [], {}
+    frame = frame[frame["Close"].notna()]
+    days = frame.index.values.astype("datetime64[D]").astype(np.int64).tolist()
+    columns = {}
+    for name, (source, typecode) in HISTORY_COLUMNS.items():
+        values = frame[source] if source in frame else frame["Close"]
+        if typecode == "q":
+            values = values.fillna(0).astype("int64")
+        columns[name] = values.tolist()
+    return days, columns
+
+
+def _write(pipe, cache, ticker, kind, state, days, columns, fetch_start):
+    """Enfileira no pipeline a gravação das barras obtidas para um ticker."""
+    stored_dates, _ = state
+    date_key = _key(cache, ticker, DATES_COLUMN[0])
+
+    if kind == "full":
+        pipe.set(date_key, _pack(days, DATES_COLUMN[1]))
+        for name, (_, typecode) in HISTORY_COLUMNS.items():
+            pipe.set(_key(cache, ticker, name), _pack(columns[name], typecode))
+        pipe.hset(_key(cache, ticker, "meta"), mapping={"covered_from": fetch_start, "checked_at": time.time()})
+        return
+
+    # delta: a última barra armazenada é sobrescrita no lugar (elementos de
+    # tamanho fixo) e as barras seguintes entram no fim de cada coluna
+    last = stored_dates[-1]
+    first_new = bisect_left(days, last)
+    if first_new < len(days) and days[first_new] == last:
+        offset = len(stored_dates) - 1
+        for name, (_, typecode) in HISTORY_COLUMNS.items():
+            value = _pack(columns[name][first_new:first_new + 1], typecode)
+            pipe.setrange(_key(cache, ticker, name), offset * _width(typecode), value)
+        first_new += 1
+    if first_new < len(days):
+        pipe.append(date_key, _pack(days[first_new:], DATES_COLUMN[1]))
+        for name, (_, typecode) in HISTORY_COLUMNS.items():
+            pipe.append(_key(cache, ticker, name), _pack(columns[name][first_new:], typecode))
+    pipe.hset(_key(cache, ticker, "meta"), "checked_at", time.time())
+
+
+def _write_backfill(client, pipe, cache, ticker, state, days, columns, fetch_start):
+    """
+    Enfileira as barras anteriores ao início da série. Como elas entram na
+    frente, cada coluna é lida e regravada inteira (só em pedidos de um
+    período mais antigo que o já coberto).
+    """
+    stored_dates, _ = state
+    count = bisect_left(days, stored_dates[0])
+    names = list(_ALL_COLUMNS)
+    stored = client.mget([_key(cache, ticker, name) for name in names])
+    new_columns = dict(columns, **{DATES_COLUMN[0]: days})
+    for name, raw in zip(names, stored):
+        pipe.set(_key(cache, ticker, name), _pack(new_columns[name][:count], _ALL_COLUMNS[name]) + (raw or b""))
+    pipe.hset(_key(cache, ticker, "meta"), "covered_from", fetch_start)
+
+
+def _touch(pipe, cache, ticker):
+    for name in (*_ALL_COLUMNS, "meta"):
+        pipe.expire(_key(cache, ticker, name), HISTORY_TTL)
+
+
+# Ordem de execução dos grupos: a delta sobrescreve a última barra pelo índice
+# lido em _read_state, que deixaria de valer depois de um backfill (barras na frente)
+_PLAN_ORDER = {"full": 0, "delta": 1, "backfill": 2}
+
+
+def _sync(client, cache, tickers, start_day, end_day):
+    """
+    Busca no Yahoo apenas os intervalos que faltam e os grava nas séries.
+    Tickers com o mesmo intervalo a buscar compartilham um yf.download.
+
+    Returns:
+        list: tickers sem nenhuma barra no Yahoo (inexistentes).
+    """
+    today = _day(date.today())
+    now = time.time()
+    states = _read_state(client, cache, tickers)
+    groups = defaultdict(list)
+    for ticker, state in states.items():
+        for kind, fetch_start, fetch_end in _plan(state, start_day, end_day, today, now):
+            groups[(kind, fetch_start, fetch_end)].append(ticker)
+
+    valid, invalid = [], []
+    for (kind, fetch_start, fetch_end), group in sorted(groups.items(), key=lambda item: _PLAN_ORDER[item[0][0]]):
+        df, errors = _download(cache, group, fetch_start, fetch_end)
+        if df is None:
+            continue
+        # MULTI/EXEC: uma leitura nunca vê colunas de tamanhos diferentes
+        pipe = client.pipeline(transaction=True)
+        for ticker in group:
+            days, columns = _frame_rows(df, ticker)
+            if kind == "full":
+                if not days:
+                    # Veredito negativo só com erro de símbolo não encontrado registrado pelo yfinance
+                    if errors.get(ticker) == "not_found":
+                        invalid.append(ticker)
+                    continue
+                valid.append(ticker)
+                _write(pipe, cache, ticker, kind, states[ticker], days, columns, fetch_start)
+            elif kind == "backfill":
+                if days:
+                    _write_backfill(client, pipe, cache, ticker, states[ticker], days, columns, fetch_start)
+                else:
+                    # Nada antes da série (ex.: ticker listado depois): período marcado como coberto
+                    pipe.hset(_key(cache, ticker, "meta"), "covered_from", fetch_start)
+            else:
+                _write(pipe, cache, ticker, kind, states[ticker], days, columns, fetch_start)
+            _touch(pipe, cache, ticker)
+        pipe.execute()
+
+    if valid or invalid:
+        update_ticker_index(cache, valid, invalid)
+    return invalid
+
+
+# Tentativas de leitura quando um backfill desloca a série entre os dois round trips
+_READ_ATTEMPTS = 3
+
+
+def _read_slices(client, cache, tickers, start_day, end_day):
+    """
+    Lê apenas a fatia [start_day, end_day] de cada série: a coluna de datas
+    localiza os índices e as demais colunas são lidas com GETRANGE.
+    A fatia de datas é relida junto com as colunas; se um backfill deslocou
+    a série no intervalo, o ticker é lido de novo.
+    """
+    slices = {}
+    for _ in range(_READ_ATTEMPTS):
+        slices.update(_read_slices_once(client, cache, [t for t in tickers if t not in slices], start_day, end_day))
+        if len(slices) == len(tickers):
+            break
+    return {ticker: slices.get(ticker, {"ticker": ticker, "error": "History is being updated, retry"}) for ticker in tickers}
+
+
+def _read_slices_once(client, cache, tickers, start_day, end_day):
+    pipe = client.pipeline(transaction=False)
+    for ticker in tickers:
+        pipe.get(_key(cache, ticker, DATES_COLUMN[0]))
+    all_dates = [_unpack(raw, DATES_COLUMN[1]) for raw in pipe.execute()]
+
+    bounds = []
+    pipe = client.pipeline(transaction=True)
+    for ticker, dates in zip(tickers, all_dates):
+        first, last = bisect_left(dates, start_day), bisect_right(dates, end_day)
+        bounds.append((first, last))
+        if last > first:
+            for name, typecode in _ALL_COLUMNS.items():
+                width = _width(typecode)
+                pipe.getrange(_key(cache, ticker, name), first * width, last * width - 1)
+        _touch(pipe, cache, ticker)
+    replies = iter(pipe.execute())
+
+    slices = {}
+    for ticker, dates, (first, last) in zip(tickers, all_dates, bounds):
+        series = {"ticker": ticker, "dates": [_iso(day) for day in dates[first:last]]}
+        consistent = True
+        for name, typecode in _ALL_COLUMNS.items():
+            values = _unpack(next(replies), typecode) if last > first else []
+            if name == DATES_COLUMN[0]:
+                consistent = list(values) == list(dates[first:last])
+            else:
+                # NaN (campo ausente em um pregão) sai como null
+                series[name] = [None if value != value else value for value in values]
+        for _ in range(len(_ALL_COLUMNS) + 1):
+            next(replies)  # respostas dos EXPIRE
+        if consistent:
+            slices[ticker] = series
+    return slices
+
+
+def fetch_history(tickers, cache, start_day, end_day):
+    """
+    Séries diárias OHLCV de vários tickers no período [start_day, end_day].
+
+    Cada série fica no Redis em formato colunar: só os intervalos ainda não
+    armazenados são buscados no Yahoo (a série inteira na primeira vez, depois
+    apenas as barras novas), e só a fatia pedida é lida de volta.
+
+    Args:
+        tickers (list): tickers normalizados.
+        cache: instância de cache (backend Redis).
+        start_day (int), end_day (int): período, de parse_history_range.
+
+    Returns:
+        dict: {ticker: {"ticker", "dates", "open", ..., "volume"} ou {"ticker", "error"}}.
+        "Ticker not found" só para vereditos negativos confirmados; um ticker
+        sem nenhuma barra armazenada cuja busca falhou volta como
+        "Upstream unavailable", nunca como série vazia.
+    """
+    client = get_redis_client(cache)
+    if client is None:
+        raise RuntimeError("History storage requires the Redis cache backend")
+
+    requested = list(dict.fromkeys(tickers))
+    known_invalid, tickers = split_known_invalid(cache, requested)
+    count_request(known_invalid=len(known_invalid))
+    results = {ticker: {"ticker": ticker, "error": TICKER_NOT_FOUND} for ticker in known_invalid}
+    if not tickers:
+        return results
+
+    with observe_stage("history_read"):
+        states = _read_state(client, cache, tickers)
+    today, now = _day(date.today()), time.time()
+    stale = [ticker for ticker in tickers if _plan(states[ticker], start_day, end_day, today, now)]
+    count_request(history_hits=len(tickers) - len(stale))
+
+    if stale:
+        # Um worker por ticker busca no Yahoo; os demais aguardam e leem o resultado
+        token = new_lease_token()
+        names = {f"history:{ticker}": ticker for ticker in stale}
+        owned, contended = acquire_leases(cache, list(names), token)
+        try:
+            if owned:
+                for ticker in _sync(client, cache, [names[name] for name in owned], start_day, end_day):
+                    results[ticker] = {"ticker": ticker, "error": TICKER_NOT_FOUND}
+        finally:
+            release_leases(cache, owned, token)
+        if contended:
+            wait_for_release(cache, contended, SINGLEFLIGHT_MAX_WAIT)
+
+        # Sem barras antes e depois da busca, e sem veredito: o Yahoo falhou (aqui ou no dono do lease)
+        empty = [ticker for ticker in stale if not states[ticker][0] and ticker not in results]
+        if empty:
+            with observe_stage("history_read"):
+                stored = _read_state(client, cache, empty)
+            for ticker in empty:
+                if not stored[ticker][0]:
+                    results[ticker] = {"ticker": ticker, "error": UPSTREAM_UNAVAILABLE}
+
+    remaining = [ticker for ticker in tickers if ticker not in results]
+    with observe_stage("history_read"):
+        results.update(_read_slices(client, cache, remaining, start_day, end_day))
+    return {ticker: results[ticker] for ticker in requested}
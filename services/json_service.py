@@ -0,0 +1,76 @@
+import dataclasses
+import decimal
+import json
+import os
+import uuid
+import logging
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional; sem ele o json da stdlib é usado
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Codificador das respostas JSON: 'orjson' (se instalado) ou 'json'
+JSON_ENCODER = os.getenv("JSON_ENCODER", "orjson" if orjson else "json")
+if JSON_ENCODER == "orjson" and orjson is None:
+    logger.warning("JSON_ENCODER=orjson but orjson is not installed; falling back to json.")
+    JSON_ENCODER = "json"
+
+# Chaves ordenadas como no jsonify; datas passam pelo _default (formato HTTP,
+# como no Flask), e NaN vira null em vez do literal NaN, que não é JSON válido
+_ORJSON_OPTIONS = (
+    orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+    if orjson else 0
+)
+
+
+def _default(o):
+    # Mesmos tipos extras que o provider padrão do Flask aceita
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, (decimal.Decimal, uuid.UUID)):
+        return str(o)
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    """
+    Codifica `obj` em JSON compacto (bytes) com o codificador configurado.
+    """
+    if JSON_ENCODER == "orjson":
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=_default, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def json_array(fragments):
+    """Monta um array JSON a partir de itens já codificados, sem recodificá-los."""
+    return b"[" + b",".join(fragments) + b"]"
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Provider do Flask que usa o orjson no jsonify das respostas, quando
+    disponível. Saídas formatadas (modo debug) seguem pelo json da stdlib.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if JSON_ENCODER == "orjson" and not kwargs:
+            return dumps_bytes(obj).decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if JSON_ENCODER != "orjson" or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+        if args and kwargs:
+            raise TypeError("jsonify() behavior undefined when passed both args and kwargs")
+        obj = args[0] if len(args) == 1 else (args or kwargs or None)
+        return self._app.response_class(dumps_bytes(obj) + b"\n", mimetype=self.mimetype)
@@ -0,0 +1,174 @@
+import os
+import time
+import uuid
+import logging
+from services.cache_service import TICKER_SECTIONS, get_redis_client, get_cached_sections, get_cache_prefix
+
+logger = logging.getLogger(__name__)
+
+# Tempo de vida do lease de atualização de um ticker, em segundos
+SINGLEFLIGHT_LEASE_TTL = float(os.getenv("SINGLEFLIGHT_LEASE_TTL", "30"))
+# Tempo máximo que um worker espera pelo dono do lease antes de buscar sozinho
+SINGLEFLIGHT_MAX_WAIT = float(os.getenv("SINGLEFLIGHT_MAX_WAIT", "10"))
+
+# Intervalo inicial e máximo entre consultas ao Redis durante a espera
+_POLL_INITIAL = 0.05
+_POLL_MAX = 0.5
+
+# Remove o lease apenas se ainda pertencer a quem o adquiriu
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def _lease_key(cache, ticker):
+    return f"{get_cache_prefix(cache)}lease:{ticker}"
+
+
+def new_lease_token():
+    """
+    Gera um identificador único para os leases de uma requisição.
+    """
+    return uuid.uuid4().hex
+
+
+def acquire_leases(cache, tickers, token):
+    """
+    Tenta adquirir o lease de atualização de cada ticker (SET NX PX),
+    em um único pipeline.
+
+    Sem cliente Redis disponível, todos os tickers são considerados próprios.
+
+    Args:
+        cache (Cache): Instância do cache.
+        tickers (list): Tickers normalizados.
+        token (str): Identificador do dono dos leases.
+
+    Returns:
+        tuple: (owned, contended) — tickers a buscar e tickers já em atualização
+        por outro worker.
+    """
+    client = get_redis_client(cache)
+    if client is None or not tickers:
+        return list(tickers), []
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for ticker in tickers:
+            pipe.set(_lease_key(cache, ticker), token, nx=True, px=int(SINGLEFLIGHT_LEASE_TTL * 1000))
+        results = pipe.execute()
+    except Exception as e:
+        logger.error(f"Error acquiring leases for {tickers}: {str(e)}")
+        return list(tickers), []
+
+    owned = [ticker for ticker, acquired in zip(tickers, results) if acquired]
+    contended = [ticker for ticker, acquired in zip(tickers, results) if not acquired]
+    return owned, contended
+
+
+def release_leases(cache, tickers, token):
+    """
+    Libera os leases adquiridos por `token`, sem tocar nos de outros donos.
+    """
+    client = get_redis_client(cache)
+    if client is None or not tickers:
+        return
+
+    try:
+        release = client.register_script(_RELEASE_SCRIPT)
+        pipe = client.pipeline(transaction=False)
+        for ticker in tickers:
+            release(keys=[_lease_key(cache, ticker)], args=[token], client=pipe)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error releasing leases for {tickers}: {str(e)}")
+
+
+def wait_for_leases(cache, tickers, timeout, sections=TICKER_SECTIONS):
+    """
+    Aguarda os donos dos leases gravarem os tickers no cache.
+
+    A espera termina quando todos os tickers aparecem no cache, quando o
+    lease de um ticker some sem dados (o dono falhou) ou após `timeout`.
+
+    Args:
+        cache (Cache): Instância do cache.
+        tickers (list): Tickers em atualização por outros workers.
+        timeout (float): Espera máxima em segundos.
+        sections (iterable): Seções que precisam estar no cache.
+
+    Returns:
+        tuple: (found, orphaned) — dados obtidos do cache e tickers que
+        continuam sem dados e devem ser buscados pelo próprio worker.
+    """
+    client = get_redis_client(cache)
+    found = {}
+    waiting = list(tickers)
+    if client is None:
+        return found, waiting
+
+    deadline = time.monotonic() + max(0, timeout)
+    interval = _POLL_INITIAL
+    orphaned = []
+
+    while waiting:
+        try:
+            found.update(get_cached_sections(cache, waiting, sections))
+            waiting = [ticker for ticker in waiting if ticker not in found]
+            if waiting:
+                pipe = client.pipeline(transaction=False)
+                for ticker in waiting:
+                    pipe.exists(_lease_key(cache, ticker))
+                held = pipe.execute()
+                orphaned.extend(ticker for ticker, exists in zip(waiting, held) if not exists)
+                waiting = [ticker for ticker, exists in zip(waiting, held) if exists]
+        except Exception as e:
+            logger.error(f"Error waiting for leases on {waiting}: {str(e)}")
+            break
+
+        remaining = deadline - time.monotonic()
+        if not waiting or remaining <= 0:
+            break
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, _POLL_MAX)
+
+    if waiting:
+        logger.warning("Timed out waiting for leases on %d tickers: %s", len(waiting), waiting)
+    return found, orphaned + waiting
+
+
+def wait_for_release(cache, names, timeout):
+    """
+    Aguarda a liberação de leases usados para outros trabalhos além do
+    cache de seções (ex.: 'history:<TICKER>'), até `timeout` segundos.
+
+    Returns:
+        list: nomes cujo lease ainda estava ativo ao fim da espera.
+    """
+    client = get_redis_client(cache)
+    waiting = list(names)
+    if client is None:
+        return []
+
+    deadline = time.monotonic() + max(0, timeout)
+    interval = _POLL_INITIAL
+    while waiting:
+        try:
+            pipe = client.pipeline(transaction=False)
+            for name in waiting:
+                pipe.exists(_lease_key(cache, name))
+            held = pipe.execute()
+            waiting = [name for name, exists in zip(waiting, held) if exists]
+        except Exception as e:
+            logger.error(f"Error waiting for leases on {waiting}: {str(e)}")
+            break
+
+        remaining = deadline - time.monotonic()
+        if not waiting or remaining <= 0:
+            break
+        time.sleep(min(interval, remaining))
+        interval = min(interval * 2, _POLL_MAX)
+    return waiting
@@ -1,8 +1,185 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from contextvars import ContextVar
+
+from services.metrics_service import inc
+
+# Nível dos logs do app (DEBUG, INFO, WARNING...)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# 'text' (uma linha legível) ou 'json' (um objeto JSON por linha)
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# Fração dos eventos por ticker (nível DEBUG) efetivamente registrada
+LOG_TICKER_SAMPLE_RATE = float(os.getenv("LOG_TICKER_SAMPLE_RATE", "0.01"))
+# Capacidade da fila entre as threads do app e a thread que escreve os logs
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Contadores da requisição corrente, emitidos no resumo de uma linha
+_request_stats = ContextVar("request_stats", default=None)
+
+_listener = None
+_setup_lock = threading.Lock()
+
+
+def _restart_after_fork():
+    # A thread do QueueListener não existe no processo filho: sem reiniciá-la,
+    # os logs dos workers ficariam parados na fila herdada do master
+    global _listener, _setup_lock
+    _setup_lock = threading.Lock()
+    if _listener is None:
+        return
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, DroppingQueueHandler):
+            handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que nunca bloqueia nem formata na thread da requisição.
+
+    A formatação fica para a thread do QueueListener; com a fila cheia o
+    registro é descartado e contado, em vez de atrasar a resposta.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # O padrão (QueueHandler.prepare) formata a mensagem aqui; o listener
+        # roda no mesmo processo, então o registro pode seguir como está.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            inc("log_records_dropped_total")
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legível; campos estruturados saem como key=value."""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha, com os campos estruturados no topo."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
 
 def setup_logger():
     """
     Configura o logger para o app.
+
+    Os handlers do logger raiz são trocados por um QueueHandler: as threads
+    do app só enfileiram registros, e uma thread (QueueListener) formata e
+    escreve no stderr. Pode ser chamado mais de uma vez.
     """
-    logging.basicConfig(level=logging.INFO)
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            log_queue = queue.Queue(LOG_QUEUE_SIZE)
+            stream = logging.StreamHandler(sys.stderr)
+            if LOG_FORMAT == "json":
+                stream.setFormatter(JsonFormatter())
+            else:
+                stream.setFormatter(TextFormatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+            root = logging.getLogger()
+            for handler in list(root.handlers):
+                root.removeHandler(handler)
+            root.addHandler(DroppingQueueHandler(log_queue))
+            root.setLevel(LOG_LEVEL)
+
+            _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)
     return logging.getLogger(__name__)
+
+
+def log_ticker_event(logger, msg, *args):
+    """
+    Evento por ticker (DEBUG), amostrado por LOG_TICKER_SAMPLE_RATE.
+    A mensagem só é formatada se o evento for mantido.
+    """
+    if logger.isEnabledFor(logging.DEBUG) and random.random() < LOG_TICKER_SAMPLE_RATE:
+        logger.debug(msg, *args)
+
+
+def begin_request():
+    """Inicia os contadores do resumo da requisição corrente."""
+    stats = {"started": time.perf_counter()}
+    _request_stats.set(stats)
+    return stats
+
+
+def count_request(**counts):
+    """Soma contadores ao resumo da requisição corrente (se houver)."""
+    stats = _request_stats.get()
+    if stats is None:
+        return
+    for key, value in counts.items():
+        stats[key] = stats.get(key, 0) + value
+
+
+def get_request_counts():
+    """Contadores acumulados pela requisição corrente (vazio fora de requisições)."""
+    stats = _request_stats.get() or {}
+    return {key: value for key, value in stats.items() if key != "started"}
+
+
+def current_request_stats():
+    """Contadores da requisição corrente, para resumi-la depois (ex.: ao fim de um streaming)."""
+    return _request_stats.get()
+
+
+def log_request_summary(logger, stats=None, **fields):
+    """
+    Emite uma única linha estruturada por requisição, com os contadores
+    acumulados (acertos de cache, tickers buscados no Yahoo etc.).
+
+    Args:
+        stats (dict): contadores de `current_request_stats`; padrão: os da requisição corrente.
+    """
+    current = _request_stats.get()
+    if stats is None:
+        stats = current
+    summary = dict(fields)
+    if stats and "started" in stats:
+        summary["duration_ms"] = round((time.perf_counter() - stats["started"]) * 1000, 1)
+    summary.update((key, value) for key, value in (stats or {}).items() if key != "started")
+    logger.info("request", extra={"fields": summary})
+    if current is stats:
+        _request_stats.set(None)
+
+
+os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+logger = logging.getLogger(__name__)
+
+# Liga/desliga a coleta de métricas
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Intervalo, em segundos, entre os envios das métricas de cada worker ao Redis
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))
+METRICS_NAMESPACE = "asset_api"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25)
+BATCH_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# Família -> (tipo, descrição, buckets)
+METRICS = {
+    "requests_total": ("counter", "HTTP requests by endpoint and status.", None),
+    "admission_rejected_total": ("counter", "Requests refused by admission control by reason and token priority.", None),
+    "request_seconds": ("histogram", "HTTP request latency by endpoint.", LATENCY_BUCKETS),
+    "stage_seconds": ("histogram", "Latency of each request stage.", LATENCY_BUCKETS),
+    "batch_size": ("histogram", "Tickers per request by endpoint.", BATCH_BUCKETS),
+    "cache_lookups_total": ("counter", "Ticker cache lookups by endpoint and result.", None),
+    "cache_errors_total": ("counter", "Cache errors by operation.", None),
+    "persistent_cache_total": ("counter", "Persistent disk tier operations by result.", None),
+    "upstream_calls_total": ("counter", "Yahoo Finance calls by kind.", None),
+    "upstream_errors_total": ("counter", "Failed Yahoo Finance calls by kind.", None),
+    "upstream_rejected_total": ("counter", "Yahoo Finance calls refused by the access layer by kind and reason.", None),
+    "upstream_breaker_transitions_total": ("counter", "Upstream circuit breaker transitions by state.", None),
+    "upstream_batch_size": ("histogram", "Tickers per merged Yahoo Finance call by kind.", BATCH_BUCKETS),
+    "log_records_dropped_total": ("counter", "Log records dropped because the log queue was full.", None),
+}
+
+# Endpoint da requisição corrente; trabalho fora de requisições conta como 'background'
+_endpoint = ContextVar("metrics_endpoint", default="background")
+
+_lock = threading.Lock()
+# (família, sufixo, labels, le) -> valor acumulado desde o último envio
+_pending = defaultdict(float)
+# Totais do processo quando não há Redis (ex.: SimpleCache em desenvolvimento)
+_local_totals = defaultdict(float)
+_flusher_thread = None
+
+
+def _reset_after_fork():
+    # Valores acumulados no master antes do fork seriam enviados por todos os workers
+    global _lock, _pending, _local_totals, _flusher_thread
+    _lock = threading.Lock()
+    _pending = defaultdict(float)
+    _local_totals = defaultdict(float)
+    _flusher_thread = None
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def set_endpoint(name):
+    """Associa as métricas seguintes do contexto atual a um endpoint."""
+    _endpoint.set(name)
+
+
+def current_endpoint():
+    return _endpoint.get()
+
+
+def _labels(labels):
+    return ",".join(f'{name}="{value}"' for name, value in sorted(labels.items()))
+
+
+def inc(family, value=1, **labels):
+    """Incrementa um contador."""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _pending[(family, "", _labels(labels), "")] += value
+
+
+def observe(family, value, **labels):
+    """Registra uma observação em um histograma (buckets cumulativos)."""
+    if not METRICS_ENABLED:
+        return
+    label_str = _labels(labels)
+    with _lock:
+        for bound in METRICS[family][2]:
+            # Buckets não atingidos também são criados, para a série ficar completa
+            _pending[(family, "_bucket", label_str, str(bound))] += 1 if value <= bound else 0
+        _pending[(family, "_bucket", label_str, "+Inf")] += 1
+        _pending[(family, "_sum", label_str, "")] += value
+        _pending[(family, "_count", label_str, "")] += 1
+
+
+@contextmanager
+def observe_stage(stage):
+    """Mede o tempo do bloco no histograma de estágios."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe("stage_seconds", time.perf_counter() - started, stage=stage)
+
+
+def _drain():
+    global _pending
+    with _lock:
+        pending, _pending = _pending, defaultdict(float)
+    return pending
+
+
+def _hash_key(cache):
+    from services.cache_service import get_cache_prefix  # cache_service também registra métricas
+
+    return f"{get_cache_prefix(cache)}metrics"
+
+
+def _client(cache):
+    from services.cache_service import get_redis_client
+
+    return get_redis_client(cache)
+
+
+def flush_metrics(cache):
+    """
+    Soma no Redis as métricas acumuladas por este worker desde o último envio.
+    O hash é compartilhado pelos workers, então o scrape vê o total agregado.
+    """
+    client = _client(cache)
+    pending = _drain()
+    if not pending:
+        return
+    if client is None:
+        with _lock:
+            for field, value in pending.items():
+                _local_totals[field] += value
+        return
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for field, value in pending.items():
+            pipe.hincrbyfloat(_hash_key(cache), "|".join(field), value)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error flushing metrics: {str(e)}")
+        # Devolve os valores para o próximo envio
+        with _lock:
+            for field, value in pending.items():
+                _pending[field] += value
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render_metrics(cache):
+    """
+    Métricas agregadas de todos os workers no formato texto do Prometheus.
+    """
+    flush_metrics(cache)
+    client = _client(cache)
+    if client is not None:
+        stored = {
+            tuple(field.decode().split("|")): value.decode()
+            for field, value in client.hgetall(_hash_key(cache)).items()
+        }
+    else:
+        with _lock:
+            stored = dict(_local_totals)
+
+    suffix_order = {"": 0, "_bucket": 1, "_sum": 2, "_count": 3}
+
+    def sort_key(field):
+        family, suffix, labels, le = field
+        return labels, suffix_order[suffix], float("inf") if le == "+Inf" else float(le or 0)
+
+    lines = []
+    for family, (kind, description, _) in METRICS.items():
+        fields = sorted((field for field in stored if field[0] == family), key=sort_key)
+        name = f"{METRICS_NAMESPACE}_{family}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+        for field in fields:
+            _, suffix, labels, le = field
+            labels = ",".join(part for part in (labels, f'le="{le}"' if le else "") if part)
+            labels = f"{{{labels}}}" if labels else ""
+            lines.append(f"{name}{suffix}{labels} {_format_value(stored[field])}")
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_flusher(cache):
+    """
+    Inicia (uma vez por processo) a thread daemon que envia as métricas ao Redis.
+    """
+    global _flusher_thread
+    if not METRICS_ENABLED:
+        return
+
+    def loop():
+        while True:
+            time.sleep(METRICS_FLUSH_INTERVAL)
+            flush_metrics(cache)
+
+    with _lock:
+        if _flusher_thread is None or not _flusher_thread.is_alive():
+            _flusher_thread = threading.Thread(target=loop, name="metrics-flusher", daemon=True)
+            _flusher_thread.start()
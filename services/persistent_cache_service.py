@@ -0,0 +1,228 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from os.path import abspath, dirname, join
+
+from services.metrics_service import inc
+from services.serialization_service import encode_value
+
+logger = logging.getLogger(__name__)
+
+# Camada persistente em disco atrás do Redis (opcional)
+PERSISTENT_CACHE_ENABLED = os.getenv("PERSISTENT_CACHE_ENABLED", "0") == "1"
+# Arquivo SQLite com o último dado bom de cada seção (compartilhado pelos workers)
+PERSISTENT_CACHE_PATH = os.getenv(
+    "PERSISTENT_CACHE_PATH", join(dirname(dirname(abspath(__file__))), "data", "ticker_cache.sqlite3")
+)
+# Idade máxima, em segundos, de uma seção para ainda ser servida a partir do disco
+PERSISTENT_CACHE_MAX_AGE = int(os.getenv("PERSISTENT_CACHE_MAX_AGE", "604800"))
+# Intervalo, em segundos, entre as verificações de que o Redis precisa ser repovoado
+PERSISTENT_CACHE_CHECK_INTERVAL = float(os.getenv("PERSISTENT_CACHE_CHECK_INTERVAL", "30"))
+# Capacidade da fila de escrita; com ela cheia, novas escritas são descartadas
+PERSISTENT_CACHE_QUEUE_SIZE = int(os.getenv("PERSISTENT_CACHE_QUEUE_SIZE", "10000"))
+
+# Máximo de entradas gravadas por transação e de chaves lidas por consulta
+_WRITE_BATCH = 500
+_READ_BATCH = 500
+# Intervalo entre as limpezas de entradas antigas, em segundos
+_PRUNE_INTERVAL = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sections (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    version TEXT
+)
+"""
+
+_local = threading.local()
+_queue = queue.Queue(PERSISTENT_CACHE_QUEUE_SIZE)
+_writer_thread = None
+_writer_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Conexões SQLite e a thread de escrita não podem ser herdadas do master
+    global _local, _queue, _writer_thread, _writer_lock
+    _local = threading.local()
+    _queue = queue.Queue(PERSISTENT_CACHE_QUEUE_SIZE)
+    _writer_thread = None
+    _writer_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _connection():
+    """
+    Conexão SQLite da thread corrente (criada sob demanda). O modo WAL deixa
+    os workers lerem enquanto outro grava.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(dirname(PERSISTENT_CACHE_PATH) or ".", exist_ok=True)
+        conn = sqlite3.connect(PERSISTENT_CACHE_PATH, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(_SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def persist_entries(entries):
+    """
+    Agenda a gravação em disco das seções recém-buscadas, sem bloquear quem
+    chama: a codificação e a escrita acontecem na thread da camada.
+
+    Args:
+        entries (list): [(chave, envelope)], com o envelope {"data", "fetched_at",
+            "version"} como gravado no Redis.
+    """
+    if not PERSISTENT_CACHE_ENABLED or not entries:
+        return
+    try:
+        _queue.put_nowait(entries)
+    except queue.Full:
+        inc("persistent_cache_total", len(entries), result="dropped")
+
+
+def read_entries(keys, max_ages=None):
+    """
+    Lê do disco as seções ainda válidas.
+
+    Args:
+        keys (list): chaves das seções.
+        max_ages (dict): idade máxima, em segundos, por chave; sem ela (ou para
+            chaves fora dela) vale PERSISTENT_CACHE_MAX_AGE.
+
+    Returns:
+        dict: {chave: (valor codificado, fetched_at, versão)} para as chaves encontradas.
+    """
+    if not PERSISTENT_CACHE_ENABLED or not keys:
+        return {}
+    max_ages = max_ages or {}
+    now = time.time()
+    limits = {key: min(max_ages.get(key, PERSISTENT_CACHE_MAX_AGE), PERSISTENT_CACHE_MAX_AGE) for key in keys}
+    min_fetched_at = now - max(limits.values())
+    rows = []
+    try:
+        conn = _connection()
+        # Blocos abaixo do limite de parâmetros por consulta do SQLite
+        for start in range(0, len(keys), _READ_BATCH):
+            chunk = keys[start:start + _READ_BATCH]
+            rows += conn.execute(
+                f"SELECT key, value, fetched_at, version FROM sections WHERE key IN ({','.join('?' * len(chunk))}) "
+                "AND fetched_at >= ?",
+                [*chunk, min_fetched_at],
+            ).fetchall()
+    except sqlite3.Error as e:
+        logger.error(f"Error reading persistent cache: {str(e)}")
+        inc("persistent_cache_total", result="error")
+        return {}
+    rows = [row for row in rows if row[2] >= now - limits[row[0]]]
+    inc("persistent_cache_total", len(rows), result="hit")
+    inc("persistent_cache_total", len(keys) - len(rows), result="miss")
+    return {key: (value, fetched_at, version) for key, value, fetched_at, version in rows}
+
+
+def iter_entries(chunk_size=1000):
+    """
+    Percorre as seções ainda válidas do disco, das mais recentes às mais antigas.
+
+    Yields:
+        list: blocos de (chave, valor codificado, fetched_at, versão).
+    """
+    cursor = _connection().execute(
+        "SELECT key, value, fetched_at, version FROM sections WHERE fetched_at >= ? ORDER BY fetched_at DESC",
+        [time.time() - PERSISTENT_CACHE_MAX_AGE],
+    )
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            return
+        yield rows
+
+
+def _write(entries):
+    rows = []
+    for key, envelope in entries:
+        try:
+            rows.append((key, encode_value(envelope), envelope["fetched_at"], envelope.get("version")))
+        except Exception as e:
+            logger.error(f"Error encoding key '{key}' for persistent cache: {str(e)}")
+    if not rows:
+        return
+    conn = _connection()
+    conn.execute("BEGIN")
+    try:
+        # Uma escrita atrasada na fila nunca sobrescreve um dado mais novo
+        conn.executemany(
+            "INSERT INTO sections (key, value, fetched_at, version) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = excluded.value, fetched_at = excluded.fetched_at, "
+            "version = excluded.version "
+            "WHERE excluded.fetched_at >= sections.fetched_at",
+            rows,
+        )
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    inc("persistent_cache_total", len(rows), result="written")
+
+
+def _prune():
+    deleted = _connection().execute(
+        "DELETE FROM sections WHERE fetched_at < ?", [time.time() - PERSISTENT_CACHE_MAX_AGE]
+    ).rowcount
+    if deleted:
+        logger.info("Pruned %d expired entries from the persistent cache.", deleted)
+
+
+def start_persistent_writer(periodic=None):
+    """
+    Inicia (uma vez por processo) a thread daemon que grava a fila em disco
+    em lotes e, a cada PERSISTENT_CACHE_CHECK_INTERVAL, chama `periodic`
+    (ex.: repovoar o Redis) e remove as entradas vencidas.
+    """
+    global _writer_thread
+    if not PERSISTENT_CACHE_ENABLED:
+        return
+
+    def loop():
+        next_check = 0.0
+        next_prune = time.monotonic() + _PRUNE_INTERVAL
+        while True:
+            try:
+                now = time.monotonic()
+                if now >= next_check:
+                    next_check = now + PERSISTENT_CACHE_CHECK_INTERVAL
+                    if periodic is not None:
+                        periodic()
+                if now >= next_prune:
+                    next_prune = now + _PRUNE_INTERVAL
+                    _prune()
+                try:
+                    entries = _queue.get(timeout=max(0.1, next_check - time.monotonic()))
+                except queue.Empty:
+                    continue
+                # Junta o que mais estiver na fila em uma só transação
+                while len(entries) < _WRITE_BATCH:
+                    try:
+                        entries = entries + _queue.get_nowait()
+                    except queue.Empty:
+                        break
+                _write(entries)
+            except Exception as e:
+                logger.error(f"Error in persistent cache writer: {str(e)}")
+                inc("persistent_cache_total", result="error")
+                time.sleep(1)
+
+    with _writer_lock:
+        if _writer_thread is None or not _writer_thread.is_alive():
+            _writer_thread = threading.Thread(target=loop, name="persistent-cache", daemon=True)
+            _writer_thread.start()
+            logger.info("Persistent cache writer started (%s).", PERSISTENT_CACHE_PATH)
@@ -0,0 +1,44 @@
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Colunas do yf.download e o nome de cada campo na cotação cacheada
+QUOTE_FIELDS = {
+    "Close": "price",
+    "Open": "open",
+    "High": "high",
+    "Low": "low",
+    "Volume": "volume",
+}
+
+
+def extract_quotes(df):
+    """
+    Extrai a última cotação de todos os tickers de um frame do yf.download
+    (group_by="ticker") em uma única passada vetorizada.
+
+    Args:
+        df (pd.DataFrame): Resultado do yf.download com colunas (ticker, campo).
+
+    Returns:
+        dict: {ticker: {"price", "open", "high", "low", "volume"}} apenas para
+        tickers com preço de fechamento disponível.
+    """
+    import pandas as pd
+
+    if df is None or df.empty or not isinstance(df.columns, pd.MultiIndex):
+        return {}
+
+    # Última linha válida de cada coluna, reorganizada como tabela ticker x campo
+    last_row = df.ffill().iloc[-1]
+    table = last_row.unstack(level=-1).reindex(columns=list(QUOTE_FIELDS))
+    table = table[table["Close"].notna()].rename(columns=QUOTE_FIELDS)
+
+    quotes = {}
+    for ticker, row in table.to_dict(orient="index").items():
+        quote = {field: (None if value is None or math.isnan(value) else float(value)) for field, value in row.items()}
+        if quote["volume"] is not None:
+            quote["volume"] = int(quote["volume"])
+        quotes[ticker] = quote
+    return quotes
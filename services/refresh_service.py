@@ -0,0 +1,218 @@
+import os
+import threading
+import time
+import uuid
+import logging
+from services.cache_service import get_cache_prefix, get_cached_tickers, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Liga/desliga o agendador de atualização em segundo plano
+REFRESH_ENABLED = os.getenv("REFRESH_ENABLED", "1") == "1"
+# Intervalo entre ciclos do agendador, em segundos
+REFRESH_INTERVAL = float(os.getenv("REFRESH_INTERVAL", "5"))
+# Máximo de tickers retirados da fila de atualização por ciclo e grupo
+REFRESH_BATCH_SIZE = int(os.getenv("REFRESH_BATCH_SIZE", "50"))
+# Quantidade de tickers mais acessados mantidos aquecidos pelo líder
+REFRESH_HOT_TOP_N = int(os.getenv("REFRESH_HOT_TOP_N", "100"))
+# Fração do TTL suave a partir da qual um ticker quente é atualizado antecipadamente
+REFRESH_AHEAD_RATIO = float(os.getenv("REFRESH_AHEAD_RATIO", "0.8"))
+# Decaimento aplicado aos contadores de acesso a cada ciclo do líder
+REFRESH_DECAY = float(os.getenv("REFRESH_DECAY", "0.9"))
+# Orçamento de tickers buscados no Yahoo pelo agendador, por minuto (todos os workers)
+REFRESH_BUDGET_PER_MINUTE = int(os.getenv("REFRESH_BUDGET_PER_MINUTE", "300"))
+
+_worker_id = uuid.uuid4().hex
+_scheduler_thread = None
+_scheduler_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    # Com preload do gunicorn os workers nascem de um fork do master: cada um
+    # precisa do seu próprio id para a eleição de líder, e a thread não é herdada
+    global _worker_id, _scheduler_thread, _scheduler_lock
+    _worker_id = uuid.uuid4().hex
+    _scheduler_thread = None
+    _scheduler_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _key(cache, *parts):
+    return f"{get_cache_prefix(cache)}refresh:" + ":".join(parts)
+
+
+def _group(sections):
+    return "|".join(sections)
+
+
+def record_access(cache, tickers, sections):
+    """
+    Incrementa os contadores de acesso dos tickers para o grupo de seções,
+    em um único pipeline.
+    """
+    client = get_redis_client(cache)
+    if client is None or not tickers:
+        return
+
+    group = _group(sections)
+    try:
+        pipe = client.pipeline(transaction=False)
+        pipe.sadd(_key(cache, "groups"), group)
+        for ticker in tickers:
+            pipe.zincrby(_key(cache, "hot", group), 1, ticker)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error recording access for {tickers}: {str(e)}")
+
+
+def _by_sections(due):
+    """
+    Agrupa {ticker: seções} pelo grupo das seções, preservando a ordem.
+    """
+    groups = {}
+    for ticker, sections in due.items():
+        groups.setdefault(_group(sections), []).append(ticker)
+    return groups
+
+
+def enqueue_refresh(cache, stale_tickers):
+    """
+    Agenda a atualização em segundo plano das seções vencidas.
+    Cada ticker entra na fila do grupo formado só pelas suas seções vencidas,
+    para que as demais não sejam buscadas de novo. As filas são
+    compartilhadas entre os workers e não duplicam tickers.
+
+    Args:
+        stale_tickers (dict): {ticker: (seções vencidas)}.
+    """
+    client = get_redis_client(cache)
+    if client is None or not stale_tickers:
+        return
+
+    queued_at = time.time()
+    try:
+        pipe = client.pipeline(transaction=False)
+        for group, tickers in _by_sections(stale_tickers).items():
+            pipe.sadd(_key(cache, "groups"), group)
+            pipe.zadd(_key(cache, "queue", group), {ticker: queued_at for ticker in tickers}, nx=True)
+        pipe.execute()
+        logger.debug("Queued background refresh for %d stale tickers", len(stale_tickers))
+    except Exception as e:
+        logger.error(f"Error queueing refresh for {list(stale_tickers)}: {str(e)}")
+
+
+def _take_budget(cache, client, count):
+    """
+    Reserva até `count` buscas no orçamento do minuto corrente.
+
+    Returns:
+        int: Quantidade efetivamente liberada.
+    """
+    key = _key(cache, "budget", str(int(time.time() // 60)))
+    pipe = client.pipeline(transaction=False)
+    pipe.incrby(key, count)
+    pipe.expire(key, 120)
+    used, _ = pipe.execute()
+    allowed = max(0, count - max(0, used - REFRESH_BUDGET_PER_MINUTE))
+    if allowed < count:
+        client.decrby(key, count - allowed)
+    return allowed
+
+
+def _is_leader(cache, client):
+    """
+    Eleição simples de líder: o worker que detém a chave (SET NX PX) renova
+    o prazo a cada ciclo; os demais só assumem quando ela expira.
+    """
+    key = _key(cache, "leader")
+    ttl_ms = int(REFRESH_INTERVAL * 3000)
+    if client.set(key, _worker_id, nx=True, px=ttl_ms):
+        return True
+    current = client.get(key)
+    if current is not None and current.decode() == _worker_id:
+        client.pexpire(key, ttl_ms)
+        return True
+    return False
+
+
+def _refresh_group(cache, client, refresh, group, tickers):
+    allowed = _take_budget(cache, client, len(tickers))
+    if allowed < len(tickers):
+        logger.warning("Refresh budget exhausted; skipping %d tickers.", len(tickers) - allowed)
+    if allowed:
+        refresh(tickers[:allowed], cache, tuple(group.split("|")))
+
+
+def run_refresh_cycle(cache, refresh):
+    """
+    Executa um ciclo do agendador:
+    1. drena a fila de tickers vencidos (qualquer worker, ZPOPMIN atômico);
+    2. no líder, atualiza antecipadamente as seções perto de vencer dos
+       tickers mais acessados e aplica o decaimento dos contadores.
+
+    Args:
+        cache (Cache): Instância do cache.
+        refresh (callable): refresh(tickers, cache, sections) que busca no
+            Yahoo e grava no cache.
+    """
+    client = get_redis_client(cache)
+    if client is None:
+        return
+
+    groups = [group.decode() for group in client.smembers(_key(cache, "groups"))]
+
+    for group in groups:
+        popped = client.zpopmin(_key(cache, "queue", group), REFRESH_BATCH_SIZE)
+        tickers = [ticker.decode() for ticker, _ in popped]
+        if tickers:
+            _refresh_group(cache, client, refresh, group, tickers)
+
+    if not _is_leader(cache, client):
+        return
+
+    for group in groups:
+        hot_key = _key(cache, "hot", group)
+        hot = [ticker.decode() for ticker in client.zrevrange(hot_key, 0, REFRESH_HOT_TOP_N - 1)]
+        if hot:
+            sections = tuple(group.split("|"))
+            _, missing, stale = get_cached_tickers(
+                cache, hot, sections, include_stale=True, stale_ratio=REFRESH_AHEAD_RATIO, track=False,
+            )
+            # Só as seções perto de vencer (ou ausentes) de cada ticker são buscadas
+            due = dict(stale)
+            for ticker, cached in missing.items():
+                due[ticker] = tuple(section for section in sections if section not in cached)
+            for due_group, tickers in _by_sections(due).items():
+                logger.info("Refreshing %d hot tickers ahead of expiry for '%s'.", len(tickers), due_group)
+                _refresh_group(cache, client, refresh, due_group, tickers)
+
+        # Decaimento: acessos antigos perdem peso e tickers frios saem do ranking
+        pipe = client.pipeline(transaction=False)
+        pipe.zunionstore(hot_key, {hot_key: REFRESH_DECAY})
+        pipe.zremrangebyscore(hot_key, "-inf", 0.5)
+        pipe.execute()
+
+
+def start_refresh_scheduler(cache, refresh):
+    """
+    Inicia (uma vez por processo) a thread daemon do agendador de atualização.
+    """
+    global _scheduler_thread
+    if not REFRESH_ENABLED:
+        return
+
+    def loop():
+        while True:
+            try:
+                run_refresh_cycle(cache, refresh)
+            except Exception as e:
+                logger.error(f"Error in refresh cycle: {str(e)}")
+            time.sleep(REFRESH_INTERVAL)
+
+    with _scheduler_lock:
+        if _scheduler_thread is None or not _scheduler_thread.is_alive():
+            _scheduler_thread = threading.Thread(target=loop, name="refresh-scheduler", daemon=True)
+            _scheduler_thread.start()
+            logger.info("Background refresh scheduler started.")
@@ -0,0 +1,220 @@
+import logging
+import sys
+from services.logging_service import log_ticker_event
+from services.classification_service import classify_ticker_data
+
+logger = logging.getLogger(__name__)
+
+# Seções do cache usadas por cada endpoint; apenas elas são lidas e buscadas no Yahoo
+QUOTE_SECTIONS = ("quote",)
+INFO_SECTIONS = ("info",)
+RECOMMENDATION_SECTIONS = ("recommendations", "price_targets", "growth_estimates")
+
+
+# Marcadores de frescor (header Warning)
+REVALIDATION_FAILED_WARNING = '111 - "Revalidation Failed"'
+STALE_RESPONSE_WARNING = '110 - "Response is Stale"'
+
+# Campo sempre mantido nas projeções do `info`, para identificar cada item
+INFO_IDENTITY_FIELD = "symbol"
+
+
+def freshness_warnings(counts):
+    """
+    Valores do header Warning de uma resposta, a partir dos contadores da
+    requisição: tickers que o Yahoo não pôde atualizar (circuito aberto ou
+    limite de chamadas) e dados vencidos servidos do cache.
+
+    Args:
+        counts (dict): saída de get_request_counts.
+
+    Returns:
+        list: valores do header, na ordem em que devem ser enviados.
+    """
+    warnings = []
+    if counts.get("upstream_blocked"):
+        warnings.append(REVALIDATION_FAILED_WARNING)
+    if counts.get("stale"):
+        warnings.append(STALE_RESPONSE_WARNING)
+    return warnings
+
+
+def parse_fields(fields):
+    """
+    Normaliza o parâmetro `fields` de /fetch_stock_info: lista de nomes ou
+    string separada por vírgulas.
+
+    Returns:
+        tuple: campos ordenados e sem repetição; None sem projeção.
+
+    Raises:
+        ValueError: se o parâmetro não for uma lista de strings.
+    """
+    if fields is None or fields == "" or fields == []:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+        raise ValueError("Fields must be a list of strings or a comma-separated string")
+    return tuple(sorted({field.strip() for field in fields if field.strip()})) or None
+
+
+def project_info(info, fields):
+    """Mantém apenas os campos pedidos do `info` (e o `symbol`)."""
+    if fields is None:
+        return info
+    return {field: info[field] for field in (INFO_IDENTITY_FIELD, *fields) if field in info}
+
+
+def format_stock_info(ticker, data, fields=None):
+    """
+    Item de /fetch_stock_info: o `info` do ticker, completo ou projetado em `fields`.
+    """
+    try:
+        if data and "error" in data:
+            # Ticker não resolvido dentro do prazo ou com erro no upstream
+            return {"ticker": ticker, "error": data["error"]}
+        if data and "info" in data:
+            # Adicionar apenas o campo `info` ao resultado
+            log_ticker_event(logger, "Info retrieved for ticker %s.", ticker)
+            return project_info(data["info"], fields)
+        logger.warning("No valid data found for ticker: %s", ticker)
+        return {"ticker": ticker, "error": "No valid data found"}
+    except Exception as e:
+        logger.error(f"Error processing data for ticker {ticker}: {str(e)}")
+        return {"ticker": ticker, "error": "Processing error", "exception": str(e)}
+
+
+def format_market_price(ticker, data):
+    """
+    Item de /fetch_market_price: ticker e último preço.
+    """
+    try:
+        if data and "error" in data:
+            # Ticker não resolvido dentro do prazo ou com erro no upstream
+            return {"ticker": ticker, "error": data["error"]}
+        if data:
+            # Cotação extraída do yf.download, sem chamadas por ticker
+            quote = data.get("quote", {})
+            price = quote.get("price", None)
+
+            if price is not None:
+                log_ticker_event(logger, "Price retrieved for ticker %s: %s", ticker, price)
+                return {"ticker": ticker, "price": price}
+            logger.warning("Price not found for ticker: %s", ticker)
+            return {"ticker": ticker, "error": "Price not found"}
+        logger.warning("No valid data found for ticker: %s", ticker)
+        return {"ticker": ticker, "error": "No valid data found"}
+    except Exception as e:
+        logger.error(f"Error processing data for ticker {ticker}: {str(e)}")
+        return {"ticker": ticker, "error": "Processing error", "exception": str(e)}
+
+
+def format_classification(ticker, data):
+    """
+    Item de /classify_assets: nomes normalizados e categoria (FII, ETF, UNIT).
+    """
+    return classify_ticker_data(ticker, data)
+
+
+def format_asset_info(ticker, data):
+    """
+    Item de /fetch_asset_info: nomes, descrição e quoteType.
+    """
+    try:
+        if data and "error" in data:
+            # Ticker não resolvido dentro do prazo ou com erro no upstream
+            return {"ticker": ticker, "error": data["error"]}
+        if data:
+            # Acessar diretamente o dicionário serializável
+            info = data.get("info", {})
+            log_ticker_event(logger, "Information retrieved for ticker %s.", ticker)
+            return {
+                "ticker": ticker,
+                "longName": info.get("longName", "N/A"),
+                "shortName": info.get("shortName", "N/A"),
+                "longBusinessSummary": info.get("longBusinessSummary", "N/A"),
+                "quoteType": info.get("quoteType", "N/A"),
+            }
+        logger.warning("No valid data found for ticker %s.", ticker)
+        return {"ticker": ticker, "error": "No valid data found"}
+    except Exception as e:
+        logger.error(f"Error processing data for ticker {ticker}: {str(e)}")
+        return {"ticker": ticker, "error": "Processing error", "exception": str(e)}
+
+
+def format_recommendations(ticker, data):
+    """
+    Item de /fetch_recommendations: recomendações, price targets e estimativas.
+    """
+    try:
+        if data and "error" in data:
+            # Ticker não resolvido dentro do prazo ou com erro no upstream
+            return {"ticker": ticker, "error": data["error"]}
+        if data:
+            recommendations = data.get("recommendations", [])
+            price_targets = data.get("price_targets", {})
+            growth_estimates = data.get("growth_estimates", {})
+
+            # Verifica e converte DataFrames para listas de dicionários
+            # (só existem DataFrames se o pandas já foi carregado por uma busca)
+            pd = sys.modules.get("pandas")
+            if pd is not None and isinstance(recommendations, pd.DataFrame):
+                recommendations = recommendations.to_dict(orient="records")
+            if pd is not None and isinstance(growth_estimates, pd.DataFrame):
+                growth_estimates = growth_estimates.to_dict(orient="records")
+
+            return {
+                "ticker": ticker,
+                "recommendations": recommendations,
+                "price_targets": price_targets,
+                "growth_estimates": growth_estimates
+            }
+        logger.warning("No valid data found for ticker: %s", ticker)
+        return {"ticker": ticker, "error": "No valid data found"}
+    except Exception as e:
+        logger.error(f"Error processing data for ticker {ticker}: {str(e)}")
+        return {"ticker": ticker, "error": "Processing error", "exception": str(e)}
+
+
+# Visões aceitas por /batch: seções do cache e formatador de cada item (o mesmo
+# do endpoint individual). A classificação é resolvida à parte, pelos vereditos.
+BATCH_VIEWS = {
+    "price": (QUOTE_SECTIONS, format_market_price),
+    "info": (INFO_SECTIONS, format_stock_info),
+    "asset": (INFO_SECTIONS, format_asset_info),
+    "classification": ((), format_classification),
+    "recommendations": (RECOMMENDATION_SECTIONS, format_recommendations),
+}
+
+
+def parse_batch_views(views):
+    """
+    Valida a lista de visões de /batch.
+
+    Returns:
+        list: visões sem repetição, na ordem pedida; None se inválida.
+    """
+    if not views or not isinstance(views, list) or any(view not in BATCH_VIEWS for view in views):
+        return None
+    return list(dict.fromkeys(views))
+
+
+def batch_sections(views):
+    """União das seções de cache necessárias para as visões pedidas."""
+    return tuple(dict.fromkeys(section for view in views for section in BATCH_VIEWS[view][0]))
+
+
+def format_batch(views, tickers, tickers_data, classifications):
+    """
+    Monta a resposta de /batch: {visão: [itens]}, com os itens no formato do
+    endpoint individual e na ordem dos tickers pedidos.
+    """
+    results = {}
+    for view in views:
+        if view == "classification":
+            results[view] = [classifications[ticker] for ticker in tickers if ticker in classifications]
+        else:
+            format_result = BATCH_VIEWS[view][1]
+            results[view] = [format_result(ticker, tickers_data.get(ticker)) for ticker in tickers]
+    return results
@@ -0,0 +1,137 @@
+import os
+import pickle
+import zlib
+import logging
+
+try:
+    import msgpack
+except ImportError:  # msgpack é opcional; sem ele o codec padrão vira pickle
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Cabeçalho das entradas do cache de tickers:
+#   MAGIC (2 bytes) | versão do formato | id do codec | id da compressão | payload
+# Entradas antigas do Flask-Caching (pickle com prefixo b"!") não têm esse
+# cabeçalho e continuam legíveis, permitindo a convivência durante o rollout.
+MAGIC = b"\xffT"
+FORMAT_VERSION = 1
+HEADER_SIZE = len(MAGIC) + 3
+
+# Codec e compressão usados nas novas escritas
+CACHE_CODEC = os.getenv("CACHE_CODEC", "msgpack" if msgpack else "pickle")
+CACHE_COMPRESSION = os.getenv("CACHE_COMPRESSION", "zlib")
+CACHE_COMPRESSION_LEVEL = int(os.getenv("CACHE_COMPRESSION_LEVEL", "6"))
+# Payloads menores que isso não compensam a compressão
+CACHE_COMPRESSION_MIN_BYTES = int(os.getenv("CACHE_COMPRESSION_MIN_BYTES", "512"))
+
+# Tipo de extensão msgpack usado para DataFrames (ex.: growth_estimates)
+_EXT_DATAFRAME = 1
+
+_codecs = {}
+_codec_ids = {}
+_compressions = {
+    0: ("none", lambda data, level: data, lambda data: data),
+    1: ("zlib", zlib.compress, zlib.decompress),
+}
+
+
+def register_codec(codec_id, name, dumps, loads):
+    """
+    Registra um codec de serialização para o cache de tickers.
+
+    Args:
+        codec_id (int): Identificador gravado no cabeçalho (nunca reutilizar).
+        name (str): Nome usado em CACHE_CODEC.
+        dumps (callable): objeto -> bytes.
+        loads (callable): bytes -> objeto.
+    """
+    _codecs[codec_id] = (name, dumps, loads)
+    _codec_ids[name] = codec_id
+
+
+def _msgpack_default(obj):
+    import pandas as pd
+
+    if isinstance(obj, pd.DataFrame):
+        payload = msgpack.packb(obj.to_dict(orient="split"), default=_msgpack_default)
+        return msgpack.ExtType(_EXT_DATAFRAME, payload)
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if hasattr(obj, "item"):  # escalares numpy
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not msgpack serializable")
+
+
+def _msgpack_ext_hook(code, data):
+    if code == _EXT_DATAFRAME:
+        import pandas as pd
+
+        split = msgpack.unpackb(data, ext_hook=_msgpack_ext_hook, strict_map_key=False)
+        return pd.DataFrame(**split)
+    return msgpack.ExtType(code, data)
+
+
+register_codec(
+    0,
+    "pickle",
+    lambda value: pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+    pickle.loads,
+)
+if msgpack:
+    register_codec(
+        1,
+        "msgpack",
+        lambda value: msgpack.packb(value, default=_msgpack_default),
+        lambda data: msgpack.unpackb(data, ext_hook=_msgpack_ext_hook, strict_map_key=False),
+    )
+
+
+def encode_value(value, codec=None, compression=None):
+    """
+    Serializa um valor no formato versionado do cache de tickers.
+
+    Args:
+        value: Valor a serializar.
+        codec (str): Codec a usar (default: CACHE_CODEC).
+        compression (str): 'zlib' ou 'none' (default: CACHE_COMPRESSION).
+
+    Returns:
+        bytes: Cabeçalho + payload.
+    """
+    codec_id = _codec_ids[codec or CACHE_CODEC]
+    payload = _codecs[codec_id][1](value)
+
+    compression_id = 0
+    if (compression or CACHE_COMPRESSION) == "zlib" and len(payload) >= CACHE_COMPRESSION_MIN_BYTES:
+        compression_id = 1
+        payload = _compressions[1][1](payload, CACHE_COMPRESSION_LEVEL)
+
+    return MAGIC + bytes((FORMAT_VERSION, codec_id, compression_id)) + payload
+
+
+def decode_value(raw, legacy_loads):
+    """
+    Desserializa uma entrada do cache de tickers.
+
+    Args:
+        raw (bytes): Valor lido do Redis.
+        legacy_loads (callable): Desserializador das entradas sem cabeçalho
+            (o serializer do Flask-Caching).
+
+    Returns:
+        O valor original.
+    """
+    if not raw.startswith(MAGIC):
+        return legacy_loads(raw)
+
+    version, codec_id, compression_id = raw[len(MAGIC):HEADER_SIZE]
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported cache format version {version}")
+    if codec_id not in _codecs:
+        raise ValueError(f"Unknown cache codec id {codec_id}")
+    if compression_id not in _compressions:
+        raise ValueError(f"Unknown cache compression id {compression_id}")
+
+    payload = _compressions[compression_id][2](raw[HEADER_SIZE:])
+    return _codecs[codec_id][2](payload)
@@ -0,0 +1,126 @@
+import os
+import time
+import logging
+from services.cache_service import get_cache_prefix, get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Tempo em que um ticker sem dados no yf.download é respondido como inexistente
+# sem nova consulta ao Yahoo (erros de digitação, códigos deslistados)
+NEGATIVE_CACHE_TTL = int(os.getenv("NEGATIVE_CACHE_TTL", "21600"))
+# TTL menor para tickers que já foram válidos: pode ser só uma falha do Yahoo
+NEGATIVE_CACHE_TTL_KNOWN_VALID = int(os.getenv("NEGATIVE_CACHE_TTL_KNOWN_VALID", "300"))
+# Tickers sem dados novos por este tempo, em segundos, saem do índice de válidos
+TICKER_INDEX_VALID_TTL = int(os.getenv("TICKER_INDEX_VALID_TTL", "2592000"))
+
+TICKER_NOT_FOUND = "Ticker not found"
+
+
+def index_key(cache, kind):
+    # ZSETs: 'valid' pontua pela última vez em que o ticker retornou dados,
+    # 'invalid' pelo instante em que o veredito negativo expira
+    return f"{get_cache_prefix(cache)}tickers:{kind}"
+
+
+def partition_known_invalid(tickers, expires):
+    """
+    Separa os tickers pelos ZSCOREs lidos do índice de inválidos.
+
+    Returns:
+        tuple: (invalid, remaining)
+    """
+    now = time.time()
+    invalid = [ticker for ticker, expires_at in zip(tickers, expires) if expires_at and expires_at > now]
+    if invalid:
+        logger.debug("Known invalid tickers answered without upstream call: %s", invalid)
+    return invalid, [ticker for ticker in tickers if ticker not in invalid]
+
+
+def split_known_invalid(cache, tickers):
+    """
+    Separa os tickers com veredito negativo ainda válido, em um único round trip.
+
+    Returns:
+        tuple: (invalid, remaining)
+    """
+    client = get_redis_client(cache)
+    if client is None or not tickers:
+        return [], list(tickers)
+
+    try:
+        pipe = client.pipeline(transaction=False)
+        for ticker in tickers:
+            pipe.zscore(index_key(cache, "invalid"), ticker)
+        expires = pipe.execute()
+    except Exception as e:
+        logger.error(f"Error reading ticker index for {tickers}: {str(e)}")
+        return [], list(tickers)
+
+    return partition_known_invalid(tickers, expires)
+
+
+def update_ticker_index(cache, valid, invalid):
+    """
+    Registra o resultado de um yf.download: tickers com dados entram no
+    índice de válidos; os sem dados recebem veredito negativo (mais curto
+    para quem já foi válido).
+    """
+    client = get_redis_client(cache)
+    if client is None or not (valid or invalid):
+        return
+
+    now = time.time()
+    try:
+        was_valid = []
+        if invalid:
+            pipe = client.pipeline(transaction=False)
+            for ticker in invalid:
+                pipe.zscore(index_key(cache, "valid"), ticker)
+            was_valid = pipe.execute()
+
+        pipe = client.pipeline(transaction=False)
+        if valid:
+            pipe.zadd(index_key(cache, "valid"), {ticker: now for ticker in valid})
+            pipe.zrem(index_key(cache, "invalid"), *valid)
+        if invalid:
+            pipe.zadd(index_key(cache, "invalid"), {
+                ticker: now + (NEGATIVE_CACHE_TTL_KNOWN_VALID if seen else NEGATIVE_CACHE_TTL)
+                for ticker, seen in zip(invalid, was_valid)
+            })
+        # Vereditos negativos vencidos e válidos há muito sem dados saem do índice
+        pipe.zremrangebyscore(index_key(cache, "invalid"), "-inf", now)
+        pipe.zremrangebyscore(index_key(cache, "valid"), "-inf", now - TICKER_INDEX_VALID_TTL)
+        pipe.execute()
+    except Exception as e:
+        logger.error(f"Error updating ticker index: {str(e)}")
+
+
+def get_ticker_index(cache, limit=100):
+    """
+    Resumo do índice de tickers para introspecção.
+
+    Returns:
+        dict: Totais e os `limit` tickers mais recentes de cada lista.
+    """
+    client = get_redis_client(cache)
+    if client is None:
+        return {"valid": {"count": 0, "tickers": {}}, "invalid": {"count": 0, "tickers": {}}}
+
+    now = time.time()
+    pipe = client.pipeline(transaction=False)
+    pipe.zremrangebyscore(index_key(cache, "invalid"), "-inf", now)
+    pipe.zcard(index_key(cache, "valid"))
+    pipe.zrevrange(index_key(cache, "valid"), 0, limit - 1, withscores=True)
+    pipe.zcard(index_key(cache, "invalid"))
+    pipe.zrevrange(index_key(cache, "invalid"), 0, limit - 1, withscores=True)
+    _, valid_count, valid, invalid_count, invalid = pipe.execute()
+    return {
+        "valid": {
+            "count": valid_count,
+            "tickers": {ticker.decode(): {"last_seen": seen} for ticker, seen in valid},
+        },
+        "invalid": {
+            "count": invalid_count,
+            "tickers": {ticker.decode(): {"expires_in": round(expires_at - now)} for ticker, expires_at in invalid},
+        },
+    }
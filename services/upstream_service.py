@@ -0,0 +1,480 @@
+import os
+import re
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from services.cache_service import get_cache_prefix, get_redis_client
+from services.metrics_service import inc
+
+logger = logging.getLogger(__name__)
+
+# Liga/desliga a camada de acesso ao Yahoo (circuit breaker, rate limit e concorrência)
+UPSTREAM_GUARD_ENABLED = os.getenv("UPSTREAM_GUARD_ENABLED", "1") == "1"
+# Token bucket compartilhado: chamadas HTTP ao Yahoo por segundo, somando todos os workers
+UPSTREAM_RATE_LIMIT = float(os.getenv("UPSTREAM_RATE_LIMIT", "50"))
+# Rajada máxima do token bucket, em chamadas
+UPSTREAM_RATE_BURST = float(os.getenv("UPSTREAM_RATE_BURST", "200"))
+# Espera máxima por tokens ou por uma vaga de concorrência antes de desistir, em segundos
+UPSTREAM_MAX_WAIT = float(os.getenv("UPSTREAM_MAX_WAIT", "5"))
+# Erros dentro da janela que abrem o circuito (desde que acima da proporção mínima)
+UPSTREAM_BREAKER_ERRORS = int(os.getenv("UPSTREAM_BREAKER_ERRORS", "5"))
+UPSTREAM_BREAKER_ERROR_RATIO = float(os.getenv("UPSTREAM_BREAKER_ERROR_RATIO", "0.5"))
+# Janela de contagem de erros, em segundos
+UPSTREAM_BREAKER_WINDOW = int(os.getenv("UPSTREAM_BREAKER_WINDOW", "30"))
+# Tempo com o circuito aberto antes de uma chamada de teste (meio-aberto), em segundos
+UPSTREAM_BREAKER_COOLDOWN = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "30"))
+# Limites da concorrência adaptativa (chamadas simultâneas ao Yahoo, todos os workers)
+UPSTREAM_CONCURRENCY_MIN = int(os.getenv("UPSTREAM_CONCURRENCY_MIN", "2"))
+UPSTREAM_CONCURRENCY_MAX = int(os.getenv("UPSTREAM_CONCURRENCY_MAX", "32"))
+# Latência acima da qual uma chamada indica congestionamento e reduz a concorrência, em segundos
+UPSTREAM_LATENCY_TARGET = float(os.getenv("UPSTREAM_LATENCY_TARGET", "5"))
+
+UPSTREAM_UNAVAILABLE = "Upstream unavailable"
+
+# Validade de uma vaga de concorrência: vagas de workers que morreram expiram sozinhas
+_SLOT_TTL = 120
+# Fator de redução da concorrência a cada chamada lenta ou com erro
+_DECREASE_FACTOR = 0.7
+# Intervalo inicial e máximo entre tentativas durante a espera
+_POLL_INITIAL = 0.05
+_POLL_MAX = 0.5
+
+# Circuito aberto conhecido por este worker (time.monotonic()), sem consultar o Redis
+_open_until = 0.0
+
+# Token bucket: repõe os tokens pelo tempo decorrido e consome `cost` se houver.
+# Devolve a espera, em segundos, até haver tokens suficientes (0 = consumido).
+_TAKE_TOKENS_SCRIPT = """
+local rate, burst, cost, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+local state = redis.call('hmget', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('hset', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('expire', KEYS[1], math.ceil(burst / rate) + 60)
+return tostring(wait)
+"""
+
+# Ocupa uma vaga se houver menos chamadas em voo que o limite atual
+_ACQUIRE_SLOT_SCRIPT = """
+redis.call('zremrangebyscore', KEYS[1], '-inf', ARGV[1])
+local limit = tonumber(redis.call('get', KEYS[2]) or ARGV[4])
+if redis.call('zcard', KEYS[1]) < math.floor(limit) then
+    redis.call('zadd', KEYS[1], ARGV[2], ARGV[3])
+    redis.call('expire', KEYS[1], ARGV[5])
+    return 1
+end
+return 0
+"""
+
+# Libera a vaga e ajusta o limite (AIMD): +1/limite a cada chamada rápida e
+# bem-sucedida, redução multiplicativa a cada chamada lenta ou com erro
+_RELEASE_SLOT_SCRIPT = """
+redis.call('zrem', KEYS[1], ARGV[1])
+local low, high = tonumber(ARGV[4]), tonumber(ARGV[5])
+local limit = tonumber(redis.call('get', KEYS[2]) or ARGV[5])
+if ARGV[6] == '1' and tonumber(ARGV[2]) <= tonumber(ARGV[3]) then
+    limit = math.min(high, limit + 1 / limit)
+else
+    limit = math.max(low, limit * tonumber(ARGV[7]))
+end
+redis.call('set', KEYS[2], tostring(limit))
+return tostring(limit)
+"""
+
+# Registra o resultado de uma chamada no circuit breaker.
+# Retorna 1 quando o circuito abre, 2 quando fecha após o teste e 0 caso contrário.
+_RECORD_OUTCOME_SCRIPT = """
+local ok = ARGV[1] == '1'
+local cooldown = tonumber(ARGV[5])
+if redis.call('exists', KEYS[3]) == 1 and redis.call('exists', KEYS[2]) == 0 then
+    -- Meio-aberto: a chamada de teste decide
+    if ok then
+        redis.call('del', KEYS[1], KEYS[3], KEYS[4])
+        return 2
+    end
+    redis.call('set', KEYS[2], '1', 'px', cooldown)
+    redis.call('set', KEYS[3], '1', 'px', cooldown * 4)
+    redis.call('del', KEYS[4])
+    return 1
+end
+if redis.call('exists', KEYS[1]) == 0 then
+    redis.call('hset', KEYS[1], 'ok', 0, 'error', 0)
+    redis.call('expire', KEYS[1], ARGV[4])
+end
+redis.call('hincrby', KEYS[1], ok and 'ok' or 'error', 1)
+if not ok and redis.call('exists', KEYS[2]) == 0 then
+    local counts = redis.call('hmget', KEYS[1], 'ok', 'error')
+    local successes, errors = tonumber(counts[1]), tonumber(counts[2])
+    if errors >= tonumber(ARGV[2]) and errors / (successes + errors) >= tonumber(ARGV[3]) then
+        redis.call('set', KEYS[2], '1', 'px', cooldown)
+        redis.call('set', KEYS[3], '1', 'px', cooldown * 4)
+        redis.call('del', KEYS[1])
+        return 1
+    end
+end
+return 0
+"""
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Chamada ao Yahoo recusada pela camada de acesso (circuito aberto, sem
+    tokens ou sem vaga de concorrência dentro do prazo).
+    """
+
+    def __init__(self, reason):
+        super().__init__(f"Upstream unavailable: {reason}")
+        self.reason = reason
+
+
+class UpstreamCall:
+    """Resultado de uma chamada: o chamador marca falhas que não são exceções."""
+
+    def __init__(self):
+        self.ok = True
+
+    def failed(self):
+        self.ok = False
+
+
+def _key(cache, *parts):
+    return f"{get_cache_prefix(cache)}upstream:" + ":".join(parts)
+
+
+def slot_keys(cache):
+    """Chaves das vagas em voo e do limite atual de concorrência (lidas também pela admissão)."""
+    return [_key(cache, "slots"), _key(cache, "concurrency")]
+
+
+def _breaker_keys(cache):
+    return [
+        _key(cache, "breaker", "outcomes"),
+        _key(cache, "breaker", "open"),
+        _key(cache, "breaker", "half_open"),
+        _key(cache, "breaker", "probe"),
+    ]
+
+
+def _mark_open(seconds):
+    global _open_until
+    _open_until = time.monotonic() + seconds
+
+
+def _breaker_state(cache, client):
+    """
+    Returns:
+        str: 'open', 'half_open' ou 'closed'.
+    """
+    if time.monotonic() < _open_until:
+        return "open"
+    _, open_key, half_open_key, _ = _breaker_keys(cache)
+    pipe = client.pipeline(transaction=False)
+    pipe.pttl(open_key)
+    pipe.exists(half_open_key)
+    open_ttl, half_open = pipe.execute()
+    if open_ttl > 0:
+        _mark_open(open_ttl / 1000)
+        return "open"
+    return "half_open" if half_open else "closed"
+
+
+def upstream_available(cache):
+    """
+    Indica se o circuito permite chamadas ao Yahoo. Com o circuito aberto a
+    resposta vem da memória do worker, sem ida ao Redis. Erros do Redis não
+    bloqueiam o upstream.
+    """
+    client = get_redis_client(cache)
+    if not UPSTREAM_GUARD_ENABLED or client is None:
+        return True
+    try:
+        return _breaker_state(cache, client) != "open"
+    except Exception as e:
+        logger.error(f"Error reading upstream circuit state: {str(e)}")
+        return True
+
+
+def _check_breaker(cache, client):
+    state = _breaker_state(cache, client)
+    if state == "open":
+        raise UpstreamUnavailable("circuit_open")
+    if state == "half_open":
+        # Apenas uma chamada de teste por vez, entre todos os workers
+        probe_key = _breaker_keys(cache)[3]
+        if not client.set(probe_key, uuid.uuid4().hex, nx=True, px=int(UPSTREAM_BREAKER_COOLDOWN * 1000)):
+            raise UpstreamUnavailable("circuit_open")
+
+
+def _wait_until(limit, attempt, reason):
+    """
+    Repete `attempt()` até ele devolver 0 (sucesso) ou o prazo acabar.
+    `attempt` devolve a espera sugerida em segundos, ou None para o intervalo padrão.
+    """
+    interval = _POLL_INITIAL
+    while True:
+        wait = attempt()
+        if wait == 0:
+            return
+        delay = interval if wait is None else wait
+        if time.monotonic() + delay > limit:
+            raise UpstreamUnavailable(reason)
+        time.sleep(delay)
+        interval = min(interval * 2, _POLL_MAX)
+
+
+def _take_tokens(cache, client, cost, limit):
+    take = client.register_script(_TAKE_TOKENS_SCRIPT)
+    # Um custo acima da rajada nunca seria atendido de uma vez
+    cost = min(cost, UPSTREAM_RATE_BURST)
+
+    def attempt():
+        wait = float(take(keys=[_key(cache, "tokens")], args=[UPSTREAM_RATE_LIMIT, UPSTREAM_RATE_BURST, cost, time.time()]))
+        return 0 if wait <= 0 else wait
+
+    _wait_until(limit, attempt, "rate_limited")
+
+
+def _acquire_slot(cache, client, slot_id, limit):
+    acquire = client.register_script(_ACQUIRE_SLOT_SCRIPT)
+    keys = slot_keys(cache)
+
+    def attempt():
+        now = time.time()
+        args = [now, now + _SLOT_TTL, slot_id, UPSTREAM_CONCURRENCY_MAX, _SLOT_TTL]
+        return 0 if acquire(keys=keys, args=args) else None
+
+    _wait_until(limit, attempt, "concurrency")
+
+
+def _finish(cache, client, slot_id, call, elapsed):
+    release = client.register_script(_RELEASE_SLOT_SCRIPT)
+    record = client.register_script(_RECORD_OUTCOME_SCRIPT)
+    ok = "1" if call.ok else "0"
+    release(
+        keys=slot_keys(cache),
+        args=[
+            slot_id, elapsed, UPSTREAM_LATENCY_TARGET,
+            UPSTREAM_CONCURRENCY_MIN, UPSTREAM_CONCURRENCY_MAX, ok, _DECREASE_FACTOR,
+        ],
+    )
+    transition = record(
+        keys=_breaker_keys(cache),
+        args=[
+            ok, UPSTREAM_BREAKER_ERRORS, UPSTREAM_BREAKER_ERROR_RATIO,
+            UPSTREAM_BREAKER_WINDOW, int(UPSTREAM_BREAKER_COOLDOWN * 1000),
+        ],
+    )
+    if transition == 1:
+        _mark_open(UPSTREAM_BREAKER_COOLDOWN)
+        inc("upstream_breaker_transitions_total", state="open")
+        logger.warning("Upstream circuit opened for %.0fs after repeated Yahoo Finance errors.", UPSTREAM_BREAKER_COOLDOWN)
+    elif transition == 2:
+        inc("upstream_breaker_transitions_total", state="closed")
+        logger.info("Upstream circuit closed: Yahoo Finance is responding again.")
+
+
+@contextmanager
+def upstream_call(cache, kind, cost=1, deadline=None):
+    """
+    Envolve uma chamada ao Yahoo na camada de acesso compartilhada entre os
+    workers (estado no Redis):
+
+    1. circuit breaker: com o circuito aberto a chamada é recusada na hora;
+       após o cooldown, uma única chamada de teste decide se ele fecha;
+    2. token bucket: `cost` chamadas HTTP descontadas do limite global;
+    3. concorrência adaptativa: uma vaga entre as chamadas em voo, com o
+       limite reduzido quando a latência passa de UPSTREAM_LATENCY_TARGET.
+
+    Exceções dentro do bloco, ou `call.failed()`, contam como erro para o
+    circuito. Sem Redis (ou com o Redis fora), a chamada segue sem controle.
+
+    Args:
+        cache: instância de cache (estado compartilhado).
+        kind (str): tipo da chamada, para as métricas.
+        cost (int): chamadas HTTP estimadas (ex.: tickers de um yf.download).
+        deadline (float): instante limite em time.monotonic() para as esperas.
+
+    Raises:
+        UpstreamUnavailable: chamada recusada antes de chegar ao Yahoo.
+    """
+    client = get_redis_client(cache) if UPSTREAM_GUARD_ENABLED else None
+    slot_id = uuid.uuid4().hex
+    if client is not None:
+        limit = time.monotonic() + UPSTREAM_MAX_WAIT
+        if deadline is not None:
+            limit = min(limit, deadline)
+        try:
+            _check_breaker(cache, client)
+            _take_tokens(cache, client, cost, limit)
+            _acquire_slot(cache, client, slot_id, limit)
+        except UpstreamUnavailable as e:
+            inc("upstream_rejected_total", kind=kind, reason=e.reason)
+            raise
+        except Exception as e:
+            logger.error(f"Error in upstream access control: {str(e)}")
+            client = None
+    if client is None:
+        yield UpstreamCall()
+        return
+
+    call = UpstreamCall()
+    started = time.monotonic()
+    try:
+        yield call
+    except BaseException:
+        call.failed()
+        raise
+    finally:
+        try:
+            _finish(cache, client, slot_id, call, time.monotonic() - started)
+        except Exception as e:
+            logger.error(f"Error recording upstream call outcome: {str(e)}")
+
+
+# Trechos das mensagens do yfinance que indicam um símbolo inexistente: o motivo
+# explícito do Yahoo ("No data found, symbol may be delisted") ou o fuso horário
+# ausente sem falha na consulta dele. "no price data found" sozinho não conta:
+# é também o que o yfinance registra quando engole um erro de rede.
+_NOT_FOUND_MARKERS = ("symbol may be delisted", "no data found", "not found", "no timezone found")
+# Trechos que indicam falha do Yahoo (HTTP, indisponibilidade) em vez de símbolo inexistente
+_FAILED_MARKERS = ("status_code", "currently down")
+# Trechos do YFRateLimitError, que o yf.download registra pelo repr no lugar dos dados
+_RATE_LIMIT_MARKERS = ("yfratelimiterror", "too many requests", "rate limited")
+
+# Linhas de erro do yf.download no logger "yfinance": por ticker ("$PETR4.SA: motivo"),
+# no resumo ao fim da chamada ("['PETR4.SA', 'VALE3.SA']: motivo") e na consulta do fuso
+_TICKER_ERROR_LINE = re.compile(r"^\$(\S+): (.*)$", re.S)
+_SUMMARY_ERROR_LINE = re.compile(r"^\[([^\]]*)\]: (.*)$", re.S)
+_TZ_FAILURE_LINE = re.compile(r"^Failed to get ticker '([^']+)' reason: ", re.S)
+# Exceção registrada pelo repr (ex.: "ConnectionError('...')")
+_EXCEPTION_REPR = re.compile(r"^\w+\(")
+
+# Prioridade dos erros de um mesmo ticker numa chamada: a falha prevalece sobre o
+# "não encontrado" que o yfinance registra em seguida (ex.: fuso ausente após erro de rede)
+_ERROR_RANK = {"not_found": 1, "failed": 2, "rate_limited": 3}
+
+# Ticker -> dicionários de erros das chamadas em andamento neste processo que o incluem
+_capturing = {}
+_capture_lock = threading.Lock()
+_capture_handler = None
+
+
+def _reset_capture_after_fork():
+    global _capture_lock
+    _capture_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_capture_after_fork)
+
+
+def _classify_download_error(reason):
+    message = reason.lower()
+    if any(marker in message for marker in _RATE_LIMIT_MARKERS):
+        return "rate_limited"
+    if any(marker in message for marker in _FAILED_MARKERS):
+        return "failed"
+    if any(marker in message for marker in _NOT_FOUND_MARKERS):
+        return "not_found"
+    if _EXCEPTION_REPR.match(reason):
+        return "failed"
+    return None
+
+
+def _parse_error_line(message):
+    match = _TZ_FAILURE_LINE.match(message)
+    if match:
+        return [match.group(1)], "failed"
+    match = _SUMMARY_ERROR_LINE.match(message)
+    if match:
+        tickers, reason = re.findall(r"'([^']+)'", match.group(1)), match.group(2)
+    else:
+        match = _TICKER_ERROR_LINE.match(message)
+        if not match:
+            return None
+        tickers, reason = [match.group(1)], match.group(2)
+    error = _classify_download_error(reason)
+    return (tickers, error) if error else None
+
+
+class _DownloadErrorHandler(logging.Handler):
+    """
+    Lê os erros por ticker que o yfinance só registra em log (o yf.download
+    não levanta exceção nem os expõe), inclusive os das threads internas dele.
+    """
+
+    def emit(self, record):
+        try:
+            parsed = _parse_error_line(record.getMessage())
+        except Exception:
+            return
+        if parsed is None:
+            return
+        tickers, error = parsed
+        with _capture_lock:
+            for ticker in tickers:
+                for errors in _capturing.get(ticker, ()):
+                    if _ERROR_RANK[error] > _ERROR_RANK.get(errors.get(ticker), 0):
+                        errors[ticker] = error
+
+
+@contextmanager
+def capture_download_errors(tickers):
+    """
+    Coleta os erros que o yfinance registra para `tickers` durante o bloco
+    (em volta de um yf.download). Com o logger "yfinance" silenciado acima
+    de ERROR nada é coletado, e nenhum ticker recebe veredito negativo.
+
+    Yields:
+        dict: {ticker: 'not_found', 'failed' ou 'rate_limited'}, preenchido durante o bloco.
+    """
+    global _capture_handler
+    errors = {}
+    with _capture_lock:
+        if _capture_handler is None:
+            _capture_handler = _DownloadErrorHandler(logging.ERROR)
+            logging.getLogger("yfinance").addHandler(_capture_handler)
+        for ticker in tickers:
+            _capturing.setdefault(ticker, []).append(errors)
+    try:
+        yield errors
+    finally:
+        with _capture_lock:
+            for ticker in tickers:
+                captures = _capturing.get(ticker, [])
+                captures.remove(errors)
+                if not captures:
+                    _capturing.pop(ticker, None)
+
+
+def is_rate_limited(errors):
+    """
+    Indica se o Yahoo limitou alguma parte de um yf.download (erros de
+    `capture_download_errors`). O yfinance não levanta exceção: os tickers
+    limitados voltam com colunas vazias, às vezes ao lado de outros com dados.
+    """
+    return "rate_limited" in errors.values()
+
+
+def download_error(errors, ticker):
+    """
+    Erro registrado pelo yfinance para um ticker (de `capture_download_errors`).
+    Num lote limitado pelo Yahoo nenhum ticker é dado como inexistente: o
+    motivo registrado para os demais também pode ser efeito do limite.
+
+    Returns:
+        str: 'not_found' (símbolo inexistente), 'failed' (rede, 5xx, limite
+        de requisições etc.) ou None quando não há erro conclusivo registrado.
+    """
+    error = errors.get(ticker)
+    if error == "rate_limited" or (error == "not_found" and is_rate_limited(errors)):
+        return "failed"
+    return error
@@ -1,150 +1,726 @@
-import unicodedata
-import yfinance as yf
+import os
+import threading
+import time
+import itertools
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import logging
-from services.cache_service import get_cached_tickers, cache_ticker_data
+from services.quote_service import extract_quotes
+from services.cache_service import (
+    FRAGMENT_CACHE_ENABLED,
+    TICKER_SECTIONS,
+    cache_fragments,
+    cache_ticker_data,
+    extend_ticker_ttl,
+    get_cached_fragments,
+    get_cached_sections,
+    get_cached_tickers,
+)
+from services.classification_service import (
+    CLASSIFICATION_SECTIONS,
+    cache_classifications,
+    classify_ticker_data,
+    code_classifiable,
+    preclassify,
+)
+from services.logging_service import count_request
+from services.metrics_service import current_endpoint, inc, observe_stage
+from services.ticker_index_service import TICKER_NOT_FOUND, split_known_invalid, update_ticker_index
+from services.json_service import dumps_bytes
+from services.response_service import batch_sections, format_batch, format_stock_info
+from services.refresh_service import enqueue_refresh, record_access
+from services.batching_service import (
+    UPSTREAM_BATCH_MAX_SIZE,
+    UPSTREAM_BATCH_WINDOW_MS,
+    MicroBatcher,
+    wait_results,
+)
+from services.upstream_service import (
+    UPSTREAM_UNAVAILABLE,
+    UpstreamUnavailable,
+    capture_download_errors,
+    download_error,
+    is_rate_limited,
+    upstream_available,
+    upstream_call,
+)
+from services.lease_service import (
+    SINGLEFLIGHT_MAX_WAIT,
+    acquire_leases,
+    new_lease_token,
+    release_leases,
+    wait_for_leases,
+)
 
 logger = logging.getLogger(__name__)
 
+# Pool de serialização por ticker (por worker do gunicorn)
+FETCH_MAX_WORKERS = int(os.getenv("FETCH_MAX_WORKERS", "8"))
+# Timeout individual de cada ticker, em segundos
+FETCH_TICKER_TIMEOUT = float(os.getenv("FETCH_TICKER_TIMEOUT", "15"))
+# Prazo total da requisição, abaixo do timeout padrão de 30s do gunicorn
+FETCH_REQUEST_DEADLINE = float(os.getenv("FETCH_REQUEST_DEADLINE", "25"))
+
+_fetch_executor = None
+_fetch_executor_lock = threading.Lock()
+
+
+def preload_upstream_modules():
+    """
+    Importa yfinance e pandas antecipadamente.
+
+    Os dois só são importados na primeira busca no Yahoo; com o preload do
+    gunicorn, o master chama esta função para que os workers herdem os
+    módulos já carregados (memória compartilhada copy-on-write).
+    """
+    import pandas  # noqa: F401
+    import yfinance  # noqa: F401
+
+
+def _reset_after_fork():
+    # Threads do pool não sobrevivem ao fork: o filho cria o seu sob demanda
+    global _fetch_executor, _fetch_executor_lock
+    _fetch_executor = None
+    _fetch_executor_lock = threading.Lock()
+    _download_batcher.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
 def ensure_sa_suffix(tickers):
     """
     Adiciona o sufixo '.SA' aos tickers que não possuem.
     """
     return [ticker.strip().upper() + ".SA" if not ticker.strip().upper().endswith(".SA") else ticker.strip().upper() for ticker in tickers]
 
-def fetch_multiple_ticker_data(tickers, cache):
+def fetch_multiple_ticker_data(tickers, cache, sections=TICKER_SECTIONS):
     """
     Busca dados de múltiplos tickers em lote usando yf.download.
     Primeiro verifica o cache, faz download dos faltantes em batch,
-    serializa, armazena no cache e retorna o conjunto completo.
+    serializa em paralelo, armazena no cache e retorna o conjunto completo.
+
+    Tickers que estouram o timeout individual ou o prazo da requisição
+    retornam como {"error": ...} em vez de bloquear a resposta inteira.
+    Tickers com TTL suave vencido são servidos do cache e agendados para
+    atualização em segundo plano (stale-while-revalidate).
+
+    Apenas as seções pedidas (ex.: ('info',)) são lidas do cache e buscadas
+    no Yahoo, evitando chamadas de analistas para endpoints que não as usam.
 
     Args:
         tickers (list): lista de códigos (ex: ['PETR4', 'VALE3']).
         cache: instância de cache com métodos get_cached_tickers e cache_ticker_data.
+        sections (iterable): seções necessárias (default: todas).
 
     Returns:
         dict: dados serializáveis por ticker.
     """
+    return dict(iter_ticker_data(tickers, cache, sections))
+
+
+def iter_ticker_data(tickers, cache, sections=TICKER_SECTIONS):
+    """
+    Versão incremental de fetch_multiple_ticker_data: produz (ticker, dados)
+    assim que cada ticker é resolvido. Acertos de cache saem primeiro; os
+    tickers buscados no Yahoo saem na ordem em que terminam.
+
+    Args:
+        tickers (list): lista de códigos (ex: ['PETR4', 'VALE3']).
+        cache: instância de cache.
+        sections (iterable): seções necessárias (default: todas).
+
+    Yields:
+        tuple: (ticker normalizado, dados serializáveis ou {"error": ...}).
+    """
 
-    logger.info("Fetching data for multiple tickers.")
+    deadline = time.monotonic() + FETCH_REQUEST_DEADLINE
     normalized_tickers = ensure_sa_suffix(tickers)
-    cached_data, missing_tickers = get_cached_tickers(cache, normalized_tickers)
+    cached_data, missing_tickers, stale_tickers = get_cached_tickers(
+        cache, normalized_tickers, sections, include_stale=True
+    )
+    # Os ausentes só entram no ranking depois de descartados os inexistentes
+    track_cache_lookup(cache, list(cached_data), stale_tickers, sections)
+
+    yield from cached_data.items()
     
-    # Se todos os tickers já estiverem no cache, retorna diretamente
+    # Se todos os tickers já estiverem no cache, não há mais nada a buscar
     if not missing_tickers:
-        logger.info("All tickers found in cache.")
-        return cached_data
-    
-    # Batch-download do Yahoo Finance
-    logger.info(f"Batch downloading {len(missing)} tickers: {missing}")
-    tickers_with_sa = ensure_sa_suffix(tickers)
+        return
+
+    yield from iter_missing_ticker_data(missing_tickers, cache, sections, deadline)
+
+
+def track_cache_lookup(cache, tickers, stale_tickers, sections=TICKER_SECTIONS):
+    """
+    Registra os acessos para o ranking de tickers quentes e agenda a
+    atualização em segundo plano das seções vencidas (stale-while-revalidate).
+
+    Args:
+        stale_tickers (dict): {ticker: (seções vencidas)}.
+    """
+    record_access(cache, tickers, sections)
+    if stale_tickers:
+        enqueue_refresh(cache, stale_tickers)
+
+
+def fetch_missing_ticker_data(missing_tickers, cache, sections=TICKER_SECTIONS):
+    """
+    Busca no Yahoo tickers normalizados que já se sabe estarem fora do cache,
+    com single-flight entre workers e os mesmos prazos da requisição.
+
+    Args:
+        missing_tickers (dict): {ticker: seções já em cache}, como devolvido
+            por get_cached_tickers; só as demais seções são buscadas.
+        cache: instância de cache.
+        sections (iterable): seções necessárias.
+
+    Returns:
+        dict: dados serializáveis ou {"error": ...} por ticker.
+    """
+    deadline = time.monotonic() + FETCH_REQUEST_DEADLINE
+    return dict(iter_missing_ticker_data(missing_tickers, cache, sections, deadline))
+
+
+def iter_missing_ticker_data(missing_tickers, cache, sections, deadline):
+    """
+    Produz os tickers ausentes do cache à medida que são resolvidos.
+    `missing_tickers` é {ticker: seções já em cache}. Tickers sabidamente
+    inexistentes respondem na hora, sem lease, busca nem registro de acesso.
+    """
+    # Tickers sabidamente inexistentes não voltam ao Yahoo até o veredito expirar
+    invalid_tickers, remaining = split_known_invalid(cache, list(missing_tickers))
+    count_request(known_invalid=len(invalid_tickers))
+    for ticker in invalid_tickers:
+        yield ticker, {"error": TICKER_NOT_FOUND}
+    if not remaining:
+        return
+    missing_tickers = {ticker: missing_tickers[ticker] for ticker in remaining}
+    record_access(cache, remaining, sections)
+
+    if not upstream_available(cache):
+        # Circuito aberto: os ausentes voltam na hora, sem segurar o worker
+        count_request(upstream_blocked=len(missing_tickers))
+        for ticker in missing_tickers:
+            yield ticker, {"error": UPSTREAM_UNAVAILABLE}
+        return
+
+    # Apenas um worker atualiza cada ticker; os demais aguardam o resultado
+    token = new_lease_token()
+    owned, contended = acquire_leases(cache, missing_tickers, token)
     try:
-      # Histórico de fechamento apenas para validar tickers e obter última cotação
-        df = yf.download(
-            missing_tickers,
-            period="1d",
-            group_by="ticker",
-            threads=True,
-            progress=False
-        )
-        fetched = {}
-        for norm in missing_tickers:
-            # verifica se retornou colunas para esse ticker
-            cols = getattr(df.columns, "levels", None)
-            if not cols or norm not in cols[0]:
-                logger.error(f"Ticker {norm} não retornou dados em yf.download.")
-                continue
+        yield from iter_from_upstream(owned, cache, deadline, sections, missing_tickers)
+    finally:
+        release_leases(cache, owned, token)
 
-            # instancia Ticker para serializar demais campos
-            tk = yf.Ticker(norm)
-            try:
-                fetched[norm] = serialize_stock_data(tk)
-            except Exception as e:
-                logger.error(f"Error serializing {norm}: {e}")
+    if contended:
+        logger.debug("Waiting on other workers for %d tickers", len(contended))
+        count_request(waited=len(contended))
+        wait_timeout = min(SINGLEFLIGHT_MAX_WAIT, deadline - time.monotonic())
+        waited, orphaned = wait_for_leases(cache, contended, wait_timeout, sections)
+        yield from waited.items()
+        if orphaned:
+            # Dono do lease falhou ou demorou demais: busca por conta própria
+            logger.warning("Falling back to upstream fetch for tickers: %s", orphaned)
+            yield from iter_from_upstream(orphaned, cache, deadline, sections, missing_tickers)
 
 
-        # Salva os dados buscados no cache
-        cache_ticker_data(cache, fetched_data)
+def refresh_tickers(tickers, cache, sections=TICKER_SECTIONS):
+    """
+    Atualiza tickers no cache fora do caminho da requisição (agendador).
+    Tickers já em atualização por outro worker são ignorados. Com o Yahoo
+    indisponível, os dados vencidos têm o TTL renovado e seguem servidos.
+    """
+    if not upstream_available(cache):
+        extend_ticker_ttl(cache, tickers, sections)
+        return
+
+    _, tickers = split_known_invalid(cache, tickers)
+    token = new_lease_token()
+    owned, _ = acquire_leases(cache, tickers, token)
+    try:
+        fetch_from_upstream(owned, cache, time.monotonic() + FETCH_REQUEST_DEADLINE, sections)
+    finally:
+        release_leases(cache, owned, token)
+
+
+def fetch_from_upstream(tickers, cache, deadline, sections=TICKER_SECTIONS):
+    """
+    Baixa do Yahoo Finance os tickers informados, serializa e grava no cache.
+
+    Args:
+        tickers (list): tickers normalizados ausentes do cache, já sem os
+            sabidamente inexistentes (split_known_invalid).
+        cache: instância de cache.
+        deadline (float): instante limite em time.monotonic().
+        sections (iterable): seções a serializar.
+
+    Returns:
+        tuple: (fetched_data, errors), ambos no formato {ticker: dict}.
+    """
+    fetched_data = {}
+    errors = {}
+    for ticker, data in iter_from_upstream(tickers, cache, deadline, sections):
+        if "error" in data:
+            errors[ticker] = data
+        else:
+            fetched_data[ticker] = data
+    return fetched_data, errors
+
+
+def iter_from_upstream(tickers, cache, deadline, sections=TICKER_SECTIONS, cached=None):
+    """
+    Baixa do Yahoo Finance os tickers informados e produz cada um assim que
+    é serializado. Tudo o que foi obtido é gravado no cache em um único
+    pipeline ao final, mesmo que o consumidor interrompa a iteração.
+
+    Seções que o ticker ainda tem em cache (`cached`) não são buscadas de
+    novo: a resposta junta as do cache com as recém-buscadas, e só estas são
+    gravadas.
 
-        # Combina os dados do cache com os dados recém-buscados
-        combined_data = {**cached_data, **fetched_data}
-        return combined_data
+    Args:
+        tickers (list): tickers normalizados ausentes do cache, já sem os
+            sabidamente inexistentes (split_known_invalid).
+        cache: instância de cache.
+        deadline (float): instante limite em time.monotonic().
+        sections (iterable): seções a serializar.
+        cached (dict): {ticker: {seção: valor}} já em cache (opcional).
+
+    Yields:
+        tuple: (ticker, dados serializáveis ou {"error": ...}).
+    """
+    if not tickers:
+        return
+
+    # Batch-download do Yahoo Finance, agrupado com os de outras requisições do worker
+    logger.debug("Batch downloading %d tickers", len(tickers))
+    count_request(upstream=len(tickers))
+    try:
+        downloaded, timed_out = download_quotes(tickers, cache, deadline)
+    except UpstreamUnavailable as e:
+        logger.warning("Skipping Yahoo Finance download: %s", e)
+        count_request(upstream_blocked=len(tickers))
+        for ticker in tickers:
+            yield ticker, {"error": UPSTREAM_UNAVAILABLE}
+        return
     except (Exception, SystemExit) as e:
         logger.error(f"Erro ao buscar dados do Yahoo Finance: {str(e)}")
-        # Em caso de erro, retorna os dados em cache (se existirem) ou um dicionário vazio
-        return cached_data if cached_data else {}
+        for ticker in tickers:
+            yield ticker, {"error": UPSTREAM_UNAVAILABLE}
+        return
 
+    for ticker in timed_out:
+        yield ticker, {"error": "Upstream timeout"}
+    valid_tickers = [t for t in tickers if isinstance(downloaded.get(t), dict)]
+    invalid_tickers = [t for t in tickers if t in downloaded and downloaded[t] is None]
+    quotes = {t: downloaded[t] for t in valid_tickers if downloaded[t]}
+
+    update_ticker_index(cache, valid_tickers, invalid_tickers)
+    for ticker in invalid_tickers:
+        yield ticker, {"error": TICKER_NOT_FOUND}
+    # Sem dados e sem veredito (falha do Yahoo ou frame vazio): erro, sem cache negativo
+    for ticker in tickers:
+        if downloaded.get(ticker) is False:
+            yield ticker, {"error": UPSTREAM_UNAVAILABLE}
+
+    cached = cached or {}
+    fetched_data = {}
+    ticker_sections = [section for section in sections if section != "quote"]
+    needed = {}
+    for ticker in valid_tickers:
+        needed[ticker] = [section for section in ticker_sections if section not in cached.get(ticker, {})]
+    try:
+        # Serializa em paralelo só as seções que faltam no cache, respeitando os prazos
+        results = itertools.chain(
+            ((ticker, {}) for ticker in valid_tickers if not needed[ticker]),
+            iter_serialized_tickers({t: s for t, s in needed.items() if s}, cache, deadline),
+        )
+
+        for ticker, data in results:
+            if "error" not in data and "quote" in sections:
+                if ticker in quotes:
+                    data["quote"] = quotes[ticker]
+                elif not ticker_sections:
+                    data = {"error": "Price not found"}
+            if "error" not in data:
+                fetched_data[ticker] = data
+                data = {**cached.get(ticker, {}), **data}
+            yield ticker, data
+    except (Exception, SystemExit) as e:
+        logger.error(f"Erro ao buscar dados do Yahoo Finance: {str(e)}")
+    finally:
+        # Salva os dados buscados no cache; cotações vão junto mesmo quando não pedidas
+        cache_ticker_data(cache, fetched_data)
+        if "quote" not in sections:
+            cache_ticker_data(cache, {t: {"quote": q} for t, q in quotes.items()})
+
+
+def _download_batch(tickers, cache):
+    """
+    Um único yf.download para o lote agrupado pelo micro-batcher.
+
+    Returns:
+        dict: {ticker: cotação} para os tickers com dados ({} se o frame não
+        trouxe preço), None para os inexistentes e False para os que ficaram
+        sem dados sem evidência de que não existem.
+
+    A existência de um ticker sai do frame: ele existe se trouxe barras. Um
+    ticker sem barras só é dado como inexistente se o yfinance registrou um
+    erro de símbolo não encontrado para ele (e o lote não foi limitado). Contam
+    como falha do upstream o limite de requisições do Yahoo, mesmo com parte
+    do lote respondida, e um lote sem nenhum dado com erro de rede/HTTP
+    registrado; um frame vazio sem erro não abre o circuito.
+    """
+    import yfinance as yf
+
+    # Histórico de fechamento apenas para validar tickers e obter última cotação
+    with upstream_call(cache, "download", cost=len(tickers)) as call:
+        inc("upstream_calls_total", kind="download")
+        try:
+            with observe_stage("upstream_download"), capture_download_errors(tickers) as captured:
+                df = yf.download(
+                    tickers,
+                    period="1d",
+                    group_by="ticker",
+                    threads=True,
+                    progress=False
+                )
+            cols = getattr(df.columns, "levels", None)
+            # verifica se retornou colunas para cada ticker
+            # (o yfinance também devolve colunas só com NaN para símbolos que falharam)
+            with_data = {norm for norm in tickers if cols and norm in cols[0] and not df[norm].isna().all().all()}
+            errors = {norm: download_error(captured, norm) for norm in tickers if norm not in with_data}
+            # Cotações de todo o lote saem do próprio frame, sem chamadas por ticker
+            quotes = extract_quotes(df)
+        except (Exception, SystemExit):
+            inc("upstream_errors_total", kind="download")
+            raise
+        if is_rate_limited(captured):
+            # Limite do Yahoo, mesmo com parte do lote respondida: conta para o circuito
+            logger.warning("Yahoo Finance rate limit reached in yf.download of %d tickers.", len(tickers))
+            inc("upstream_errors_total", kind="download")
+            call.failed()
+        elif not with_data and "failed" in errors.values():
+            inc("upstream_errors_total", kind="download")
+            call.failed()
+
+    results = {}
+    for norm in tickers:
+        if norm in with_data:
+            results[norm] = quotes.get(norm, {})
+        elif errors[norm] == "not_found":
+            logger.warning("Ticker %s não retornou dados em yf.download.", norm)
+            results[norm] = None
+        else:
+            logger.warning("Ticker %s sem dados em yf.download sem evidência de que não existe.", norm)
+            results[norm] = False
+    return results
+
+
+_download_batcher = MicroBatcher(
+    _download_batch, UPSTREAM_BATCH_WINDOW_MS / 1000, UPSTREAM_BATCH_MAX_SIZE, name="download"
+)
+
+
+def download_quotes(tickers, cache, deadline):
+    """
+    Baixa validade e cotação dos tickers em um yf.download compartilhado.
+
+    Tickers ausentes pedidos por requisições concorrentes do worker dentro de
+    UPSTREAM_BATCH_WINDOW_MS entram na mesma chamada (sem repetições, até
+    UPSTREAM_BATCH_MAX_SIZE por chamada). Com a janela em 0, cada requisição
+    faz a sua própria chamada, como antes.
+
+    Args:
+        tickers (list): tickers normalizados.
+        cache: instância de cache.
+        deadline (float): instante limite em time.monotonic().
+
+    Returns:
+        tuple: ({ticker: cotação, {} ou None se inválido}, [tickers sem resposta no prazo]).
+
+    Raises:
+        UpstreamUnavailable: chamada recusada pela camada de acesso ao Yahoo.
+    """
+    if UPSTREAM_BATCH_WINDOW_MS <= 0:
+        return _download_batch(tickers, cache), []
+    return wait_results(_download_batcher.submit(tickers, cache), deadline)
+
+
+def _get_fetch_executor():
+    """
+    Retorna o pool de threads compartilhado pelo worker (criado sob demanda).
+    """
+    global _fetch_executor
+    with _fetch_executor_lock:
+        if _fetch_executor is None:
+            _fetch_executor = ThreadPoolExecutor(
+                max_workers=FETCH_MAX_WORKERS, thread_name_prefix="ticker-fetch"
+            )
+        return _fetch_executor
+
+
+def iter_serialized_tickers(ticker_sections, cache, deadline):
+    """
+    Serializa vários tickers em paralelo no pool de threads do worker e
+    produz cada resultado na ordem em que termina.
+
+    Cada ticker tem até FETCH_TICKER_TIMEOUT segundos a partir do início da
+    sua execução, e nenhum resultado é aguardado depois de `deadline`.
+    Tickers atrasados que terminam depois do prazo ainda são gravados no cache,
+    beneficiando a próxima requisição.
+
+    Args:
+        ticker_sections (dict): {ticker normalizado: seções a serializar}.
+        cache: instância de cache para gravar resultados atrasados.
+        deadline (float): instante limite em time.monotonic().
+
+    Yields:
+        tuple: (ticker, dados serializáveis ou {"error": ...}).
+    """
+    if not ticker_sections:
+        return
+
+    executor = _get_fetch_executor()
+    started_at = {}
+
+    def run(ticker):
+        import yfinance as yf
+
+        started_at[ticker] = time.monotonic()
+        sections = ticker_sections[ticker]
+        with upstream_call(cache, "ticker", cost=len(sections), deadline=deadline) as call:
+            inc("upstream_calls_total", kind="ticker")
+            with observe_stage("serialize"):
+                data = serialize_stock_data(yf.Ticker(ticker), sections)
+            if not data:
+                inc("upstream_errors_total", kind="ticker")
+                call.failed()
+        return data
+
+    def cache_late_result(ticker, future):
+        if future.cancelled() or future.exception() is not None:
+            return
+        data = future.result()
+        if data:
+            cache_ticker_data(cache, {ticker: data})
+
+    futures = {executor.submit(run, ticker): ticker for ticker in ticker_sections}
+    pending = set(futures)
+
+    try:
+        while pending:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+
+            # Expira os tickers que já passaram do timeout individual
+            for future in list(pending):
+                ticker = futures[future]
+                start = started_at.get(ticker)
+                if start is not None and now - start >= FETCH_TICKER_TIMEOUT:
+                    pending.discard(future)
+                    logger.error(f"Timeout serializing {ticker} after {FETCH_TICKER_TIMEOUT}s.")
+                    inc("upstream_errors_total", kind="timeout")
+                    future.add_done_callback(lambda f, t=ticker: cache_late_result(t, f))
+                    yield ticker, {"error": "Upstream timeout"}
+
+            next_expiry = min(
+                (started_at[futures[f]] + FETCH_TICKER_TIMEOUT for f in pending if futures[f] in started_at),
+                default=now + FETCH_TICKER_TIMEOUT,
+            )
+            done, pending = wait(pending, timeout=max(0, min(deadline, next_expiry) - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                ticker = futures[future]
+                try:
+                    data = future.result()
+                except UpstreamUnavailable as e:
+                    logger.warning("Skipping %s: %s", ticker, e)
+                    count_request(upstream_blocked=1)
+                    yield ticker, {"error": UPSTREAM_UNAVAILABLE}
+                    continue
+                except Exception as e:
+                    logger.error(f"Error serializing {ticker}: {e}")
+                    yield ticker, {"error": "Upstream error"}
+                    continue
+                yield ticker, data if data else {"error": "No valid data found"}
+
+        # Prazo da requisição esgotado: devolve o restante como erro
+        for future in list(pending):
+            ticker = futures[future]
+            pending.discard(future)
+            if not future.cancel():
+                future.add_done_callback(lambda f, t=ticker: cache_late_result(t, f))
+            logger.error(f"Request deadline exceeded before {ticker} was serialized.")
+            inc("upstream_errors_total", kind="deadline")
+            yield ticker, {"error": "Request deadline exceeded"}
+    finally:
+        # Iteração interrompida (ex.: cliente desconectou): libera o pool
+        for future in pending:
+            if not future.cancel():
+                future.add_done_callback(lambda f, t=futures[future]: cache_late_result(t, f))
 
-def normalize_text(text):
-    """Remove acentos e converte o texto para minúsculas."""
-    return ''.join(
-        c for c in unicodedata.normalize('NFKD', text)
-        if not unicodedata.combining(c)
-    ).lower()
 
 def classify_asset_list(results, tickers_data, fetched_data=None):
     """
     Classifica os ativos em categorias como FII, ETF ou UNIT e atualiza os resultados.
     """
     fetched_data = fetched_data or {}
-    
+
     for ticker, data in tickers_data.items():
-        try:
-            # Acessar o campo `info` dos dados serializáveis
-            info = data.get("info", {})
-
-            # Normalizar textos
-            long_name = normalize_text(info.get("longName", "N/A"))
-            short_name = normalize_text(info.get("shortName", "N/A"))
-            long_business_summary = normalize_text(info.get("longBusinessSummary", "N/A"))
-
-            # Listas de palavras-chave
-            fii_keywords = ["fii", "imobiliario", "fundo de investimento imobiliario", "fiagro"]
-            etf_keywords = ["index", "ishare", "etf", "indice"]
-            unit_keywords = ["unt", "unit"]
-
-            # Campos a verificar
-            campos_verificar = [long_name, short_name]
-
-            # Classificação por categoria
-            category = "Unknown"
-            if any(term in campo for campo in campos_verificar for term in fii_keywords):
-                category = "FII"
-            elif any(term in campo for campo in campos_verificar for term in etf_keywords):
-                category = "ETF"
-            elif any(term in campo for campo in campos_verificar for term in unit_keywords):
-                category = "UNIT"
-
-            # Armazenar o resultado processado
+        item = classify_ticker_data(ticker, data)
+        if "error" not in item:
             fetched_data[ticker] = data  # Atualiza os dados no cache (se necessário)
-            results.append({
-                "ticker": ticker,
-                "shortName": short_name,
-                "longName": long_name,
-                "longBusinessSummary": long_business_summary,
-                "category": category
-            })
-        except Exception as e:
-            logger.error(f"Error classifying ticker: {ticker}. Error: {str(e)}")
-            results.append({"ticker": ticker, "error": "Processing error", "exception": str(e)})
+        results.append(item)
+
+
+def preclassify_cached(tickers, cache):
+    """
+    preclassify com o que já está no Redis: índice de inválidos, vereditos
+    em cache e o `info` (nomes) dos tickers classificados pelo código.
+
+    Returns:
+        tuple: (resolved, pending), como em preclassify.
+    """
+    known_invalid, remaining = split_known_invalid(cache, list(dict.fromkeys(tickers)))
+    count_request(known_invalid=len(known_invalid))
+    verdicts = get_cached_sections(cache, remaining, CLASSIFICATION_SECTIONS)
+    by_code = code_classifiable(remaining, verdicts)
+    cached_info = get_cached_sections(cache, by_code, ("info",)) if by_code else {}
+    return preclassify(tickers, verdicts, cached_info, known_invalid)
+
+
+def iter_classified_assets(tickers, cache):
+    """
+    Produz (ticker, item de /classify_assets) à medida que cada ticker é classificado.
+
+    Tickers sabidamente inexistentes, vereditos em cache e códigos B3 não
+    ambíguos (ações, BDRs) saem primeiro, sem consultar o Yahoo; apenas os
+    demais (ex.: sufixo 11) buscam o `info`. Os novos vereditos são gravados
+    no cache com TTL longo. A ordem é a de resolução; quem devolve uma lista
+    reordena pelos tickers pedidos.
+    """
+    resolved, pending = preclassify_cached(ensure_sa_suffix(tickers), cache)
+    yield from resolved.items()
+
+    if not pending:
+        return
+
+    classified = []
+    try:
+        for ticker, data in iter_ticker_data(pending, cache, ("info",)):
+            item = classify_ticker_data(ticker, data)
+            classified.append(item)
+            yield ticker, item
+    finally:
+        cache_classifications(cache, classified)
+
+
+
+def fetch_batch_views(tickers, cache, views):
+    """
+    Resolve várias visões (/batch) para a mesma lista de tickers com uma
+    única leitura de cache e uma única busca no Yahoo para a união das
+    seções necessárias.
+
+    A classificação usa os vereditos em cache e o código B3; o `info` só é
+    buscado à parte para os tickers pendentes quando nenhuma outra visão
+    já o inclui.
+
+    Args:
+        tickers (list): lista de códigos (ex: ['PETR4', 'VALE3']).
+        cache: instância de cache.
+        views (list): visões validadas por parse_batch_views.
+
+    Returns:
+        dict: {visão: [itens]} na ordem dos tickers pedidos.
+    """
+    normalized_tickers = list(dict.fromkeys(ensure_sa_suffix(tickers)))
+    sections = batch_sections(views)
+    tickers_data = fetch_multiple_ticker_data(normalized_tickers, cache, sections) if sections else {}
+
+    classifications = {}
+    if "classification" in views:
+        classifications, pending = preclassify_cached(normalized_tickers, cache)
+        if pending:
+            if "info" in sections:
+                info_data = {ticker: tickers_data.get(ticker) for ticker in pending}
+            else:
+                info_data = fetch_multiple_ticker_data(pending, cache, ("info",))
+            classified = {ticker: classify_ticker_data(ticker, data) for ticker, data in info_data.items()}
+            cache_classifications(cache, list(classified.values()))
+            classifications.update(classified)
+
+    return format_batch(views, normalized_tickers, tickers_data, classifications)
+
+
+
+def fetch_stock_info_fragments(tickers, cache, fields=None):
+    """
+    Itens de /fetch_stock_info já codificados em JSON, na ordem dos tickers.
+
+    Com FRAGMENT_CACHE_ENABLED, os itens codificados de cada ticker e
+    projeção ficam no Redis: respostas quentes são montadas por concatenação,
+    sem decodificar o `info` nem recodificá-lo. Os fragmentos são descartados
+    sempre que o `info` do ticker é regravado.
+
+    Args:
+        tickers (list): lista de códigos (ex: ['PETR4', 'VALE3']).
+        cache: instância de cache.
+        fields (tuple): campos do `info` a manter (None: todos).
+
+    Returns:
+        list: um `bytes` JSON por ticker.
+    """
+    normalized_tickers = list(dict.fromkeys(ensure_sa_suffix(tickers)))
+    projection = ",".join(fields) if fields else "*"
+    fragments = {}
+    if FRAGMENT_CACHE_ENABLED:
+        fragments = get_cached_fragments(cache, normalized_tickers, "info", projection)
+        if fragments:
+            # Acertos de fragmento também contam para o ranking de tickers quentes
+            track_cache_lookup(cache, list(fragments), {}, ("info",))
+            count_request(fragments=len(fragments))
+            inc("cache_lookups_total", len(fragments), endpoint=current_endpoint(), result="fragment")
+
+    pending = [ticker for ticker in normalized_tickers if ticker not in fragments]
+    if pending:
+        encoded = {}
+        tickers_data = fetch_multiple_ticker_data(pending, cache, ("info",))
+        with observe_stage("encode"):
+            for ticker in pending:
+                item = format_stock_info(ticker, tickers_data.get(ticker), fields)
+                fragments[ticker] = dumps_bytes(item)
+                if "error" not in item:
+                    encoded[ticker] = fragments[ticker]
+        if FRAGMENT_CACHE_ENABLED:
+            cache_fragments(cache, "info", projection, encoded)
+
+    return [fragments[ticker] for ticker in normalized_tickers]
+
+
+# Como obter cada seção a partir de um `yfinance.Ticker`.
+# Cada acesso dispara chamadas HTTP próprias, então só as seções pedidas são lidas.
+SECTION_FETCHERS = {
+    "info": lambda stock: stock.info,
+    "recommendations": lambda stock: stock.recommendations.to_dict() if hasattr(stock, "recommendations") else [],
+    "price_targets": lambda stock: stock.analyst_price_targets if hasattr(stock, "analyst_price_targets") else {},
+    "growth_estimates": lambda stock: stock.growth_estimates if hasattr(stock, "growth_estimates") else {},
+}
 
 
-def serialize_stock_data(stock):
+def serialize_stock_data(stock, sections=TICKER_SECTIONS):
     """
     Serializa os dados de um objeto `yfinance.Ticker` para um formato armazenável e reutilizável.
 
     Args:
         stock (yfinance.Ticker): Objeto Ticker retornado pelo yfinance.
+        sections (iterable): Seções a serializar (default: todas).
 
     Returns:
         dict: Dados serializáveis do ticker.
     """
     try:
-        return {
-            "info": stock.info,
-            "recommendations": stock.recommendations.to_dict() if hasattr(stock, "recommendations") else [],
-            "price_targets": stock.analyst_price_targets if hasattr(stock, "analyst_price_targets") else {},
-            "growth_estimates": stock.growth_estimates if hasattr(stock, "growth_estimates") else {}
-        }
+        return {section: SECTION_FETCHERS[section](stock) for section in sections}
     except Exception as e:
         logger.error(f"Error serializing stock data: {str(e)}")
         return {}
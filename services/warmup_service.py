@@ -0,0 +1,281 @@
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+from datetime import datetime, timedelta, timezone
+from os.path import abspath, dirname, join
+
+from services.cache_service import TICKER_SECTIONS, get_cache_prefix, get_cached_sections, get_cached_tickers, get_redis_client
+from services.lease_service import acquire_leases, new_lease_token, release_leases
+from services.refresh_service import REFRESH_AHEAD_RATIO
+from services.ticker_index_service import split_known_invalid
+from services.upstream_service import upstream_available
+from services.utils import FETCH_REQUEST_DEADLINE, ensure_sa_suffix, fetch_from_upstream
+
+logger = logging.getLogger(__name__)
+
+# Liga/desliga o aquecimento agendado do universo de tickers (em segundo plano)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "0") == "1"
+# Arquivo com o universo: um ticker por linha, '#' para comentários
+WARMUP_UNIVERSE_PATH = os.getenv("WARMUP_UNIVERSE_PATH", join(dirname(dirname(abspath(__file__))), "ticker_universe.txt"))
+# Seções aquecidas (separadas por vírgula)
+WARMUP_SECTIONS = tuple(
+    section for section in os.getenv("WARMUP_SECTIONS", "quote,info").split(",") if section in TICKER_SECTIONS
+)
+# Tickers por bloco (um yf.download por bloco) e pausa entre blocos, em segundos
+WARMUP_CHUNK_SIZE = int(os.getenv("WARMUP_CHUNK_SIZE", "50"))
+WARMUP_CHUNK_INTERVAL = float(os.getenv("WARMUP_CHUNK_INTERVAL", "2"))
+# Pregão da B3 (horário de Brasília, UTC-3) e antecedência do primeiro aquecimento, em minutos
+WARMUP_MARKET_OPEN = os.getenv("WARMUP_MARKET_OPEN", "10:00")
+WARMUP_MARKET_CLOSE = os.getenv("WARMUP_MARKET_CLOSE", "17:00")
+WARMUP_PREOPEN_MINUTES = int(os.getenv("WARMUP_PREOPEN_MINUTES", "15"))
+# Intervalo entre aquecimentos durante o pregão, em segundos
+WARMUP_INTERVAL = int(os.getenv("WARMUP_INTERVAL", "300"))
+
+# Sem horário de verão desde 2019: deslocamento fixo, sem depender de tzdata
+B3_TIMEZONE = timezone(timedelta(hours=-3))
+# Intervalo entre as verificações da agenda, em segundos
+_CHECK_INTERVAL = 15
+# Validade do lock de execução: um aquecimento interrompido não trava os seguintes
+_RUN_LOCK_TTL = 3600
+
+_scheduler_thread = None
+_scheduler_lock = threading.Lock()
+
+
+def _reset_after_fork():
+    global _scheduler_thread, _scheduler_lock
+    _scheduler_thread = None
+    _scheduler_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _key(cache, *parts):
+    return f"{get_cache_prefix(cache)}warmup:" + ":".join(parts)
+
+
+def load_universe(path=None):
+    """
+    Lê o universo de tickers do arquivo (um por linha; linhas vazias e
+    comentários com '#' são ignorados), normalizado e sem repetições.
+    """
+    with open(path or WARMUP_UNIVERSE_PATH, encoding="utf-8") as f:
+        tickers = [line.split("#", 1)[0].strip() for line in f]
+    return list(dict.fromkeys(ensure_sa_suffix([ticker for ticker in tickers if ticker])))
+
+
+def _minutes(value):
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def _session_bounds(day):
+    """Início do primeiro aquecimento e fim do pregão de um dia, em horário de Brasília."""
+    midnight = datetime(day.year, day.month, day.day, tzinfo=B3_TIMEZONE)
+    start = midnight + timedelta(minutes=_minutes(WARMUP_MARKET_OPEN) - WARMUP_PREOPEN_MINUTES)
+    end = midnight + timedelta(minutes=_minutes(WARMUP_MARKET_CLOSE))
+    return start, end
+
+
+def current_slot(now=None):
+    """
+    Janela de aquecimento em curso: a primeira começa WARMUP_PREOPEN_MINUTES
+    antes da abertura e as seguintes a cada WARMUP_INTERVAL até o fechamento,
+    em dias úteis.
+
+    Returns:
+        str: identificador da janela (ex.: '2026-10-16:3'), ou None fora do pregão.
+    """
+    now = (now or datetime.now(B3_TIMEZONE)).astimezone(B3_TIMEZONE)
+    if now.weekday() >= 5:
+        return None
+    start, end = _session_bounds(now.date())
+    if not start <= now < end:
+        return None
+    return f"{now.date().isoformat()}:{int((now - start).total_seconds() // WARMUP_INTERVAL)}"
+
+
+def next_run(now=None):
+    """Início da próxima janela de aquecimento (datetime em horário de Brasília)."""
+    now = (now or datetime.now(B3_TIMEZONE)).astimezone(B3_TIMEZONE)
+    for offset in range(8):
+        day = now.date() + timedelta(days=offset)
+        if day.weekday() >= 5:
+            continue
+        start, end = _session_bounds(day)
+        if now < start:
+            return start
+        if now < end:
+            elapsed = (now - start).total_seconds()
+            candidate = start + timedelta(seconds=(elapsed // WARMUP_INTERVAL + 1) * WARMUP_INTERVAL)
+            if candidate < end:
+                return candidate
+    return None
+
+
+def _save_status(cache, report):
+    client = get_redis_client(cache)
+    if client is None:
+        return
+    try:
+        client.set(_key(cache, "status"), json.dumps(report))
+    except Exception as e:
+        logger.error(f"Error saving warm-up status: {str(e)}")
+
+
+def run_warmup(cache, tickers, sections=WARMUP_SECTIONS, force=False, progress=None):
+    """
+    Aquece o cache com os tickers informados, em blocos de WARMUP_CHUNK_SIZE
+    separados por WARMUP_CHUNK_INTERVAL, pelo mesmo caminho das requisições
+    (yf.download em lote + serialização por ticker, sob o controle de acesso
+    ao Yahoo). Tickers ainda frescos (abaixo de REFRESH_AHEAD_RATIO do TTL)
+    são pulados, salvo com `force`; os que outro worker já está buscando
+    também. O progresso fica no Redis (`warmup:status`) a cada bloco.
+
+    Args:
+        cache: instância de cache.
+        tickers (list): universo de tickers.
+        sections (tuple): seções a aquecer.
+        force (bool): busca também os tickers frescos.
+        progress (callable): chamado com o relatório após cada bloco.
+
+    Returns:
+        dict: relatório (contadores, cobertura final e status).
+    """
+    tickers = list(dict.fromkeys(ensure_sa_suffix(tickers)))
+    report = {
+        "status": "running",
+        "sections": list(sections),
+        "started_at": time.time(),
+        "finished_at": None,
+        "total": len(tickers),
+        "processed": 0,
+        "fresh": 0,
+        "fetched": 0,
+        "skipped": 0,
+        "errors": 0,
+        "coverage": None,
+    }
+    _save_status(cache, report)
+
+    for start in range(0, len(tickers), max(1, WARMUP_CHUNK_SIZE)):
+        if start:
+            time.sleep(WARMUP_CHUNK_INTERVAL)
+        if not upstream_available(cache):
+            logger.warning("Warm-up aborted: upstream circuit is open.")
+            report["status"] = "aborted"
+            break
+
+        chunk = tickers[start:start + WARMUP_CHUNK_SIZE]
+        due = chunk
+        if not force:
+            _, missing, stale = get_cached_tickers(
+                cache, chunk, sections, include_stale=True, stale_ratio=REFRESH_AHEAD_RATIO, track=False
+            )
+            due_set = set(missing) | set(stale)
+            due = [ticker for ticker in chunk if ticker in due_set]
+        report["fresh"] += len(chunk) - len(due)
+
+        # Inexistentes conhecidos não pegam lease nem voltam ao Yahoo
+        invalid, due = split_known_invalid(cache, due)
+        token = new_lease_token()
+        owned, contended = acquire_leases(cache, due, token)
+        try:
+            fetched, _ = fetch_from_upstream(owned, cache, time.monotonic() + FETCH_REQUEST_DEADLINE, sections)
+        finally:
+            release_leases(cache, owned, token)
+
+        report["processed"] += len(chunk)
+        report["skipped"] += len(contended)
+        report["fetched"] += len(fetched)
+        report["errors"] += len(invalid) + len(owned) - len(fetched)
+        _save_status(cache, report)
+        if progress:
+            progress(report)
+    else:
+        report["status"] = "done"
+
+    report["finished_at"] = time.time()
+    report["coverage"] = round(len(get_cached_sections(cache, tickers, sections)) / max(len(tickers), 1), 4)
+    _save_status(cache, report)
+    logger.info(
+        "Warm-up %s: %d/%d tickers, %d fetched, %d fresh, %d errors, coverage %.1f%% in %.1fs.",
+        report["status"], report["processed"], report["total"], report["fetched"], report["fresh"],
+        report["errors"], report["coverage"] * 100, report["finished_at"] - report["started_at"],
+    )
+    return report
+
+
+def get_warmup_status(cache, universe_path=None):
+    """
+    Relatório do último aquecimento, cobertura atual do universo no cache e
+    próxima janela agendada.
+    """
+    client = get_redis_client(cache)
+    raw = client.get(_key(cache, "status")) if client is not None else None
+    tickers = load_universe(universe_path)
+    upcoming = next_run()
+    return {
+        "enabled": WARMUP_ENABLED,
+        "universe": len(tickers),
+        "sections": list(WARMUP_SECTIONS),
+        "coverage": round(len(get_cached_sections(cache, tickers, WARMUP_SECTIONS)) / max(len(tickers), 1), 4),
+        "last_run": json.loads(raw) if raw else None,
+        "next_run": upcoming.isoformat() if upcoming else None,
+    }
+
+
+def run_scheduled_warmup(cache):
+    """
+    Executa o aquecimento da janela corrente, se ainda não foi feito.
+
+    Cada janela roda uma única vez entre todos os workers (SET NX da janela)
+    e nunca em paralelo com outra ainda em andamento (lock de execução).
+
+    Returns:
+        dict: relatório, ou None quando não era a vez deste worker.
+    """
+    slot = current_slot()
+    client = get_redis_client(cache)
+    if slot is None or client is None:
+        return None
+
+    owner = uuid.uuid4().hex
+    lock_key = _key(cache, "running")
+    if not client.set(lock_key, owner, nx=True, ex=_RUN_LOCK_TTL):
+        return None
+    try:
+        if not client.set(_key(cache, "slot", slot), owner, nx=True, ex=86400):
+            return None
+        logger.info("Starting scheduled warm-up for slot %s.", slot)
+        return run_warmup(cache, load_universe())
+    finally:
+        if client.get(lock_key) == owner.encode():
+            client.delete(lock_key)
+
+
+def start_warmup_scheduler(cache):
+    """
+    Inicia (uma vez por processo) a thread daemon do aquecimento agendado.
+    """
+    global _scheduler_thread
+    if not WARMUP_ENABLED:
+        return
+
+    def loop():
+        while True:
+            try:
+                run_scheduled_warmup(cache)
+            except Exception as e:
+                logger.error(f"Error in scheduled warm-up: {str(e)}")
+            time.sleep(_CHECK_INTERVAL)
+
+    with _scheduler_lock:
+        if _scheduler_thread is None or not _scheduler_thread.is_alive():
+            _scheduler_thread = threading.Thread(target=loop, name="warmup-scheduler", daemon=True)
+            _scheduler_thread.start()
+            logger.info("Warm-up scheduler started (%s).", WARMUP_UNIVERSE_PATH)
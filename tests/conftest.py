@@ -0,0 +1,55 @@
+"""
+Fixtures comuns: yfinance substituído por benchmarks/fake_yfinance e Redis
+em memória (fakeredis), um por teste.
+"""
+import os
+import sys
+from os.path import abspath, dirname
+
+import pytest
+
+ROOT = dirname(dirname(abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Sem threads de segundo plano apontando para o Redis real
+os.environ.setdefault("APP_PRELOAD", "1")
+
+from benchmarks import fake_yfinance  # noqa: E402
+
+yahoo = fake_yfinance.install()
+
+import fakeredis  # noqa: E402
+from flask import Flask  # noqa: E402
+
+from services.cache_service import create_cache  # noqa: E402
+
+TOKEN = "<TOKEN>"
+
+
+def use_redis(cache, client):
+    cache.cache._read_client = cache.cache._write_client = client
+
+
+@pytest.fixture
+def fake_yahoo():
+    yahoo.reset_counters()
+    return yahoo
+
+
+@pytest.fixture
+def redis_client():
+    return fakeredis.FakeRedis()
+
+
+@pytest.fixture
+def cache(redis_client):
+    cache = create_cache(Flask("tests"))
+    use_redis(cache, redis_client)
+    return cache
+
+
+@pytest.fixture
+def app_client(redis_client):
+    import main
+
+    use_redis(main.cache, redis_client)
+    return main.app.test_client()
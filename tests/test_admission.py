@@ -0,0 +1,65 @@
+import datetime
+
+import pytest
+
+from conftest import TOKEN
+from services import admission_service, auth_service
+from services.admission_service import AdmissionRejected, admit_request, release_request
+
+FUTURE = datetime.datetime(2100, 1, 1)
+
+
+def _identity(name="t", priority="normal", **limits):
+    return {"name": name, "expiry": FUTURE.timestamp(), "priority": priority,
+            "max_concurrency": limits.get("max_concurrency"),
+            "budget_per_minute": limits.get("budget_per_minute")}
+
+
+def test_concurrency_limit_rejects_until_released(cache):
+    identity = _identity(max_concurrency=2)
+    first = admit_request(cache, identity)
+    admit_request(cache, identity)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admit_request(cache, identity)
+    assert rejected.value.reason == "concurrency"
+
+    release_request(cache, first)
+    assert admit_request(cache, identity) is not None
+
+
+def test_budget_counts_tickers(cache):
+    identity = _identity(budget_per_minute=10)
+    admit_request(cache, identity, cost=8)
+    with pytest.raises(AdmissionRejected) as rejected:
+        admit_request(cache, identity, cost=5)
+    assert rejected.value.reason == "budget"
+    assert rejected.value.retry_after >= 1
+
+
+def test_overload_sheds_low_priority_first(cache, monkeypatch):
+    monkeypatch.setattr(admission_service, "ADMISSION_MAX_INFLIGHT", 4)
+    for i in range(3):
+        admit_request(cache, _identity(name=f"n{i}"))
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        admit_request(cache, _identity(name="low", priority="low"))
+    assert rejected.value.reason == "overloaded"
+    admit_request(cache, _identity(name="normal"))
+    with pytest.raises(AdmissionRejected):
+        admit_request(cache, _identity(name="normal2"))
+    assert admit_request(cache, _identity(name="high", priority="high")) is not None
+
+
+def test_endpoint_returns_429_with_retry_after(app_client, monkeypatch, fake_yahoo):
+    index = auth_service._build_index(
+        [{"name": "small", "token": TOKEN, "expiry": FUTURE, "budget_per_minute": 2}]
+    )
+    monkeypatch.setattr(auth_service, "_current_index", lambda: index)
+    headers = {"Authorization": TOKEN}
+
+    ok = app_client.post("/fetch_market_price", json={"tickers": ["PETR4", "VALE3"]}, headers=headers)
+    assert ok.status_code == 200
+    rejected = app_client.post("/fetch_market_price", json={"tickers": ["ITUB4"]}, headers=headers)
+    assert rejected.status_code == 429
+    assert rejected.get_json() == {"error": "Too many requests", "reason": "budget"}
+    assert int(rejected.headers["Retry-After"]) >= 1
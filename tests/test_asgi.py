@@ -0,0 +1,72 @@
+import asyncio
+import time
+
+import fakeredis
+import fakeredis.aioredis
+import pytest
+from starlette.testclient import TestClient
+
+import services
+from conftest import TOKEN, use_redis
+from services import upstream_service
+from services.cache_service import cache_ticker_data
+
+HEADERS = {"Authorization": TOKEN}
+
+
+@pytest.fixture
+def asgi_client(monkeypatch):
+    # Sem as threads de segundo plano do entry point
+    for name in ("start_refresh_scheduler", "start_metrics_flusher", "start_persistent_cache", "start_warmup_scheduler"):
+        monkeypatch.setattr(services, name, lambda *args: None)
+    import asgi
+
+    server = fakeredis.FakeServer()
+    use_redis(asgi.cache, fakeredis.FakeRedis(server=server))
+    monkeypatch.setattr(asgi, "redis_client", fakeredis.aioredis.FakeRedis(server=server))
+    monkeypatch.setattr(upstream_service, "_open_until", 0.0)
+    return TestClient(asgi.app)
+
+
+def _post(client, tickers, etag=None):
+    headers = dict(HEADERS, **({"If-None-Match": etag} if etag else {}))
+    return client.post("/fetch_market_price", json={"tickers": tickers}, headers=headers)
+
+
+def test_conditional_request_returns_304(asgi_client, fake_yahoo):
+    _post(asgi_client, ["PETR4"])
+    first = _post(asgi_client, ["PETR4"])
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    calls = fake_yahoo.total_calls()
+
+    unchanged = _post(asgi_client, ["PETR4"], etag)
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+    assert fake_yahoo.total_calls() == calls
+
+
+def test_stale_data_is_marked(asgi_client, monkeypatch):
+    import asgi
+
+    now = time.time()
+    with monkeypatch.context() as patched:
+        patched.setattr(time, "time", lambda: now - 120)
+        cache_ticker_data(asgi.cache, {"PETR4.SA": {"quote": {"price": 10.0}}})
+
+    response = _post(asgi_client, ["PETR4"])
+
+    assert response.status_code == 200
+    assert response.headers["Warning"] == '110 - "Response is Stale"'
+
+
+def test_fetch_slot_wait_has_a_deadline(asgi_client, monkeypatch):
+    import asgi
+
+    monkeypatch.setattr(asgi, "fetch_slots", asyncio.Semaphore(0))
+    monkeypatch.setattr(asgi, "ASGI_FETCH_SLOT_TIMEOUT", 0.05)
+
+    response = _post(asgi_client, ["PETR4"])
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
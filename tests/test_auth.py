@@ -0,0 +1,87 @@
+import datetime
+import logging
+import os
+
+from services import auth_service
+
+FUTURE = datetime.datetime(2100, 1, 1)
+
+
+def _use_index(monkeypatch, entries):
+    index = auth_service._build_index(entries)
+    monkeypatch.setattr(auth_service, "_current_index", lambda: index)
+    return index
+
+
+def test_resolves_token_by_hash(monkeypatch):
+    index = _use_index(monkeypatch, [
+        {"name": "a", "token": "tok-a", "expiry": FUTURE, "priority": "low", "max_concurrency": 2},
+        {"name": "b", "token": "tok-b", "expiry": FUTURE},
+    ])
+    assert all(len(digest) == 32 for digest in index)
+    assert "tok-a" not in str(index)
+    assert auth_service.resolve_token("tok-a")["name"] == "a"
+    assert auth_service.resolve_token("tok-a")["max_concurrency"] == 2
+    assert auth_service.resolve_token("tok-b")["priority"] == "normal"
+    assert auth_service.resolve_token("tok-c") is None
+    assert auth_service.resolve_token("") is None
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    _use_index(monkeypatch, [{"name": "old", "token": "tok", "expiry": datetime.datetime(2000, 1, 1)}])
+    assert auth_service.resolve_token("tok") is None
+    assert not auth_service.validate_token("tok")
+
+
+def test_duplicate_token_keeps_latest_expiry(monkeypatch, caplog):
+    entries = [
+        {"name": "current", "token": "tok", "expiry": FUTURE, "priority": "high"},
+        {"name": "expired", "token": "tok", "expiry": datetime.datetime(2000, 1, 1), "priority": "low"},
+    ]
+    with caplog.at_level(logging.WARNING, logger=auth_service.__name__):
+        _use_index(monkeypatch, entries)
+    assert "duplicates" in caplog.text
+    assert auth_service.resolve_token("tok")["name"] == "current"
+
+    _use_index(monkeypatch, list(reversed(entries)))
+    assert auth_service.resolve_token("tok")["name"] == "current"
+
+
+def test_invalid_priority_is_rejected():
+    try:
+        auth_service._build_index([{"name": "x", "token": "t", "expiry": FUTURE, "priority": "urgent"}])
+    except ValueError as e:
+        assert "urgent" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_index_reloads_when_tokens_file_changes(monkeypatch, tmp_path):
+    source = tmp_path / "tokens_reload.py"
+    source.write_text(
+        "import datetime\n"
+        "tokens = [{'name': 'a', 'token': 'first', 'expiry': datetime.datetime(2100, 1, 1)}]\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import tokens_reload
+
+    monkeypatch.setattr(auth_service, "token_source", tokens_reload)
+    monkeypatch.setattr(auth_service, "TOKENS_RELOAD_INTERVAL", 0)
+    monkeypatch.setattr(auth_service, "_index", {})
+    monkeypatch.setattr(auth_service, "_index_version", None)
+    monkeypatch.setattr(auth_service, "_next_check", 0.0)
+    assert auth_service.resolve_token("first")["name"] == "a"
+
+    source.write_text(
+        "import datetime\n"
+        "tokens = [{'name': 'b', 'token': 'second', 'expiry': datetime.datetime(2100, 1, 1)}]\n"
+    )
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert auth_service.resolve_token("first") is None
+    assert auth_service.resolve_token("second")["name"] == "b"
+
+    # tokens.py inválido mantém o índice anterior
+    source.write_text("tokens = [{'token': 'broken'}]\n")
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2_000_000_000))
+    assert auth_service.resolve_token("second")["name"] == "b"
@@ -0,0 +1,32 @@
+from conftest import TOKEN
+
+HEADERS = {"Authorization": TOKEN}
+
+
+def _classify(client, tickers):
+    response = client.post("/classify_assets", json={"tickers": tickers}, headers=HEADERS)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_keeps_request_order(app_client):
+    items = _classify(app_client, ["HGLG11", "PETR4", "HGLG11", "VALE3"])
+    assert [item["ticker"] for item in items] == ["HGLG11.SA", "PETR4.SA", "VALE3.SA"]
+
+
+def test_code_verdict_uses_cached_names(app_client, fake_yahoo):
+    assert _classify(app_client, ["PETR4"])[0]["shortName"] == "n/a"
+
+    app_client.post("/fetch_stock_info", json={"tickers": ["PETR4"]}, headers=HEADERS)
+    calls = fake_yahoo.total_calls()
+    item = _classify(app_client, ["PETR4"])[0]
+
+    assert fake_yahoo.total_calls() == calls
+    assert item["category"] == "Unknown"
+    assert item["shortName"] == "petr4 on nm"
+    assert item["longName"] == "petr4 s.a."
+
+
+def test_known_invalid_code_is_not_found(app_client):
+    app_client.post("/fetch_market_price", json={"tickers": ["ZZ013"]}, headers=HEADERS)
+    assert _classify(app_client, ["ZZ013", "PETR4"])[0] == {"ticker": "ZZ013.SA", "error": "Ticker not found"}
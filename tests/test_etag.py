@@ -0,0 +1,50 @@
+from flask import Flask
+
+from conftest import TOKEN, use_redis
+from services.cache_service import LocalCache, cache_ticker_data, create_cache
+
+HEADERS = {"Authorization": TOKEN}
+
+
+def _post(client, tickers, etag=None):
+    headers = dict(HEADERS, **({"If-None-Match": etag} if etag else {}))
+    return client.post("/fetch_market_price", json={"tickers": tickers}, headers=headers)
+
+
+def _other_worker(redis_client):
+    # Outro worker: mesmo Redis, sem o L1 deste processo
+    cache = create_cache(Flask("other"))
+    use_redis(cache, redis_client)
+    return cache
+
+
+def test_conditional_request_returns_304_until_data_changes(app_client, redis_client, fake_yahoo):
+    _post(app_client, ["PETR4"])  # primeira busca: sem ETag, o corpo ainda não estava em cache
+    first = _post(app_client, ["PETR4"])
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    calls = fake_yahoo.total_calls()
+
+    unchanged = _post(app_client, ["PETR4"], etag)
+    assert unchanged.status_code == 304
+    assert fake_yahoo.total_calls() == calls
+
+    cache_ticker_data(_other_worker(redis_client), {"PETR4.SA": {"quote": {"price": 99.0}}})
+    changed = _post(app_client, ["PETR4"], etag)
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.get_json()[0]["price"] == 99.0
+
+
+def test_etag_never_describes_a_newer_body_than_l1_serves(app_client, redis_client, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main.cache, "local_cache", LocalCache(1000, 1 << 20, 30), raising=False)
+    _post(app_client, ["PETR4"])
+    _post(app_client, ["PETR4"])  # cotação agora no L1 deste worker
+
+    cache_ticker_data(_other_worker(redis_client), {"PETR4.SA": {"quote": {"price": 99.0}}})
+    response = _post(app_client, ["PETR4"])
+
+    assert response.get_json()[0]["price"] == 99.0
+    assert _post(app_client, ["PETR4"], response.headers["ETag"]).status_code == 304
@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+
+from benchmarks.fake_yfinance import bar_price
+from services.history_service import _day, _key, fetch_history
+
+
+def _expected_close(ticker, iso_day):
+    return bar_price(ticker, date.fromisoformat(iso_day))
+
+
+def test_backfill_and_delta_keep_bars_aligned(cache, redis_client, fake_yahoo):
+    today = date.today()
+    ticker = "PETR4.SA"
+
+    fetch_history([ticker], cache, _day(today - timedelta(days=10)), _day(today))
+    # Próxima requisição precisa de backfill e de delta ao mesmo tempo
+    redis_client.hset(_key(cache, ticker, "meta"), "checked_at", 0)
+    series = fetch_history([ticker], cache, _day(today - timedelta(days=20)), _day(today))[ticker]
+
+    assert series["dates"][0] >= (today - timedelta(days=20)).isoformat()
+    assert len(series["dates"]) == len(set(series["dates"]))
+    assert series["close"] == [_expected_close(ticker, day) for day in series["dates"]]
+    assert len(series["open"]) == len(series["volume"]) == len(series["dates"])
+
+
+def test_stored_slice_served_without_upstream(cache, fake_yahoo):
+    today = date.today()
+    start, end = _day(today - timedelta(days=30)), _day(today)
+    fetch_history(["VALE3.SA"], cache, start, end)
+    calls = fake_yahoo.total_calls()
+
+    series = fetch_history(["VALE3.SA"], cache, start + 10, end)["VALE3.SA"]
+
+    assert fake_yahoo.total_calls() == calls
+    assert series["dates"][0] >= (today - timedelta(days=20)).isoformat()
+
+
+def test_unknown_ticker_is_not_found(cache, fake_yahoo):
+    today = _day(date.today())
+    result = fetch_history(["ZZXX3.SA"], cache, today - 10, today)["ZZXX3.SA"]
+    assert result == {"ticker": "ZZXX3.SA", "error": "Ticker not found"}
+
+
+def test_rate_limited_history_stores_partial_bars_without_verdicts(cache, redis_client, fake_yahoo, monkeypatch):
+    from services import upstream_service
+
+    monkeypatch.setattr(upstream_service, "_open_until", 0.0)
+    monkeypatch.setattr(fake_yahoo, "rate_limit_after", 1)
+    today = _day(date.today())
+    results = fetch_history(["PETR4.SA", "ZZXX3.SA"], cache, today - 10, today)
+
+    assert results["PETR4.SA"]["close"]
+    assert results["ZZXX3.SA"].get("error") != "Ticker not found"
+    assert redis_client.zrange("flask_cache_tickers:invalid", 0, -1) == []
+
+
+def test_upstream_failure_without_stored_bars_is_an_error(cache, fake_yahoo, monkeypatch):
+    from services import upstream_service
+
+    monkeypatch.setattr(upstream_service, "_open_until", 0.0)
+    monkeypatch.setattr(fake_yahoo, "outage", True)
+    today = _day(date.today())
+    result = fetch_history(["BBDC4.SA"], cache, today - 10, today)["BBDC4.SA"]
+
+    assert result == {"ticker": "BBDC4.SA", "error": "Upstream unavailable"}
@@ -0,0 +1,53 @@
+import dataclasses
+import datetime
+import decimal
+import json
+import uuid
+
+import pytest
+from flask import Flask
+from markupsafe import Markup
+
+from services import json_service
+from services.json_service import FastJSONProvider, dumps_bytes
+
+
+@dataclasses.dataclass
+class Quote:
+    ticker: str
+    price: float
+
+
+VALUES = {
+    "date": datetime.date(2024, 1, 2),
+    "datetime": datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+    "decimal": decimal.Decimal("1.10"),
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "dataclass": Quote("PETR4.SA", 10.5),
+    "html": Markup("<b>x</b>"),
+}
+
+
+@pytest.mark.parametrize("encoder", ["json", "orjson"])
+def test_dumps_matches_flask_default_provider(encoder, monkeypatch):
+    if encoder == "orjson" and json_service.orjson is None:
+        pytest.skip("orjson not installed")
+    monkeypatch.setattr(json_service, "JSON_ENCODER", encoder)
+    flask_json = Flask("reference").json
+
+    assert json.loads(dumps_bytes(VALUES)) == json.loads(flask_json.dumps(VALUES))
+
+
+def test_unknown_type_is_rejected():
+    with pytest.raises(TypeError):
+        dumps_bytes({"value": object()})
+
+
+def test_response_accepts_args_or_kwargs():
+    app = Flask("tests")
+    app.json = FastJSONProvider(app)
+    with app.app_context():
+        assert app.json.response([1, 2]).get_json() == [1, 2]
+        assert app.json.response(1, 2).get_json() == [1, 2]
+        assert app.json.response(a=1).get_json() == {"a": 1}
+        assert app.json.response().get_json() is None
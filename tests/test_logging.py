@@ -0,0 +1,39 @@
+import logging
+import queue
+
+from conftest import TOKEN
+from services import metrics_service
+from services.logging_service import DroppingQueueHandler
+
+HEADERS = {"Authorization": TOKEN}
+
+
+def _summaries(caplog):
+    return [record.fields for record in caplog.records if record.getMessage() == "request"]
+
+
+def test_streaming_summary_counts_generated_results(app_client, fake_yahoo, caplog):
+    with caplog.at_level(logging.INFO):
+        response = app_client.post("/fetch_market_price?stream=1", json={"tickers": ["PETR4", "VALE3"]},
+                                   headers=HEADERS)
+        assert _summaries(caplog) == []  # corpo ainda não gerado
+        assert len(response.get_data(as_text=True).splitlines()) == 2
+        response.close()
+
+    [summary] = _summaries(caplog)
+    assert summary["status"] == 200
+    assert summary["tickers"] == 2
+    assert summary["misses"] == 2
+    assert "duration_ms" in summary
+
+
+def test_dropped_log_records_are_exported(monkeypatch):
+    monkeypatch.setattr(metrics_service, "_pending", metrics_service.defaultdict(float))
+    handler = DroppingQueueHandler(queue.Queue(1))
+    record = logging.makeLogRecord({"msg": "x"})
+    handler.enqueue(record)
+    handler.enqueue(record)
+    handler.enqueue(record)
+
+    assert handler.dropped == 2
+    assert metrics_service._pending[("log_records_dropped_total", "", "", "")] == 2
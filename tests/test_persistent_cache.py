@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+import fakeredis.aioredis
+import pytest
+
+from services import async_cache_service, cache_service, persistent_cache_service, upstream_service
+from services.async_cache_service import aget_cached_tickers
+from services.cache_service import CACHE_HARD_TTL_FACTOR, SECTION_TIMEOUTS, get_cached_tickers
+from services.persistent_cache_service import _write
+
+QUOTE_HARD_TTL = SECTION_TIMEOUTS["quote"] * CACHE_HARD_TTL_FACTOR
+
+
+@pytest.fixture
+def disk(monkeypatch, tmp_path):
+    for module in (persistent_cache_service, cache_service, async_cache_service):
+        monkeypatch.setattr(module, "PERSISTENT_CACHE_ENABLED", True)
+    monkeypatch.setattr(persistent_cache_service, "PERSISTENT_CACHE_PATH", str(tmp_path / "cache.sqlite3"))
+    monkeypatch.setattr(persistent_cache_service, "_local", threading.local())
+    monkeypatch.setattr(upstream_service, "_open_until", 0.0)
+
+
+def _store(ticker, price, age):
+    fetched_at = time.time() - age
+    _write([(f"{ticker}:quote", {"data": {"price": price}, "fetched_at": fetched_at, "version": "v"})])
+
+
+def test_request_path_ignores_disk_rows_past_the_hard_ttl(cache, redis_client, disk):
+    _store("PETR4.SA", 10.0, age=QUOTE_HARD_TTL / 2)
+    _store("VALE3.SA", 20.0, age=QUOTE_HARD_TTL + 60)
+
+    cached, missing, stale = get_cached_tickers(cache, ["PETR4.SA", "VALE3.SA"], ("quote",), include_stale=True)
+
+    assert cached == {"PETR4.SA": {"quote": {"price": 10.0}}}
+    assert missing == {"VALE3.SA": {}}
+    # O dado restaurado fica só o que resta do TTL rígido
+    assert 0 < redis_client.ttl("flask_cache_PETR4.SA:quote") <= QUOTE_HARD_TTL / 2
+
+
+def test_open_circuit_serves_old_disk_rows_as_stale(cache, redis_client, disk):
+    _store("VALE3.SA", 20.0, age=QUOTE_HARD_TTL + 60)
+    upstream_service._mark_open(30)
+
+    cached, missing, stale = get_cached_tickers(cache, ["VALE3.SA"], ("quote",), include_stale=True)
+
+    assert cached == {"VALE3.SA": {"quote": {"price": 20.0}}}
+    assert stale == {"VALE3.SA": ("quote",)}
+    assert redis_client.ttl("flask_cache_VALE3.SA:quote") <= SECTION_TIMEOUTS["quote"]
+
+
+def test_async_lookup_reads_the_disk_tier(cache, disk):
+    _store("PETR4.SA", 10.0, age=QUOTE_HARD_TTL / 2)
+    _store("VALE3.SA", 20.0, age=QUOTE_HARD_TTL + 60)
+
+    async def lookup():
+        client = fakeredis.aioredis.FakeRedis()
+        return await aget_cached_tickers(client, cache, ["PETR4.SA", "VALE3.SA"], ("quote",))
+
+    cached, missing, _ = asyncio.run(lookup())
+    assert cached == {"PETR4.SA": {"quote": {"price": 10.0}}}
+    assert missing == {"VALE3.SA": {}}
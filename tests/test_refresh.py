@@ -0,0 +1,72 @@
+import time
+
+from services import metrics_service, upstream_service
+from services.cache_service import cache_ticker_data
+from services.logging_service import begin_request, get_request_counts
+from services.refresh_service import _key, record_access, run_refresh_cycle
+from services.response_service import QUOTE_SECTIONS, RECOMMENDATION_SECTIONS
+from services.utils import fetch_multiple_ticker_data
+
+
+def _lookups():
+    return {field: value for field, value in metrics_service._pending.items() if field[0] == "cache_lookups_total"}
+
+
+def test_hot_scan_does_not_count_as_cache_lookups(cache, monkeypatch):
+    monkeypatch.setattr(metrics_service, "_pending", metrics_service.defaultdict(float))
+    cache_ticker_data(cache, {"PETR4.SA": {"quote": {"price": 10.0}}})
+    record_access(cache, ["PETR4.SA", "VALE3.SA"], QUOTE_SECTIONS)
+    refreshed = []
+
+    begin_request()
+    run_refresh_cycle(cache, lambda tickers, cache, sections: refreshed.extend(tickers))
+
+    assert refreshed == ["VALE3.SA"]
+    assert _lookups() == {}
+    assert get_request_counts() == {}
+
+
+ANALYST_DATA = {"recommendations": [{"period": "0m"}], "price_targets": {"mean": 11.0}, "growth_estimates": {"0q": 0.05}}
+
+
+def _cache_aged(monkeypatch, cache, ticker_data, age):
+    now = time.time()
+    with monkeypatch.context() as patched:
+        patched.setattr(time, "time", lambda: now - age)
+        cache_ticker_data(cache, ticker_data)
+
+
+def test_stale_quote_queues_only_the_quote(cache, redis_client, monkeypatch):
+    cache_ticker_data(cache, {"PETR4.SA": ANALYST_DATA})
+    _cache_aged(monkeypatch, cache, {"PETR4.SA": {"quote": {"price": 10.0}}}, age=120)
+
+    data = fetch_multiple_ticker_data(["PETR4"], cache, QUOTE_SECTIONS + RECOMMENDATION_SECTIONS)
+
+    assert set(data["PETR4.SA"]) == {"quote", *RECOMMENDATION_SECTIONS}
+    assert redis_client.zrange(_key(cache, "queue", "quote"), 0, -1) == [b"PETR4.SA"]
+    assert {group.decode() for group in redis_client.smembers(_key(cache, "groups"))} == {
+        "quote", "|".join(QUOTE_SECTIONS + RECOMMENDATION_SECTIONS)
+    }
+
+
+def test_hot_scan_refreshes_only_sections_near_expiry(cache, monkeypatch):
+    sections = QUOTE_SECTIONS + RECOMMENDATION_SECTIONS
+    cache_ticker_data(cache, {"PETR4.SA": ANALYST_DATA})
+    _cache_aged(monkeypatch, cache, {"PETR4.SA": {"quote": {"price": 10.0}}}, age=55)
+    record_access(cache, ["PETR4.SA", "VALE3.SA"], sections)
+    refreshed = []
+
+    run_refresh_cycle(cache, lambda tickers, cache, sections: refreshed.append((tickers, sections)))
+
+    assert refreshed == [(["PETR4.SA"], QUOTE_SECTIONS), (["VALE3.SA"], sections)]
+
+
+def test_partial_miss_fetches_only_the_missing_sections(cache, fake_yahoo, monkeypatch):
+    monkeypatch.setattr(upstream_service, "_open_until", 0.0)
+    cache_ticker_data(cache, {"PETR4.SA": ANALYST_DATA})
+
+    data = fetch_multiple_ticker_data(["PETR4"], cache, QUOTE_SECTIONS + RECOMMENDATION_SECTIONS)
+
+    assert data["PETR4.SA"]["recommendations"] == ANALYST_DATA["recommendations"]
+    assert "price" in data["PETR4.SA"]["quote"]
+    assert fake_yahoo.calls == {"download": 1}
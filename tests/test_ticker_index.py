@@ -0,0 +1,138 @@
+import logging
+import time
+
+import pytest
+
+from conftest import TOKEN
+from services.ticker_index_service import TICKER_INDEX_VALID_TTL, update_ticker_index
+from services import upstream_service
+from services.upstream_service import UPSTREAM_BREAKER_ERRORS, capture_download_errors, download_error
+
+HEADERS = {"Authorization": TOKEN}
+
+
+@pytest.fixture
+def outage(fake_yahoo):
+    fake_yahoo.outage = True
+    yield fake_yahoo
+    fake_yahoo.outage = False
+
+
+def _prices(client, tickers):
+    response = client.post("/fetch_market_price", json={"tickers": tickers}, headers=HEADERS)
+    return {item["ticker"]: item for item in response.get_json()}
+
+
+def _invalid(redis_client):
+    return {ticker.decode() for ticker in redis_client.zrange("flask_cache_tickers:invalid", 0, -1)}
+
+
+def test_unknown_symbol_is_cached_as_not_found(app_client, redis_client, fake_yahoo):
+    result = _prices(app_client, ["PETR4", "ZZXX3"])
+    assert result["ZZXX3.SA"]["error"] == "Ticker not found"
+    assert "price" in result["PETR4.SA"]
+    assert _invalid(redis_client) == {"ZZXX3.SA"}
+
+    calls = fake_yahoo.total_calls()
+    assert _prices(app_client, ["ZZXX3"])["ZZXX3.SA"]["error"] == "Ticker not found"
+    assert fake_yahoo.total_calls() == calls
+
+
+def test_unknown_symbol_alone_is_not_found(app_client, redis_client):
+    assert _prices(app_client, ["ZZXX3"])["ZZXX3.SA"]["error"] == "Ticker not found"
+    assert _invalid(redis_client) == {"ZZXX3.SA"}
+
+
+def test_unknown_symbols_do_not_open_the_circuit(app_client, redis_client):
+    for i in range(UPSTREAM_BREAKER_ERRORS + 1):
+        assert _prices(app_client, [f"ZZX{i}3"])[f"ZZX{i}3.SA"]["error"] == "Ticker not found"
+    assert len(_invalid(redis_client)) == UPSTREAM_BREAKER_ERRORS + 1
+    assert "price" in _prices(app_client, ["PETR4"])["PETR4.SA"]
+
+
+def test_known_invalid_symbols_take_no_lease_nor_hot_slot(app_client, redis_client, monkeypatch):
+    from services import utils
+
+    _prices(app_client, ["ZZLE3"])
+    redis_client.delete("flask_cache_refresh:hot:quote")
+    leased = []
+    acquire = utils.acquire_leases
+    monkeypatch.setattr(
+        utils, "acquire_leases", lambda cache, tickers, token: leased.extend(tickers) or acquire(cache, tickers, token)
+    )
+
+    result = _prices(app_client, ["BBAS3", "ZZLE3"])
+
+    assert result["ZZLE3.SA"]["error"] == "Ticker not found"
+    assert leased == ["BBAS3.SA"]
+    assert redis_client.zrange("flask_cache_refresh:hot:quote", 0, -1) == [b"BBAS3.SA"]
+
+
+def test_outage_does_not_mark_tickers_invalid(app_client, redis_client, outage):
+    result = _prices(app_client, ["VALE3", "ITUB4"])
+    assert result == {
+        "VALE3.SA": {"ticker": "VALE3.SA", "error": "Upstream unavailable"},
+        "ITUB4.SA": {"ticker": "ITUB4.SA", "error": "Upstream unavailable"},
+    }
+    assert _invalid(redis_client) == set()
+
+    outage.outage = False
+    assert "price" in _prices(app_client, ["VALE3"])["VALE3.SA"]
+
+
+def test_valid_index_is_trimmed(cache, redis_client):
+    redis_client.zadd("flask_cache_tickers:valid", {"OLD3.SA": time.time() - TICKER_INDEX_VALID_TTL - 1})
+    update_ticker_index(cache, ["PETR4.SA"], [])
+    assert [t.decode() for t in redis_client.zrange("flask_cache_tickers:valid", 0, -1)] == ["PETR4.SA"]
+
+
+@pytest.fixture
+def throttled(fake_yahoo, monkeypatch):
+    # O circuito aberto também fica na memória do processo
+    monkeypatch.setattr(upstream_service, "_open_until", 0.0)
+    yield fake_yahoo
+    fake_yahoo.rate_limit_after = None
+
+
+def test_partial_rate_limit_keeps_data_without_verdicts(app_client, redis_client, throttled):
+    throttled.rate_limit_after = 1
+    result = _prices(app_client, ["PETR4", "ZZXX3", "VALE3"])
+    assert "price" in result["PETR4.SA"]
+    assert result["ZZXX3.SA"]["error"] == "Upstream unavailable"
+    assert result["VALE3.SA"]["error"] == "Upstream unavailable"
+    assert _invalid(redis_client) == set()
+
+
+def test_rate_limit_opens_the_circuit(app_client, throttled):
+    throttled.rate_limit_after = 1
+    for i in range(UPSTREAM_BREAKER_ERRORS):
+        _prices(app_client, [f"PETR{i}", f"VALE{i}"])
+
+    calls = throttled.total_calls()
+    assert _prices(app_client, ["ITUB4"])["ITUB4.SA"]["error"] == "Upstream unavailable"
+    assert throttled.total_calls() == calls
+
+
+def test_download_errors_are_read_from_yfinance_logs():
+    yf_logger = logging.getLogger("yfinance")
+    tickers = ["ZZXX3.SA", "VALE3.SA", "ITUB4.SA", "BBAS3.SA"]
+    with capture_download_errors(tickers) as errors:
+        yf_logger.error("$ZZXX3.SA: No data found, symbol may be delisted")
+        yf_logger.error("Failed to get ticker 'VALE3.SA' reason: ConnectionError('reset')")
+        yf_logger.error("['VALE3.SA', 'ITUB4.SA']: possibly delisted; no timezone found")
+        yf_logger.error("['BBAS3.SA']: possibly delisted; no price data found  (period=1d)")
+    yf_logger.error("$PETR4.SA: No data found, symbol may be delisted")
+
+    # Fuso ausente depois de um erro de rede não é veredito; "no price data found" sozinho também não
+    assert errors == {"ZZXX3.SA": "not_found", "VALE3.SA": "failed", "ITUB4.SA": "not_found"}
+
+
+def test_rate_limited_batch_gives_no_verdicts():
+    yf_logger = logging.getLogger("yfinance")
+    with capture_download_errors(["ZZXX3.SA", "VALE3.SA"]) as errors:
+        yf_logger.error("['ZZXX3.SA']: No data found, symbol may be delisted")
+        yf_logger.error("['VALE3.SA']: YFRateLimitError('Too Many Requests. Rate limited. Try after a while.')")
+
+    assert upstream_service.is_rate_limited(errors)
+    assert download_error(errors, "ZZXX3.SA") == "failed"
+    assert download_error(errors, "VALE3.SA") == "failed"
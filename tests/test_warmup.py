@@ -0,0 +1,16 @@
+from services import metrics_service
+from services.cache_service import cache_ticker_data
+from services.response_service import QUOTE_SECTIONS
+from services.warmup_service import run_warmup
+
+
+def test_warmup_skips_fresh_tickers_without_counting_lookups(cache, fake_yahoo, monkeypatch):
+    monkeypatch.setattr(metrics_service, "_pending", metrics_service.defaultdict(float))
+    cache_ticker_data(cache, {"PETR4.SA": {"quote": {"price": 10.0}}})
+
+    report = run_warmup(cache, ["PETR4", "VALE3"], QUOTE_SECTIONS)
+
+    assert report["status"] == "done"
+    assert report["fresh"] == 1
+    assert report["fetched"] == 1
+    assert not any(field[0] == "cache_lookups_total" for field in metrics_service._pending)
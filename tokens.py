@@ -1,5 +1,9 @@
 import datetime
 
+# Campos opcionais por token (controle de admissão):
+#   "priority": "high", "normal" (padrão) ou "low" — sob sobrecarga, "low" é recusado primeiro;
+#   "max_concurrency": requisições simultâneas; "budget_per_minute": tickers por minuto.
+# Alterações neste arquivo são recarregadas pelos workers sem reinício.
 tokens = [
     {"name": "rodrigo", "token": "<TOKEN>", "expiry": datetime.datetime(2125, 1, 31)},
     {"name": "user2", "token": "<TOKEN>", "expiry": datetime.datetime(2030, 2, 28)},
@@ -0,0 +1,56 @@
+"""
+Aquece o cache com o universo de tickers (ticker_universe.txt), fora do
+agendamento dos workers: após um deploy, antes do pregão ou via cron.
+
+Usa o mesmo Redis e o mesmo caminho de busca do app (yf.download em lote +
+serialização, sob o controle de acesso ao Yahoo) e grava o progresso em
+`warmup:status`, visível em /admin/warmup.
+
+Uso:
+    python warmup.py [--universe ticker_universe.txt] [--sections quote,info] [--force] [--json]
+
+No Docker Compose:
+    docker compose exec ticker-api python warmup.py
+"""
+import argparse
+import json
+import os
+import sys
+from os.path import abspath, dirname
+
+sys.path.insert(0, dirname(abspath(__file__)))
+# Sem as threads de segundo plano do app: o comando roda e termina
+os.environ["APP_PRELOAD"] = "1"
+
+from main import cache  # noqa: E402
+from services.warmup_service import WARMUP_SECTIONS, WARMUP_UNIVERSE_PATH, load_universe, run_warmup  # noqa: E402
+
+
+def print_progress(report):
+    print(
+        f"{report['processed']:>5}/{report['total']} tickers  fetched={report['fetched']} "
+        f"fresh={report['fresh']} skipped={report['skipped']} errors={report['errors']}",
+        flush=True,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--universe", default=WARMUP_UNIVERSE_PATH)
+    parser.add_argument("--sections", default=",".join(WARMUP_SECTIONS))
+    parser.add_argument("--force", action="store_true", help="busca também os tickers ainda frescos")
+    parser.add_argument("--json", action="store_true", help="imprime só o relatório final em JSON")
+    args = parser.parse_args()
+
+    report = run_warmup(
+        cache,
+        load_universe(args.universe),
+        tuple(section for section in args.sections.split(",") if section),
+        force=args.force,
+        progress=None if args.json else print_progress,
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['status']}: coverage {report['coverage'] * 100:.1f}%")
+    sys.exit(0 if report["status"] == "done" else 1)